@@ -0,0 +1,94 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+# the event loop whose thread pool has been sized by use_thread_pool()
+_sized_loop = None
+
+
+def use_thread_pool():
+    """
+    give the running event loop a thread pool of settings.ASYNC_VIEW_THREADS threads.
+    the default pool only has a few threads per cpu, and each thread holds
+    a database connection, so this caps both the concurrency and the connections.
+    """
+    global _sized_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _sized_loop:
+        loop.set_default_executor(ThreadPoolExecutor(
+            settings.ASYNC_VIEW_THREADS, thread_name_prefix='async-view'))
+        _sized_loop = loop
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async for functions that use the database.
+
+    sync_to_async runs everything in one shared thread by default (thread_sensitive=True),
+    so concurrent requests would wait for each other. this runs func in the event loop's
+    thread pool instead (see use_thread_pool()). database connections are per thread,
+    and like around a request, unusable or expired connections are closed before and after func.
+
+    Args:
+        func (Callable): function to run
+
+    Returns:
+        Callable: coroutine function with the same arguments
+    """
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    run = sync_to_async(inner, thread_sensitive=False)
+
+    @functools.wraps(func)
+    async def run_in_thread_pool(*args, **kwargs):
+        use_thread_pool()
+        return await run(*args, **kwargs)
+
+    return run_in_thread_pool
+
+
+def async_view(view_class, **initkwargs):
+    """
+    async version of a class-based view for the ASGI deployment (settings.ASYNC_VIEWS).
+
+    under ASGI django runs every sync view in one shared thread per process, so a view
+    waiting on the database holds up every other request. this runs the view, including
+    rendering its template, with database_sync_to_async so requests overlap.
+
+    Args:
+        view_class (View): class-based view to run
+        initkwargs: passed to view_class.as_view()
+
+    Returns:
+        Callable: async view function
+
+    Note:
+        django 3.1 has neither an async ORM nor async handlers on class-based views,
+        so running the whole sync view in a worker thread is as far as it can go.
+    """
+    view = view_class.as_view(**initkwargs)
+
+    def run(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        return response
+
+    run_async = database_sync_to_async(run)
+
+    async def async_view_func(request, *args, **kwargs):
+        return await run_async(request, *args, **kwargs)
+
+    # keep view_class, view_initkwargs and decorator flags like csrf_exempt
+    functools.update_wrapper(async_view_func, view, assigned=())
+    return async_view_func
@@ -0,0 +1,21 @@
+from django.conf import settings
+
+
+def image_upload(request):
+    """
+    settings of the image downscaling in static/js/base.js.
+    rendered into the page with json_script in _base.html.
+
+    Returns:
+        Dict: 'image_upload' with the target size, quality and type of resized images
+              and the largest file the server accepts
+    """
+    return {
+        'image_upload': {
+            'max_width': settings.IMAGE_RESIZE_MAX_WIDTH,
+            'max_height': settings.IMAGE_RESIZE_MAX_HEIGHT,
+            'quality': settings.IMAGE_RESIZE_QUALITY,
+            'type': settings.IMAGE_RESIZE_TYPE,
+            'max_size': settings.MAX_IMAGE_UPLOAD_SIZE,
+        },
+    }
@@ -0,0 +1,37 @@
+import functools
+import socket
+
+from django.conf import settings
+
+
+def show_toolbar(request):
+    """
+    SHOW_TOOLBAR_CALLBACK of debug_toolbar.
+    shows the toolbar to requests from this machine or from the docker host.
+
+    Args:
+        request (HttpRequest): the request
+
+    Returns:
+        bool: True if the toolbar should be shown
+    """
+    if not settings.DEBUG:
+        return False
+    address = request.META.get('REMOTE_ADDR')
+    return address in settings.INTERNAL_IPS or address in docker_host_ips()
+
+
+@functools.lru_cache(maxsize=None)
+def docker_host_ips():
+    """
+    look up the addresses of this host once.
+    inside docker the host is the gateway of the container's network, ending with .1.
+
+    Returns:
+        frozenset: ip addresses of the docker host
+    """
+    try:
+        _, _, ips = socket.gethostbyname_ex(socket.gethostname())
+    except OSError:
+        return frozenset()
+    return frozenset(ip[:-1] + '1' for ip in ips)
@@ -0,0 +1,205 @@
+import contextvars
+import logging
+import time
+import warnings
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# metrics of the request being served. None outside of RequestMetricsMiddleware.
+# sync_to_async copies the context, so views run in a thread pool update the same object.
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+BUDGET_LOG = 'log'
+BUDGET_WARN = 'warn'
+BUDGET_RAISE = 'raise'
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    raised when a view makes more queries than settings.QUERY_BUDGETS allows
+    and settings.QUERY_BUDGET_MODE is 'raise'.
+    """
+    pass
+
+
+class QueryBudgetWarning(UserWarning):
+    """
+    warned when a view makes more queries than settings.QUERY_BUDGETS allows
+    and settings.QUERY_BUDGET_MODE is 'warn'.
+    """
+    pass
+
+
+class RequestMetrics:
+    """
+    what a request spent its time on.
+
+    Attributes:
+        queries (int): number of sql queries
+        db_time (float): seconds spent running the queries
+        template_time (float): seconds spent rendering templates, including the queries they make
+        cache_hits (int): entries found in the caches of eigo.cache
+        cache_misses (int): entries missing from the caches of eigo.cache
+        total_time (float): seconds spent in the middleware. None until stop() is called.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = None
+        self.rendering = False
+        self._started = time.perf_counter()
+
+    def stop(self):
+        self.total_time = time.perf_counter() - self._started
+
+    def as_dict(self):
+        """
+        Returns:
+            Dict: the metrics with times in milliseconds
+        """
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round((self.total_time or 0) * 1000, 1),
+        }
+
+    def server_timing(self):
+        """
+        Returns:
+            str: value of the Server-Timing header, shown in the browser's network panel
+        """
+        metrics = self.as_dict()
+        return ', '.join([
+            f'db;dur={metrics["db_ms"]};desc="{self.queries} queries"',
+            f'tpl;dur={metrics["template_ms"]};desc="templates"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={metrics["total_ms"]}',
+        ])
+
+
+def current():
+    """
+    Returns:
+        RequestMetrics: metrics of the request being served. None if nothing is recorded.
+    """
+    return _current.get()
+
+
+def record_cache(hits=0, misses=0):
+    """
+    count cache hits and misses for the request being served.
+
+    Args:
+        hits (int): entries found
+        misses (int): entries that were missing
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute wrapper (connection.execute_wrappers) that counts and times queries.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def _install_on_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """
+    add record_query() to every database connection of every thread,
+    including the ones opened later. safe to call more than once.
+    """
+    connection_created.connect(
+        _install_on_connection, weak=False, dispatch_uid='core.additional.metrics')
+    for connection in connections.all():
+        _install_on_connection(None, connection)
+
+
+def check_budget(view_name, metrics):
+    """
+    compare the queries of a request with its budget in settings.QUERY_BUDGETS
+    and log, warn or raise depending on settings.QUERY_BUDGET_MODE.
+
+    Args:
+        view_name (str): url name with its namespace, e.g. 'eigo:eigo_list'
+        metrics (RequestMetrics): metrics of the request
+
+    Raises:
+        QueryBudgetExceeded: if the budget is exceeded and the mode is 'raise'
+    """
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if budget is None or metrics.queries <= budget:
+        return
+    message = f'{view_name} made {metrics.queries} queries, over its budget of {budget}.'
+    mode = settings.QUERY_BUDGET_MODE
+    if mode == BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    if mode == BUDGET_WARN:
+        warnings.warn(message, QueryBudgetWarning)
+    else:
+        logger.warning(message, extra={'view': view_name, 'budget': budget, **metrics.as_dict()})
+
+
+class TimedTemplate:
+    """
+    template of the django backend that adds its render time to the request metrics.
+    only the outermost render is timed, so templates rendered by templates
+    (e.g. the cached phrase cells) are not counted twice.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    django template backend whose templates report their render time to RequestMetrics.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,99 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics as request_metrics
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also run as async middleware.
+
+    under ASGI django runs a sync only middleware, and everything after it in
+    MIDDLEWARE, in one shared thread, so whitenoise alone would make the async views
+    (settings.ASYNC_VIEWS) wait for each other. static files are still served by whitenoise,
+    in the event loop's thread pool, and other requests are passed on without a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # lets django see the instance as a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = await sync_to_async(self.process_request, thread_sensitive=False)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    record the sql queries, database time, template render time and cache hits
+    of every request (core.additional.metrics.RequestMetrics).
+
+    the metrics are sent in the Server-Timing header, logged as one line per request
+    and set on the response as response.request_metrics for tests.
+    requests to views named in settings.QUERY_BUDGETS are checked against their budget.
+    turned on with settings.REQUEST_METRICS. when it is off django drops the middleware
+    and no query wrapper is installed, so it costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # lets django see the instance as a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        request_metrics.install_query_recorder()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = request_metrics.RequestMetrics()
+        token = request_metrics._current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics._current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = request_metrics.RequestMetrics()
+        token = request_metrics._current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics._current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.stop()
+        response['Server-Timing'] = metrics.server_timing()
+        response.request_metrics = metrics
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        values = metrics.as_dict()
+        request_metrics.logger.info(
+            'request_metrics view=%s method=%s path=%s status=%s %s',
+            view_name, request.method, request.path, response.status_code,
+            ' '.join(f'{key}={value}' for key, value in values.items()),
+            extra={'view': view_name, 'status': response.status_code, **values})
+        request_metrics.check_budget(view_name, metrics)
+        return response
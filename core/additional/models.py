@@ -16,6 +16,8 @@ class CoreModel(models.Model):
     Note:
         by setting Meta class's abstract attribute to True,
         django will not make a table for this model.
+        the values loaded from the database are kept in '_loaded_values'
+        so signal receivers can see what changed on save.
     """
     id = models.UUIDField(
         primary_key=True,
@@ -27,3 +29,21 @@ class CoreModel(models.Model):
 
     class Meta:
         abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        remember the values loaded from the database.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        after saving, the saved values become the loaded values.
+        """
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields}
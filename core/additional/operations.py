@@ -0,0 +1,80 @@
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently as PostgresAddIndexConcurrently, CreateExtension)
+from django.db import migrations
+
+
+class PostgresOnlyMixin:
+    """
+    mixin for migration operations that only make sense on postgresql.
+    the state is always changed, but the database is only touched on postgresql,
+    so tests can still run the migrations on sqlite.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class PostgresAddIndex(PostgresOnlyMixin, migrations.AddIndex):
+    """
+    AddIndex for postgresql specific indexes like GinIndex.
+    """
+    pass
+
+
+class PostgresCreateExtension(PostgresOnlyMixin, CreateExtension):
+    """
+    CreateExtension that is skipped on other databases.
+    """
+    pass
+
+
+class PostgresRunPython(PostgresOnlyMixin, migrations.RunPython):
+    """
+    RunPython that is skipped on other databases.
+    """
+    pass
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    AddIndex that does not lock writes to the table on postgresql.
+    the index is built with CREATE INDEX CONCURRENTLY, so the migration
+    must set atomic = False. other databases get a plain CREATE INDEX.
+
+    Note:
+        a concurrent build that fails leaves an INVALID index behind.
+        it is dropped before building again, so the migration can simply be re-run.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state)
+            return
+        self._drop_invalid_index(schema_editor)
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state)
+            return
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def _drop_invalid_index(self, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = %s AND NOT pg_index.indisvalid',
+                [self.index.name])
+            invalid = cursor.fetchone() is not None
+        if invalid:
+            schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS %s'
+                                  % schema_editor.quote_name(self.index.name))
@@ -0,0 +1,50 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    paginator for admin changelists of large tables.
+    when the queryset is not filtered, the number of rows is read from
+    postgresql's planner statistics (pg_class.reltuples) instead of running COUNT(*),
+    which has to scan the whole table.
+
+    Attributes:
+        estimate_threshold (int): estimates below this are replaced by an exact count.
+                                  small tables are cheap to count.
+
+    Note:
+        the estimate is only as fresh as the last ANALYZE (autovacuum runs it regularly),
+        so the last page number can be slightly off.
+    """
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def estimate(self):
+        """
+        Returns:
+            int: estimated number of rows. None if it can not be estimated.
+        """
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.where or query.distinct or query.low_mark or query.high_mark:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        # reltuples is -1 for tables that have never been analyzed
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
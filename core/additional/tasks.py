@@ -0,0 +1,122 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class TaskPoolFull(Exception):
+    """
+    raised when a task is submitted while the pool's queue is full.
+    """
+    pass
+
+
+class TaskPool:
+    """
+    bounded thread pool for work that should not hold up a request,
+    like uploading files to a remote storage.
+
+    at most max_workers tasks run at once and at most max_queue more wait.
+    submitting beyond that raises TaskPoolFull instead of queueing without limit,
+    so callers can fall back to doing the work in the request.
+
+    Attributes:
+        max_workers (int): number of worker threads. defaults to settings.TASK_POOL_MAX_WORKERS
+        max_queue (int): number of waiting tasks. defaults to settings.TASK_POOL_MAX_QUEUE
+
+    Note:
+        with settings.TASKS_ALWAYS_EAGER tasks run right away in the calling thread.
+        tests use it so they do not have to wait for threads.
+        the pool is per process. tasks still waiting when the process exits are lost.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                max_workers = self.max_workers or settings.TASK_POOL_MAX_WORKERS
+                max_queue = self.max_queue if self.max_queue is not None else (
+                    settings.TASK_POOL_MAX_QUEUE)
+                self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix='task-pool')
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        run fn(*args, **kwargs) in a worker thread.
+
+        Returns:
+            Future: result of the call
+
+        Raises:
+            TaskPoolFull: if max_workers + max_queue tasks are already submitted
+        """
+        if settings.TASKS_ALWAYS_EAGER:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise TaskPoolFull(getattr(fn, '__name__', repr(fn)))
+        try:
+            return executor.submit(self._run, fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def submit_on_commit(self, fn, *args, **kwargs):
+        """
+        submit fn once the current transaction commits, so the task sees the
+        rows the request saved. runs it in the request if the pool is full.
+        eager tasks run right away.
+        """
+        if settings.TASKS_ALWAYS_EAGER:
+            self.submit(fn, *args, **kwargs)
+            return
+
+        def submit():
+            try:
+                self.submit(fn, *args, **kwargs)
+            except TaskPoolFull:
+                logger.warning('task pool is full. running %s in the request.', fn)
+                fn(*args, **kwargs)
+
+        transaction.on_commit(submit)
+
+    def _run(self, fn, *args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            logger.exception('task %s failed', fn)
+            raise
+        finally:
+            # worker threads get their own database connections
+            connections.close_all()
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        """
+        stop the worker threads. a new pool is started on the next submit.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+task_pool = TaskPool()
@@ -0,0 +1,168 @@
+import magic
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.translation import ugettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+
+def size_error(max_size):
+    """
+    Returns:
+        str: error message for a file over max_size bytes
+    """
+    return _('Maximum image file is %(size)s MB.') % {'size': max_size / (1024 * 1024)}
+
+
+def sniff_type(data):
+    """
+    Args:
+        data (bytes): first bytes of a file
+
+    Returns:
+        str: mime type detected by libmagic
+    """
+    return magic.from_buffer(data[:2048], mime=True)
+
+
+def validate_image_file(file):
+    """
+    check the size and the magic bytes of an uploaded image.
+    the handler already does this while the file is received.
+    this is for forms that are also used without it, like the admin.
+
+    Args:
+        file (UploadedFile): file to check
+
+    Raises:
+        ValidationError: if the file is too large or not an allowed image type
+    """
+    if file.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+        raise ValidationError(size_error(settings.MAX_IMAGE_UPLOAD_SIZE))
+    position = file.tell()
+    file.seek(0)
+    data = file.read(2048)
+    file.seek(position)
+    if sniff_type(data) not in settings.IMAGE_UPLOAD_TYPES:
+        raise ValidationError(_('Bad image format.'))
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    upload handler that rejects oversized and non-image files while they are received.
+
+    it runs before django's memory and temporary file handlers.
+    the type is sniffed from the magic bytes of the first chunk with libmagic,
+    and the size is checked on every chunk, so a rejected file is never held
+    in memory or spooled to disk beyond one chunk.
+
+    a file of the wrong type is skipped: it is found at the first chunk, so at most
+    the rest of that one file is read, and the form can show the error on its field.
+    an oversized file stops the upload with the connection reset, so the rest of
+    the body is not read at all. the error is stored in request.upload_stopped
+    and ImageUploadMixin answers 413 without calling the view.
+
+    the reasons are stored in request.upload_errors and the sniffed types in
+    request.upload_types, both keyed by the field name.
+
+    Attributes:
+        max_size (int): maximum file size in bytes. defaults to settings.MAX_IMAGE_UPLOAD_SIZE
+        allowed_types (List): allowed mime types. defaults to settings.IMAGE_UPLOAD_TYPES
+    """
+
+    def __init__(self, request=None, max_size=None, allowed_types=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.MAX_IMAGE_UPLOAD_SIZE
+        self.allowed_types = allowed_types or settings.IMAGE_UPLOAD_TYPES
+        if request is not None:
+            request.upload_errors = {}
+            request.upload_types = {}
+            request.upload_stopped = None
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length,
+                         charset, content_type_extra)
+        self.sniffed = False
+        if content_length is not None and content_length > self.max_size:
+            self.stop(size_error(self.max_size))
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.stop(size_error(self.max_size))
+        if not self.sniffed:
+            self.sniffed = True
+            mime_type = sniff_type(raw_data)
+            if self.request is not None:
+                self.request.upload_types[self.field_name] = mime_type
+            if mime_type not in self.allowed_types:
+                self.reject(_('Bad image format.'))
+        return raw_data
+
+    def file_complete(self, file_size):
+        # the next handler builds the uploaded file
+        return None
+
+    def reject(self, error):
+        """
+        record why the file is rejected and skip the rest of it.
+
+        Raises:
+            SkipFile: always
+        """
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = error
+        raise SkipFile(error)
+
+    def stop(self, error):
+        """
+        record why the upload is stopped and stop reading the request body.
+
+        Raises:
+            StopUpload: always
+        """
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = error
+            self.request.upload_stopped = error
+        raise StopUpload(connection_reset=True)
+
+
+class ImageUploadMixin:
+    """
+    mixin for views that receive images.
+    installs ImageUploadHandler before the request body is read.
+
+    the csrf middleware reads the body, so the view is exempted from it
+    and csrf is checked after the handler is installed.
+    put this mixin first, before LoginRequiredMixin.
+
+    the body is parsed before the view is called. when the handler stopped
+    the upload, the rest of the body was never read and the fields after the
+    file are missing, so upload_stopped_response() is returned instead.
+
+    Attributes:
+        upload_handler_class (FileUploadHandler): handler to install
+    """
+    upload_handler_class = ImageUploadHandler
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, self.upload_handler_class(request))
+        if request.method == 'POST':
+            # reading FILES parses the body through the handler
+            request.FILES
+            if request.upload_stopped:
+                return self.upload_stopped_response(request.upload_stopped)
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+    def upload_stopped_response(self, error):
+        """
+        Args:
+            error (str): why the upload was stopped
+
+        Returns:
+            HttpResponse: 413 with the error
+        """
+        return HttpResponse(error, status=413)
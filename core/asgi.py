@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
+
+The read-only phrase views are served as async views (settings.ASYNC_VIEWS)
+unless ASYNC_VIEWS=0 is set. Run it with uvicorn workers:
+
+    gunicorn core.asgi:application -c core/gunicorn_asgi.py
 """
 
 import os
@@ -12,5 +17,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
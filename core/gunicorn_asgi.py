@@ -0,0 +1,16 @@
+"""
+gunicorn settings for the ASGI deployment.
+
+    gunicorn core.asgi:application -c core/gunicorn_asgi.py
+
+each uvicorn worker is one process with an event loop. the async views
+(settings.ASYNC_VIEWS) overlap their database work in the loop's thread pool,
+so a worker serves many requests at once instead of one like a sync worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'uvicorn.workers.UvicornWorker'
+accesslog = '-'
+errorlog = '-'
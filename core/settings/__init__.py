@@ -0,0 +1,16 @@
+"""
+settings are layered. base.py holds what every environment needs, and
+development.py or production.py is put on top of it depending on ENVIRONMENT.
+
+    ENVIRONMENT=production  -> core.settings.production
+    anything else           -> core.settings.development
+
+a profile can also be used directly with DJANGO_SETTINGS_MODULE=core.settings.production.
+'python manage.py startup_benchmark' measures how long each profile takes to start.
+"""
+import os
+
+if os.environ.get('ENVIRONMENT') == 'production':
+    from .production import *  # noqa: F401,F403
+else:
+    from .development import *  # noqa: F401,F403
@@ -0,0 +1,383 @@
+"""
+settings shared by every environment.
+development.py and production.py add what only they need (see core/settings/__init__.py).
+keep this module free of debug-only apps and of anything slow at import, like network calls.
+"""
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+APPLICATION_NAME = os.environ.get('APPLICATION_NAME')
+
+ENVIRONMENT = os.environ.get('ENVIRONMENT')
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/3.0/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('SECRET_KEY')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = int(os.environ.get('DEBUG', 0))
+
+ALLOWED_HOSTS = ['localhost', '127.0.0.1',
+                 'eigo-of-the-day.herokuapp.com', ]
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django.contrib.sites',  # for allauth
+    'django.contrib.postgres',  # for full-text and trigram search
+    # third party
+    'widget_tweaks',
+    'cloudinary_storage',
+    'cloudinary',
+    'martor',
+    'extra_views',
+    'allauth',
+    'allauth.account',
+    'allauth.socialaccount',
+    # local
+    'users.apps.UsersConfig',
+    'pages.apps.PagesConfig',
+    'eigo.apps.EigoConfig',
+    # third party that is recommended to be in the end
+    'django_cleanup.apps.CleanupConfig',
+]
+
+MIDDLEWARE = [
+    'core.additional.middleware.RequestMetricsMiddleware',  # off unless REQUEST_METRICS=1
+    'django.middleware.security.SecurityMiddleware',
+    'core.additional.middleware.AsyncWhiteNoiseMiddleware',  # whitenoise / for production
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'core.urls'
+
+TEMPLATES = [
+    {
+        # DjangoTemplates that times rendering for core.additional.metrics
+        'BACKEND': 'core.additional.metrics.TimedDjangoTemplates',
+        'DIRS': [
+            os.path.join(BASE_DIR, 'templates'),
+        ],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.additional.context_processors.image_upload',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'core.wsgi.application'
+
+# serve the list, detail, search and suggest views as async views
+# (core.additional.asyncviews.async_view). on by default in core/asgi.py.
+# under ASGI they run in the event loop's thread pool instead of one shared thread.
+ASYNC_VIEWS = bool(int(os.environ.get('ASYNC_VIEWS', 0)))
+# threads running the async views of a process. each holds a database connection.
+ASYNC_VIEW_THREADS = int(os.environ.get('ASYNC_VIEW_THREADS', 16))
+
+# request metrics (core.additional.middleware.RequestMetricsMiddleware)
+# queries, database time, template time and cache hits of every request are sent in
+# the Server-Timing header and logged by the 'core.additional.metrics' logger.
+REQUEST_METRICS = bool(int(os.environ.get('REQUEST_METRICS', 0)))
+# most queries each url name may make. what happens when a view goes over it depends on
+# QUERY_BUDGET_MODE: 'log' logs a warning, 'warn' warns (QueryBudgetWarning)
+# and 'raise' raises QueryBudgetExceeded, which fails the test that made the request.
+QUERY_BUDGETS = {
+    'eigo:eigo_list': 5,
+    'eigo:eigo_list_page': 5,
+    'eigo:eigo_suggest': 3,
+    'eigo:eigo_detail': 6,
+}
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'log')
+
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.additional.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+
+# Database
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': 'postgres',
+        'USER': 'postgres',
+        'PASSWORD': 'postgres',
+        'HOST': 'db',  # docker-composeのservice
+        'PORT': 5432
+    }
+}
+
+# Cache
+# 'search' holds phrase search results. entries expire after TIMEOUT seconds
+# and the least recently used ones are culled past MAX_ENTRIES.
+# 'shared' holds the few values every process has to agree on, like the generation
+# of the search results and the version of the phrase cards. the local memory caches here are per process,
+# so production.py keeps 'shared' in the database.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eigo-search',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eigo-shared',
+        'TIMEOUT': None,
+    },
+}
+
+# Password validation
+# https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/3.0/topics/i18n/
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# custom user model configs
+AUTH_USER_MODEL = 'users.CustomUser'
+
+
+# Static files (CSS, JavaScript, Images)
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+]
+
+
+# media files
+if ENVIRONMENT == 'development':
+    MEDIA_URL = f'{APPLICATION_NAME}/{ENVIRONMENT}/'
+else:
+    MEDIA_URL = f'{APPLICATION_NAME}/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# message framework config
+from django.contrib.messages import constants as messages
+MESSAGE_TAGS = {
+    messages.INFO: "uk-alert-primary",
+    messages.SUCCESS: "uk-alert-success",
+    messages.WARNING: "uk-alert-warning",
+    messages.ERROR: "uk-alert-danger",
+}
+
+
+# email settings
+DEFAULT_FROM_EMAIL = 'admin@eigooftheday.com'
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# EMAIL_HOST = ''
+# EMAIL_HOST_USER = ''
+# EMAIL_HOST_PASSWORD = ''
+# EMAIL_PORT = 587
+# EMAIL_USE_TLS = True
+
+
+# django-allauth configs
+LOGIN_REDIRECT_URL = 'eigo:eigo_list'
+ACCOUNT_LOGOUT_REDIRECT = 'eigo:eigo_list'
+SITE_ID = 1
+AUTHENTICATION_BACKENDS = (
+    'django.contrib.auth.backends.ModelBackend',  # django default
+    'allauth.account.auth_backends.AuthenticationBackend',  # new for allauth
+)
+ACCOUNT_SESSION_REMEMBER = True  # remember meで使われるデフォルトの値
+ACCOUNT_SIGNUP_PASSWORD_ENTER_TWICE = False  # passwordを2回入力するかどうか
+ACCOUNT_USERNAME_REQUIRED = False
+ACCOUNT_AUTHENTICATION_METHOD = 'email'
+ACCOUNT_EMAIL_REQUIRED = True
+ACCOUNT_UNIQUE_EMAIL = True
+# ACCOUNT_LOGIN_ON_EMAIL_CONFIRMATION = True
+# change this to disable signup functionality
+ACCOUNT_ADAPTER = 'core.additional.account_adapter.CustomAccountAdapter'
+# social login providers to install, separated by commas. e.g. SOCIAL_LOGIN_PROVIDERS=instagram
+# each one is an allauth.socialaccount.providers.<name> app that is imported at startup.
+SOCIAL_LOGIN_PROVIDERS = [
+    name.strip() for name in os.environ.get('SOCIAL_LOGIN_PROVIDERS', '').split(',') if name.strip()]
+INSTALLED_APPS += [
+    f'allauth.socialaccount.providers.{name}' for name in SOCIAL_LOGIN_PROVIDERS]
+
+
+# cloudinary configs
+CLOUDINARY_STORAGE = {
+    'CLOUD_NAME': os.environ.get('CLOUDINARY_NAME'),
+    'API_KEY': os.environ.get('CLOUDINARY_API_KEY'),
+    'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
+}
+DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+
+
+# martor
+MARTOR_ENABLE_CONFIGS = {
+    'emoji': 'true',        # to enable/disable emoji icons.
+    'imgur': 'true',        # to enable/disable imgur/custom uploader.
+    'mention': 'true',      # to enable/disable mention
+    # to include/revoke jquery (require for admin default django)
+    'jquery': 'true',
+    'living': 'false',      # to enable/disable live updates in preview
+    'spellcheck': 'false',  # to enable/disable spellcheck in form textareas
+    'hljs': 'true',         # to enable/disable hljs highlighting in preview
+}
+# Upload to locale storage
+MARTOR_UPLOAD_URL = '/api/uploader/'  # change to local uploader
+# Maximum Upload Image
+# 2.5MB - 2621440
+# 5MB - 5242880
+# 10MB - 10485760
+# 20MB - 20971520
+# 50MB - 5242880
+# 100MB 104857600
+# 250MB - 214958080
+# 500MB - 429916160
+MAX_IMAGE_UPLOAD_SIZE = 10485760
+# image types accepted by core.additional.uploadhandlers.ImageUploadHandler.
+# checked against the file's magic bytes, not the type the browser sends.
+IMAGE_UPLOAD_TYPES = ['image/png', 'image/jpeg', 'image/gif', 'image/webp']
+# images are downscaled in the browser before they are uploaded (static/js/base.js).
+# they are fitted in IMAGE_RESIZE_MAX_WIDTH x IMAGE_RESIZE_MAX_HEIGHT and re-encoded as
+# IMAGE_RESIZE_TYPE with IMAGE_RESIZE_QUALITY (1-100). the server still checks the result.
+IMAGE_RESIZE_MAX_WIDTH = 1280
+IMAGE_RESIZE_MAX_HEIGHT = 1280
+IMAGE_RESIZE_QUALITY = 80
+IMAGE_RESIZE_TYPE = 'image/jpeg'
+# where markdown images are uploaded to. the default stores each distinct image once
+# in DEFAULT_FILE_STORAGE. 'pages.uploads.CloudinaryUploadBackend' uploads every image
+# and 'pages.uploads.LocalUploadBackend' saves them to MEDIA_ROOT.
+MARKDOWN_UPLOAD_BACKEND = 'pages.uploads.ContentAddressedUploadBackend'
+# upload in the task pool and answer with a link that redirects once the upload is done
+MARKDOWN_UPLOAD_ASYNC = True
+# directory for files waiting to be uploaded. None for the system's temp directory.
+MARKDOWN_UPLOAD_SPOOL_DIR = None
+# resumable snap uploads (pages.models.UploadSession).
+# files are sent in chunks of at most UPLOAD_CHUNK_SIZE bytes and assembled in
+# UPLOAD_SESSION_DIR (None for the system's temp directory). sessions that are not
+# used for UPLOAD_SESSION_EXPIRY seconds are removed by 'manage.py purge_upload_sessions'.
+UPLOAD_CHUNK_SIZE = 1048576
+UPLOAD_SESSION_DIR = None
+UPLOAD_SESSION_EXPIRY = 86400
+# storage of the files of the corpus made by 'manage.py seed_corpus' and
+# read by 'manage.py benchmark', so benchmarks do not upload anything.
+BENCHMARK_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+
+# background tasks (core.additional.tasks.task_pool)
+# at most TASK_POOL_MAX_WORKERS tasks run at once per process and
+# TASK_POOL_MAX_QUEUE more wait. beyond that the work is done in the request.
+TASK_POOL_MAX_WORKERS = 4
+TASK_POOL_MAX_QUEUE = 32
+# run tasks right away in the calling thread. for tests.
+TASKS_ALWAYS_EAGER = False
+
+
+# phrase search
+# 'fulltext' uses the indexed search vector on postgresql and
+# falls back to 'contains' (icontains) on other databases.
+PHRASE_SEARCH_MODE = 'fulltext'
+# 'fuzzy' mode (?mode=fuzzy) returns the best PHRASE_FUZZY_LIMIT phrases
+# whose trigram similarity is at least PHRASE_FUZZY_THRESHOLD.
+PHRASE_FUZZY_THRESHOLD = 0.3
+PHRASE_FUZZY_LIMIT = 20
+# in-process prefix index behind the search box suggestions.
+# it is rebuilt after PHRASE_SUGGEST_MAX_AGE seconds to pick up changes
+# made by other processes, and holds at most PHRASE_SUGGEST_MAX_ENTRIES phrases.
+PHRASE_SUGGEST_MAX_ENTRIES = 1000000
+PHRASE_SUGGEST_MAX_AGE = 300
+# searches with more results than this are not cached
+PHRASE_SEARCH_CACHE_MAX_RESULTS = 500
+
+
+# phrase of the day
+# picked by 'python manage.py pick_daily_phrase' (run it daily with the scheduler).
+# set to True to serve each user their own pick (pick_daily_phrase --per-user).
+PHRASE_OF_THE_DAY_PER_USER = False
+
+
+# snap renditions (eigo.renditions)
+# webp copies of every snap are made at these widths for srcset.
+# images are never scaled up, so small snaps get fewer renditions.
+SNAP_RENDITION_WIDTHS = [320, 640, 960]
+SNAP_RENDITION_QUALITY = 80
+# width of the blurry placeholder shown while the image loads
+SNAP_PLACEHOLDER_WIDTH = 16
+
+
+# phrase list cells
+# rendered cells are kept in the default cache for this many seconds.
+# flush or warm them with 'python manage.py phrase_cells'. warming needs
+# a default cache shared by the processes, flushing only the 'shared' one.
+PHRASE_CELL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Heroku
+import dj_database_url
+db_from_env = dj_database_url.config(conn_max_age=500)
+DATABASES['default'].update(db_from_env)
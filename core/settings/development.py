@@ -0,0 +1,18 @@
+"""
+settings for local development and tests.
+"""
+from .base import *  # noqa: F401,F403
+
+# debug_toolbar configs
+# a sync only middleware makes django run every request in one thread under ASGI,
+# so the toolbar is left out when the views are served asynchronously.
+# the lists are copied so base.py stays as it is for the other profiles.
+if DEBUG and not ASYNC_VIEWS:
+    INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+    MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+    # docker内でなければ基本的に必要ない
+    # the docker host's address is looked up on the first request instead of at import
+    DEBUG_TOOLBAR_CONFIG = {
+        'SHOW_TOOLBAR_CALLBACK': 'core.additional.debug.show_toolbar',
+    }
+INTERNAL_IPS = ['127.0.0.1']
@@ -0,0 +1,38 @@
+"""
+settings for heroku.
+only what production serves is installed, so dyno restarts and
+'manage.py' commands do not import debug tools.
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+
+# fake admin login page at /admin/ that records who tries to log in.
+# set ADMIN_HONEYPOT=0 to leave it out.
+ADMIN_HONEYPOT = bool(int(os.environ.get('ADMIN_HONEYPOT', 1)))
+if ADMIN_HONEYPOT:
+    INSTALLED_APPS = INSTALLED_APPS + ['admin_honeypot']
+
+# every worker has to see the same search generation and phrase card version.
+# the table is made by 'manage.py createcachetable' in the release phase (heroku.yml).
+CACHES = {
+    **CACHES,
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'eigo_shared_cache',
+        'TIMEOUT': None,
+    },
+}
+
+
+# security configs
+SECURE_BROWSER_XSS_FILTER = True
+X_FRAME_OPTIONS = 'DENY'
+SECURE_SSL_REDIRECT = True
+SECURE_HSTS_SECONDS = 3600
+SECURE_HSTS_INCLUDE_SUBDOMAINS = True
+SECURE_HSTS_PRELOAD = True
+SECURE_CONTENT_TYPE_NOSNIFF = True
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https',)
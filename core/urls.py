@@ -3,11 +3,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
-from pages.views import MarkdownImageUploader
+from pages.views import (
+    MarkdownImageUploader, MarkdownImageView, UploadSessionCreateView, UploadSessionView)
 
 urlpatterns = [
     # django admin
-    path('admin/', include('admin_honeypot.urls', namespace='admin_honeypot')),
     path('headquarters/', admin.site.urls),
     # user management
     path('accounts/', include('allauth.urls')),
@@ -16,10 +16,21 @@ urlpatterns = [
     # local apps
     path('api/uploader/', MarkdownImageUploader.as_view(),
          name='markdown_uploader_page'),
+    path('api/uploader/<uuid:pk>/', MarkdownImageView.as_view(),
+         name='markdown_image'),
+    path('api/uploads/', UploadSessionCreateView.as_view(),
+         name='upload_sessions'),
+    path('api/uploads/<uuid:pk>/', UploadSessionView.as_view(),
+         name='upload_session'),
     path('', include('eigo.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
-if settings.DEBUG:
+if 'admin_honeypot' in settings.INSTALLED_APPS:
+    urlpatterns = [
+        path('admin/', include('admin_honeypot.urls', namespace='admin_honeypot')),
+    ] + urlpatterns
+
+if settings.DEBUG and 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),
@@ -1,23 +1,120 @@
 from django.contrib import admin
-from django.db import models
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 
-from .models import Phrase, Example, Snap
+from core.additional.paginator import EstimatedCountPaginator
 
+from .models import DailyPhrase, Phrase, Example, Snap
 
-class ExampleInline(admin.TabularInline):
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    inline formset that only builds forms for one page of the related objects,
+    so phrases with hundreds of examples do not render hundreds of forms.
+
+    Attributes:
+        per_page (int): number of related objects in a page
+        page_number (str): requested page number. set by PaginatedTabularInline.
+        query (QueryDict): query string of the change page, used to build page links.
+    """
+    per_page = 20
+    page_number = None
+    query = None
+
+    @classmethod
+    def get_page_param(cls, prefix):
+        return f'{prefix}-page'
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.paginator = Paginator(queryset, self.per_page)
+            self.page = self.paginator.get_page(self.page_number)
+            self._queryset = list(self.page.object_list)
+        return self._queryset
+
+    def page_links(self):
+        """
+        Returns:
+            List: (page number, query string) for every page. empty when there is only one page.
+        """
+        self.get_queryset()
+        if self.paginator.num_pages < 2:
+            return []
+        query = self.query.copy() if self.query is not None else QueryDict(mutable=True)
+        links = []
+        for number in self.paginator.page_range:
+            query[self.get_page_param(self.prefix)] = number
+            links.append((number, query.urlencode()))
+        return links
+
+
+class PaginatedTabularInline(admin.TabularInline):
+    """
+    TabularInline that shows the related objects one page at a time.
+    the page is chosen with the '<prefix>-page' query parameter.
+
+    Attributes:
+        formset (BaseInlineFormSet): formset that paginates the related objects
+        per_page (int): number of related objects in a page
+        template (str): tabular inline template with page links
+    """
+    formset = PaginatedInlineFormSet
+    per_page = 20
+    extra = 1
+    template = 'admin/eigo/paginated_tabular.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        page_param = formset.get_page_param(formset.get_default_prefix())
+        return type(formset.__name__, (formset,), {
+            'per_page': self.per_page,
+            'page_number': request.GET.get(page_param),
+            'query': request.GET,
+        })
+
+
+class ExampleInline(PaginatedTabularInline):
     """
     Attributes:
         model (Example): set model Example for TabularInline
+        ordering (List): newest examples first
     """
     model = Example
+    ordering = ['-timestamp', '-id']
 
 
-class SnapInline(admin.TabularInline):
+class SnapInline(PaginatedTabularInline):
     """
     Attributes:
         model (Snap): set model Snap for TabularInline
+        ordering (List): newest snaps first
     """
     model = Snap
+    ordering = ['-timestamp', '-id']
+
+
+class HasSnapsListFilter(admin.SimpleListFilter):
+    """
+    filter phrases by whether they have active snaps.
+    uses the stored snap_count, so it does not join the snaps table.
+    """
+    title = 'snaps'
+    parameter_name = 'has_snaps'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('1', 'with snaps'),
+            ('0', 'without snaps'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.filter(snap_count__gt=0)
+        if self.value() == '0':
+            return queryset.filter(snap_count=0)
+        return queryset
 
 
 class PhraseAdmin(admin.ModelAdmin):
@@ -27,8 +124,13 @@ class PhraseAdmin(admin.ModelAdmin):
     Attributes:
         list_desplay (List): list of fields in model to display in admin site.
         list_display_links (List): list of fields in model to attach links to in admin site.
+        list_select_related (List): relations to join when listing.
         list_filter (List): list of fields in model that the user can filter through in admin site.
+        date_hierarchy (str): date field to drill down by in admin site.
         search_fields (List): list of fields in model that the user can search through in admin site.
+        autocomplete_fields (List): foreign keys picked with a searchable select instead of a full list.
+        paginator (Paginator): paginator that estimates the count of unfiltered lists.
+        show_full_result_count (bool): False to skip counting the whole table when filtering.
         actions (List): list of custom functions to add custom actions to admin site.
         inlines (List): list of custom Inline classes to add relational fields in admin site.
     """
@@ -36,20 +138,27 @@ class PhraseAdmin(admin.ModelAdmin):
     list_display = [
         'id',
         'phrase',
+        'user',
         'examples',
         'snaps',
+        'timestamp',
         'is_active',
     ]
     list_display_links = [
         'id',
     ]
+    list_select_related = ['user']
     list_filter = [
-        'phrase',
+        HasSnapsListFilter,
         'is_active',
     ]
+    date_hierarchy = 'timestamp'
     search_fields = [
         'phrase',
     ]
+    autocomplete_fields = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['active', 'inactive']
     inlines = [
         ExampleInline,
@@ -83,11 +192,12 @@ class PhraseAdmin(admin.ModelAdmin):
             obj (Phrase): data object.
 
         Returns:
-            int: number of examples related to the object
+            int: number of active examples related to the object
         """
-        return obj.examples.count()
+        return obj.example_count
 
     examples.short_description = 'examples'
+    examples.admin_order_field = 'example_count'
 
     def snaps(self, obj):
         """
@@ -98,11 +208,46 @@ class PhraseAdmin(admin.ModelAdmin):
             obj (Phrase): data object.
 
         Returns:
-            int: number of snaps related to the object
+            int: number of active snaps related to the object
         """
-        return obj.snaps.count()
+        return obj.snap_count
 
     snaps.short_description = 'snaps'
+    snaps.admin_order_field = 'snap_count'
+
+
+class ExampleAdmin(admin.ModelAdmin):
+    """
+    custom admin for model Example
+
+    Attributes:
+        list_desplay (List): list of fields in model to display in admin site.
+        list_display_links (List): list of fields in model to attach links to in admin site.
+        list_select_related (List): relations to join when listing.
+        list_filter (List): list of fields in model that the user can filter through in admin site.
+        date_hierarchy (str): date field to drill down by in admin site.
+        autocomplete_fields (List): foreign keys picked with a searchable select instead of a full list.
+        paginator (Paginator): paginator that estimates the count of unfiltered lists.
+        show_full_result_count (bool): False to skip counting the whole table when filtering.
+    """
+    list_display = [
+        'id',
+        'example',
+        'phrase',
+        'timestamp',
+        'is_active',
+    ]
+    list_display_links = [
+        'id',
+    ]
+    list_select_related = ['phrase']
+    list_filter = [
+        'is_active',
+    ]
+    date_hierarchy = 'timestamp'
+    autocomplete_fields = ['phrase']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class SnapAdmin(admin.ModelAdmin):
@@ -112,22 +257,53 @@ class SnapAdmin(admin.ModelAdmin):
     Attributes:
         list_desplay (List): list of fields in model to display in admin site.
         list_display_links (List): list of fields in model to attach links to in admin site.
+        list_select_related (List): relations to join when listing.
         list_filter (List): list of fields in model that the user can filter through in admin site.
+        date_hierarchy (str): date field to drill down by in admin site.
+        autocomplete_fields (List): foreign keys picked with a searchable select instead of a full list.
+        paginator (Paginator): paginator that estimates the count of unfiltered lists.
+        show_full_result_count (bool): False to skip counting the whole table when filtering.
     """
     list_display = [
         'id',
         'snap',
+        'phrase',
+        'timestamp',
         'is_active',
     ]
     list_display_links = [
         'id',
     ]
+    list_select_related = ['phrase']
     list_filter = [
-        'snap',
         'is_active',
     ]
+    date_hierarchy = 'timestamp'
+    autocomplete_fields = ['phrase']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DailyPhraseAdmin(admin.ModelAdmin):
+    """
+    custom admin for model DailyPhrase
+
+    Attributes:
+        list_desplay (List): list of fields in model to display in admin site.
+        list_select_related (List): relations to join when listing.
+        date_hierarchy (str): date field to drill down by in admin site.
+    """
+    list_display = [
+        'date',
+        'phrase',
+        'user',
+    ]
+    list_select_related = ['phrase', 'user']
+    date_hierarchy = 'date'
+    autocomplete_fields = ['phrase', 'user']
 
 
 admin.site.register(Phrase, PhraseAdmin)
-admin.site.register(Example)
+admin.site.register(Example, ExampleAdmin)
 admin.site.register(Snap, SnapAdmin)
+admin.site.register(DailyPhrase, DailyPhraseAdmin)
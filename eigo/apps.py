@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class EigoConfig(AppConfig):
     name = 'eigo'
+
+    def ready(self):
+        """
+        connect signal receivers.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,408 @@
+import io
+import math
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.shortcuts import reverse
+from PIL import Image
+
+from pages.models import StoredFile
+from pages.storage import content_addressed_storage
+from .cache import search_cache
+from .models import Example, Phrase, Snap
+from .pagination import KeysetPaginator
+from .search import update_search_vector
+
+VERBS = ['break', 'call', 'catch', 'cut', 'draw', 'drop', 'fall', 'get', 'give', 'hit',
+         'hold', 'keep', 'let', 'make', 'pull', 'put', 'run', 'set', 'take', 'turn',
+         'bite', 'bring', 'burn', 'carry', 'face', 'jump', 'kick', 'miss', 'play', 'spill']
+DETERMINERS = ['the', 'a', 'your', 'their', 'no']
+ADJECTIVES = ['cold', 'whole', 'last', 'big', 'early', 'golden', 'long', 'old', 'quiet', 'rough',
+              'short', 'silver', 'small', 'thin', 'wild', 'blue', 'clean', 'dark', 'fresh', 'high']
+NOUNS = ['ice', 'leg', 'bullet', 'day', 'line', 'bridge', 'ball', 'beans', 'cake', 'deal',
+         'dust', 'face', 'fire', 'game', 'hand', 'heart', 'horse', 'idea', 'job', 'light',
+         'mind', 'nail', 'road', 'rope', 'ship', 'shoes', 'song', 'storm', 'table', 'water']
+PLACES = ['', 'at night', 'in time', 'on the road', 'for good', 'by hand',
+          'in the end', 'at once', 'on purpose', 'out of the blue', 'under pressure']
+SUBJECTS = ['She', 'He', 'They', 'We', 'My boss', 'Our teacher', 'The team', 'Everyone']
+
+
+def percentile(values, percent):
+    """
+    Args:
+        values (List): measured values
+        percent (int): percentile between 0 and 100
+
+    Returns:
+        float: the value below which percent of values fall (nearest rank)
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class CorpusSeeder:
+    """
+    fill the database with a synthetic corpus of phrases, examples and snaps for benchmarks.
+
+    phrases are made of common words, like 'catch the last bus', and numbered deterministically,
+    so seeding again with the same seed continues where the last run stopped.
+    everything is written with bulk_create in batches, one transaction per batch.
+    signals do not run for bulk_create, so the counts, search vectors, file references
+    and the search cache are updated here, like import_phrases does.
+
+    Attributes:
+        user (User): owner of the seeded phrases
+        examples (int): average number of examples per phrase. each phrase gets 0 to twice this.
+        snap_ratio (float): share of phrases with a snap, between 0 and 1
+        batch_size (int): number of phrases written at once
+        images (int): number of distinct images shared by the snaps
+        rng (Random): random generator seeded with the seed argument
+    """
+
+    def __init__(self, user, examples=3, snap_ratio=0.2, batch_size=2000, images=8, seed=0):
+        self.user = user
+        self.examples = examples
+        self.snap_ratio = snap_ratio
+        self.batch_size = batch_size
+        self.images = images
+        self.rng = random.Random(seed)
+        self.offset = seed * 1000003
+
+    @classmethod
+    def combinations(cls):
+        """
+        Returns:
+            int: number of distinct phrases the word lists make without a suffix
+        """
+        return len(VERBS) * len(DETERMINERS) * len(ADJECTIVES) * len(NOUNS) * len(PLACES)
+
+    @classmethod
+    def capacity(cls):
+        """
+        Returns:
+            float: number of distinct phrases that can be generated. unbounded,
+                   since the combinations are numbered again after they run out.
+        """
+        return math.inf
+
+    def make_phrase(self, number):
+        """
+        Args:
+            number (int): index of the phrase
+
+        Returns:
+            str: a distinct phrase for every number. after the first combinations()
+                 phrases the words repeat with a number, like 'catch the last bus 2'.
+        """
+        rounds, number = divmod(number + self.offset, self.combinations())
+        words = []
+        for choices in (PLACES, NOUNS, ADJECTIVES, DETERMINERS, VERBS):
+            number, index = divmod(number, len(choices))
+            words.insert(0, choices[index])
+        if rounds:
+            words.append(str(rounds + 1))
+        return ' '.join(word for word in words if word)
+
+    def make_example(self, phrase):
+        """
+        Returns:
+            str: a sentence using the phrase
+        """
+        subject = self.rng.choice(SUBJECTS)
+        filler = ' '.join(self.rng.choice(NOUNS) for _ in range(self.rng.randint(2, 8)))
+        return f'{subject} had to {phrase} because of the {filler}.'
+
+    def make_images(self):
+        """
+        store the images shared by the snaps, once each.
+
+        Returns:
+            List: (name, width, height) of the stored images
+        """
+        images = []
+        for i in range(self.images):
+            width, height = 640, 480
+            image = Image.new('RGB', (width, height), (i * 37 % 256, i * 91 % 256, i * 53 % 256))
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=80)
+            name = content_addressed_storage.save(
+                f'benchmark/{i}.jpg', ContentFile(buffer.getvalue()))
+            images.append((name, width, height))
+        return images
+
+    def seed(self, count, progress=None):
+        """
+        add count phrases with their examples and snaps.
+
+        Args:
+            count (int): number of phrases to add
+            progress (Callable): called with the stats after every batch
+
+        Returns:
+            Dict: number of phrases, examples and snaps added and phrases skipped
+        """
+        start = Phrase._base_manager.filter(user=self.user).count()
+        images = self.make_images() if self.snap_ratio else []
+        used = {name: 0 for name, _, _ in images}
+        stats = {'phrases': 0, 'examples': 0, 'snaps': 0, 'skipped': 0}
+        for batch_start in range(start, start + count, self.batch_size):
+            numbers = range(batch_start, min(batch_start + self.batch_size, start + count))
+            self.seed_batch([self.make_phrase(number) for number in numbers], images, used, stats)
+            if progress is not None:
+                progress(stats)
+        # the images are referenced once for every snap. the first reference came with the save
+        for name, uses in used.items():
+            if uses:
+                StoredFile.objects.filter(name=name).update(references=F('references') + uses - 1)
+            else:
+                content_addressed_storage.delete(name)
+        if stats['phrases']:
+            search_cache.invalidate()
+        return stats
+
+    def seed_batch(self, texts, images, used, stats):
+        existing = set(Phrase._base_manager.filter(
+            phrase__in=texts).values_list('phrase', flat=True))
+        phrases, examples, snaps = [], [], []
+        for text in texts:
+            if text in existing:
+                stats['skipped'] += 1
+                continue
+            phrase = Phrase(phrase=text, user=self.user)
+            phrase.example_count = self.rng.randint(0, 2 * self.examples)
+            examples += [Example(phrase=phrase, example=self.make_example(text))
+                         for _ in range(phrase.example_count)]
+            if images and self.rng.random() < self.snap_ratio:
+                name, width, height = self.rng.choice(images)
+                used[name] += 1
+                phrase.snap_count = 1
+                snaps.append(Snap(phrase=phrase, snap=name, width=width, height=height))
+            phrases.append(phrase)
+        with transaction.atomic():
+            Phrase.objects.bulk_create(phrases)
+            Example.objects.bulk_create(examples)
+            Snap.objects.bulk_create(snaps)
+            if phrases:
+                update_search_vector(Phrase.objects.get_queryset().filter(
+                    pk__in=[phrase.pk for phrase in phrases]))
+        stats['phrases'] += len(phrases)
+        stats['examples'] += len(examples)
+        stats['snaps'] += len(snaps)
+
+
+class QueryCounter:
+    """
+    execute wrapper counting the queries of the current thread's connection.
+    lighter than CaptureQueriesContext, which keeps the sql of every query.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Benchmark:
+    """
+    measure the latency, queries and memory of the main endpoints.
+
+    every endpoint is called warmup times first, then requests times to measure the latency
+    and the queries, and once more with tracemalloc to measure the peak memory, since
+    tracing slows everything down. endpoints that write run in a transaction that is
+    rolled back, so the corpus stays the same between runs.
+
+    Attributes:
+        client (Client): test client logged in as the user
+        user (User): user the pages are rendered for. the admin is measured if they are staff.
+        requests (int): measured calls per endpoint
+        warmup (int): calls per endpoint before measuring
+    """
+
+    def __init__(self, client, user, requests=30, warmup=3):
+        self.client = client
+        self.user = user
+        self.requests = requests
+        self.warmup = warmup
+
+    def endpoints(self):
+        """
+        Returns:
+            List: (name, function doing one call and returning its status code)
+        """
+        phrases = Phrase.objects.filter(user=self.user)
+        phrase = phrases.has_snaps().filter(example_count__gt=0).order_by('-timestamp', '-id').first() or (
+            phrases.order_by('-timestamp', '-id').first())
+        term = phrase.phrase.split()[-1] if phrase else 'the'
+        list_url = reverse('eigo:eigo_list')
+        endpoints = [
+            ('list', self.get(list_url)),
+            ('list_deep', self.get(f'{list_url}?cursor={self.deep_cursor()}')),
+            ('list_search', self.get(f'{list_url}?search={term}')),
+            ('search_queryset', lambda: self.search_queryset(term)),
+            ('create_form', self.get(reverse('eigo:eigo_new'))),
+        ]
+        if phrase is not None:
+            endpoints += [
+                ('detail', self.get(phrase.get_absolute_url())),
+                ('update_form', self.get(reverse('eigo:eigo_edit', kwargs={'pk': phrase.pk}))),
+            ]
+        if self.user.is_staff:
+            endpoints.append(
+                ('admin_changelist', self.get(reverse('admin:eigo_phrase_changelist'))))
+        endpoints.append(('create_submit', self.rolled_back(self.create_submit)))
+        if phrase is not None:
+            endpoints.append(
+                ('update_submit', self.rolled_back(lambda: self.update_submit(phrase))))
+        return endpoints
+
+    def deep_cursor(self):
+        """
+        Returns:
+            str: cursor of the list page halfway through the user's phrases
+        """
+        ordering = ['-timestamp', '-id']
+        queryset = Phrase.objects.filter(user=self.user).order_by(*ordering)
+        middle = queryset.count() // 2
+        if not middle:
+            return ''
+        return KeysetPaginator(queryset, 20, ordering).encode(queryset[middle])
+
+    def get(self, url):
+        return lambda: self.client.get(url).status_code
+
+    def search_queryset(self, term):
+        list(Phrase.objects.search(term)[:20])
+        return 200
+
+    def rolled_back(self, func):
+        def call():
+            with transaction.atomic():
+                status = func()
+                transaction.set_rollback(True)
+            return status
+        return call
+
+    def create_submit(self):
+        return self.client.post(reverse('eigo:eigo_new'), {
+            'phrase': f'benchmark phrase {time.perf_counter_ns()}',
+            'example-form-TOTAL_FORMS': 2,
+            'example-form-INITIAL_FORMS': 0,
+            'example-form-0-example': 'the first example',
+            'example-form-1-example': 'the second example',
+            'snap-form-TOTAL_FORMS': 0,
+            'snap-form-INITIAL_FORMS': 0,
+        }).status_code
+
+    def update_submit(self, phrase):
+        examples = list(Example.objects.get_queryset().filter(phrase=phrase).order_by('pk'))
+        snaps = list(Snap.objects.get_queryset().filter(phrase=phrase).order_by('pk'))
+        data = {
+            'phrase': phrase.phrase,
+            'last_updated': phrase.updated.isoformat(),
+            'example-form-TOTAL_FORMS': len(examples) + 1,
+            'example-form-INITIAL_FORMS': len(examples),
+            f'example-form-{len(examples)}-example': 'a new example',
+            'snap-form-TOTAL_FORMS': len(snaps),
+            'snap-form-INITIAL_FORMS': len(snaps),
+        }
+        for i, example in enumerate(examples):
+            data[f'example-form-{i}-id'] = example.pk
+            data[f'example-form-{i}-example'] = f'{example.example} edited'
+        for i, snap in enumerate(snaps):
+            data[f'snap-form-{i}-id'] = snap.pk
+        return self.client.post(
+            reverse('eigo:eigo_edit', kwargs={'pk': phrase.pk}), data).status_code
+
+    def measure(self, func):
+        """
+        Returns:
+            Dict: latency percentiles in milliseconds, queries per call,
+                  peak traced memory in KiB and the status codes of the calls
+        """
+        for _ in range(self.warmup):
+            func()
+        latencies, queries, statuses = [], [], set()
+        for _ in range(self.requests):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                statuses.add(func())
+                latencies.append(time.perf_counter() - started)
+            queries.append(counter.count)
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+            'status': sorted(statuses),
+        }
+
+    def run(self, only=None, progress=None):
+        """
+        Args:
+            only (List): names of the endpoints to measure. None for all of them.
+            progress (Callable): called with the name and result of every endpoint
+
+        Returns:
+            Dict: size of the corpus and the results of every endpoint by name
+        """
+        results = {}
+        for name, func in self.endpoints():
+            if only and name not in only:
+                continue
+            results[name] = self.measure(func)
+            if progress is not None:
+                progress(name, results[name])
+        return {
+            'corpus': {
+                'phrases': Phrase._base_manager.count(),
+                'examples': Example._base_manager.count(),
+                'snaps': Snap._base_manager.count(),
+            },
+            'database': connection.vendor,
+            'requests': self.requests,
+            'endpoints': results,
+        }
+
+
+def find_regressions(result, baseline, threshold=0.2):
+    """
+    compare a benchmark result with a baseline result of the same endpoints.
+    latency and memory regress when they grow by more than threshold,
+    queries regress when there are more of them at all.
+
+    Args:
+        result (Dict): result of Benchmark.run()
+        baseline (Dict): an earlier result
+        threshold (float): allowed growth of latency and memory. 0.2 is 20%.
+
+    Returns:
+        List: descriptions of the regressions. empty when there are none.
+    """
+    regressions = []
+    for name, current in result['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: {current["queries"]} queries, was {previous["queries"]}.')
+        for key, unit in (('p50_ms', 'ms'), ('p95_ms', 'ms'), ('peak_kib', 'KiB')):
+            if current[key] > previous[key] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {key} {current[key]}{unit}, was {previous[key]}{unit}.')
+    return regressions
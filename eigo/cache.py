@@ -0,0 +1,435 @@
+import datetime
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, FloatField, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from core.additional.metrics import record_cache
+
+from .search import split_search_query
+
+
+class SearchCache:
+    """
+    cache of phrase search results.
+
+    results are stored as ordered lists of primary keys (with their rank for ranked
+    searches) under a key made of the normalized search terms, the search mode
+    and a generation counter. saving or deleting a Phrase or an Example bumps the
+    generation (see eigo/signals.py), so every older entry stops being used at once
+    and is evicted by the cache's TTL and LRU culling.
+
+    the results may stay in the memory of each process, but the generation is kept
+    in a cache shared by every process, so a bump in one worker reaches the others.
+    so are the hit and miss counters, so stats() covers every worker.
+
+    Attributes:
+        alias (str): name of the cache in settings.CACHES holding the results
+        generation_alias (str): name of the shared cache holding the generation
+                                and the hit and miss counters
+    """
+    generation_key = 'eigo:search:generation'
+    hits_key = 'eigo:search:hits'
+    misses_key = 'eigo:search:misses'
+
+    def __init__(self, alias='search', generation_alias='shared'):
+        self.alias = alias
+        self.generation_alias = generation_alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        return caches[self.generation_alias]
+
+    def generation(self):
+        """
+        Returns:
+            int: current generation. initialized from the clock so it never goes
+                 back to a value that was used before an eviction.
+        """
+        generation = self.shared.get(self.generation_key)
+        if generation is None:
+            self.shared.add(self.generation_key, time.time_ns(), timeout=None)
+            generation = self.shared.get(self.generation_key)
+        return generation
+
+    def invalidate(self):
+        """
+        bump the generation now and again when the transaction commits.
+        the second bump drops results that were computed while the change
+        was not visible to other connections yet.
+        """
+        self._bump()
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            self.shared.incr(self.generation_key)
+        except ValueError:
+            self.shared.add(self.generation_key, time.time_ns(), timeout=None)
+
+    def make_key(self, query, mode, generation):
+        """
+        Args:
+            query (str): user input query string
+            mode (str): search mode
+            generation (int): current generation
+
+        Returns:
+            str: cache key for the search. None when there is nothing to search.
+        """
+        terms = sorted({term.casefold() for term in split_search_query(query)})
+        if not terms:
+            return None
+        mode = mode or settings.PHRASE_SEARCH_MODE
+        digest = hashlib.sha1(json.dumps(terms).encode()).hexdigest()
+        return f'eigo:search:{generation}:{mode}:{digest}'
+
+    def search(self, query, mode=None):
+        """
+        cached version of Phrase.objects.search().
+
+        Args:
+            query (str): user input query string
+            mode (str): search mode passed to Phrase.objects.search()
+
+        Returns:
+            queryset: phrases matching the query. ranked results keep their 'rank' annotation.
+        """
+        from .models import Phrase
+        key = self.make_key(query, mode, self.generation())
+        if key is None:
+            return Phrase.objects.none()
+        results = self.cache.get(key)
+        if results is None:
+            self._count(self.misses_key)
+            record_cache(misses=1)
+            queryset = Phrase.objects.search(query, mode=mode)
+            ranked = 'rank' in queryset.query.annotations
+            fields = ('pk', 'rank') if ranked else ('pk',)
+            limit = settings.PHRASE_SEARCH_CACHE_MAX_RESULTS
+            rows = list(queryset.values_list(*fields)[:limit + 1])
+            if len(rows) > limit:
+                # too many to cache. search again the normal way
+                return queryset
+            results = {'ranked': ranked,
+                       'rows': [(str(row[0]),) + tuple(row[1:]) for row in rows]}
+            self.cache.set(key, results)
+        else:
+            self._count(self.hits_key)
+            record_cache(hits=1)
+        return self._to_queryset(Phrase, results)
+
+    def _to_queryset(self, model, results):
+        rows = results['rows']
+        if not rows:
+            return model.objects.none()
+        # only active phrases, in case the entry was cached before one was deactivated
+        queryset = model.objects.all().filter(pk__in=[row[0] for row in rows])
+        if results['ranked']:
+            rank = Case(*(When(pk=pk, then=Value(score)) for pk, score in rows),
+                        output_field=FloatField())
+            queryset = queryset.annotate(rank=rank).order_by('-rank', '-id')
+        return queryset
+
+    def _count(self, key):
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.add(key, 0, timeout=None)
+            self.shared.incr(key)
+
+    def stats(self):
+        """
+        Returns:
+            Dict: hits, misses and hit rate since the counters were reset
+        """
+        hits = self.shared.get(self.hits_key, 0)
+        misses = self.shared.get(self.misses_key, 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else None,
+        }
+
+    def reset_stats(self):
+        """
+        reset the hit and miss counters.
+        """
+        self.shared.delete_many([self.hits_key, self.misses_key])
+
+
+search_cache = SearchCache()
+
+
+class DailyPhraseCache:
+    """
+    cache of the phrase of the day.
+
+    the page and the json endpoint are served from a cache get of the payload
+    and one of the generation. on a miss the pick is read with one indexed lookup
+    on (date, user), and a new phrase is picked when there is no pick yet or
+    the picked phrase has been deactivated since.
+
+    the payloads may stay in the memory of each process. the generation in their
+    keys is kept in the shared cache like SearchCache's, and changing a picked
+    phrase bumps it, so every process stops serving the old payloads at once.
+
+    Attributes:
+        alias (str): name of the cache in settings.CACHES holding the payloads
+        generation_alias (str): name of the shared cache holding the generation
+    """
+    generation_key = 'eigo:daily:generation'
+
+    def __init__(self, alias='default', generation_alias='shared'):
+        self.alias = alias
+        self.generation_alias = generation_alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        return caches[self.generation_alias]
+
+    def generation(self):
+        """
+        Returns:
+            int: current generation. initialized from the clock like SearchCache.generation().
+        """
+        generation = self.shared.get(self.generation_key)
+        if generation is None:
+            self.shared.add(self.generation_key, time.time_ns(), timeout=None)
+            generation = self.shared.get(self.generation_key)
+        return generation
+
+    def make_key(self, date, user_id=None, generation=None):
+        """
+        Args:
+            date (date): the day
+            user_id (int): pk of the user. None for the pick shared by everyone.
+            generation (int): current generation. read from the shared cache when None.
+
+        Returns:
+            str: cache key for the phrase of the day
+        """
+        generation = self.generation() if generation is None else generation
+        return f'eigo:daily:{generation}:{date.isoformat()}:{user_id or "all"}'
+
+    def get(self, user=None, date=None):
+        """
+        Args:
+            user (User): user to serve. None for the pick shared by everyone.
+            date (date): the day. defaults to today.
+
+        Returns:
+            Dict: the phrase of the day, its examples and snaps. None if there are no phrases.
+        """
+        from .models import DailyPhrase
+        date = date or timezone.localdate()
+        key = self.make_key(date, user.pk if user else None)
+        payload = self.cache.get(key)
+        record_cache(hits=payload is not None, misses=payload is None)
+        if payload is None:
+            daily = DailyPhrase.objects.pick(date, user)
+            if daily is None:
+                return None
+            payload = self.to_payload(daily)
+            self.cache.set(key, payload, self.timeout(date))
+        return payload
+
+    def to_payload(self, daily):
+        """
+        Args:
+            daily (DailyPhrase): the pick
+
+        Returns:
+            Dict: json serializable phrase of the day
+        """
+        phrase = daily.phrase
+        return {
+            'date': daily.date.isoformat(),
+            'id': str(phrase.pk),
+            'phrase': phrase.phrase,
+            'url': phrase.get_absolute_url(),
+            'examples': [example.example for example in phrase.examples.all()],
+            'snaps': [snap.snap.url for snap in phrase.snaps.all() if snap.snap],
+        }
+
+    def timeout(self, date):
+        """
+        keep the entry until the day is over.
+
+        Returns:
+            int: seconds until the end of the date. at least a minute.
+        """
+        end = timezone.make_aware(datetime.datetime.combine(
+            date + datetime.timedelta(days=1), datetime.time.min))
+        return max(60, int((end - timezone.now()).total_seconds()))
+
+    def invalidate(self, phrase_id):
+        """
+        drop cached entries that show the phrase.
+        called when the phrase or its examples and snaps change.
+
+        Args:
+            phrase_id (UUID): pk of the changed phrase
+        """
+        self.invalidate_many([phrase_id])
+
+    def invalidate_many(self, phrase_ids):
+        """
+        bump the generation when one of the phrases is a recent pick.
+        like SearchCache.invalidate() it is bumped now and again when the transaction
+        commits, so a payload read before the change was visible is dropped too.
+
+        Args:
+            phrase_ids (List): pks of the changed phrases
+        """
+        from .models import DailyPhrase
+        if not phrase_ids:
+            return
+        since = timezone.localdate() - datetime.timedelta(days=1)
+        if DailyPhrase.objects.filter(phrase_id__in=phrase_ids, date__gte=since).exists():
+            self._bump()
+            transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            self.shared.incr(self.generation_key)
+        except ValueError:
+            self.shared.add(self.generation_key, time.time_ns(), timeout=None)
+
+
+daily_phrase_cache = DailyPhraseCache()
+
+
+class PhraseCellCache:
+    """
+    cache of the rendered phrase cards of the list page.
+
+    a card is stored under the phrase's pk, its 'updated' timestamp, its
+    example and snap counts and its user's id and name, which are everything
+    the card shows that can change. editing the phrase, adding and removing
+    examples and snaps or renaming the user makes a new key,
+    so no invalidation is needed. the old entries expire with the timeout.
+    flush() bumps a version in every key to drop all the cards at once,
+    e.g. after changing the template. the version is kept in the shared cache
+    like SearchCache's generation, so a flush reaches every process.
+
+    Attributes:
+        alias (str): name of the cache in settings.CACHES holding the cards
+        version_alias (str): name of the shared cache holding the version
+        template_name (str): template of a card
+    """
+    version_key = 'eigo:cell:version'
+    template_name = 'eigo/eigo_list_cell.html'
+
+    def __init__(self, alias='default', version_alias='shared'):
+        self.alias = alias
+        self.version_alias = version_alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        return caches[self.version_alias]
+
+    def version(self):
+        """
+        Returns:
+            int: current version. initialized from the clock like SearchCache.generation().
+        """
+        version = self.shared.get(self.version_key)
+        if version is None:
+            self.shared.add(self.version_key, time.time_ns(), timeout=None)
+            version = self.shared.get(self.version_key)
+        return version
+
+    def make_key(self, phrase, version):
+        """
+        Args:
+            phrase (Phrase): phrase of the card
+            version (int): current version
+
+        Returns:
+            str: cache key for the card
+        """
+        # the name is hashed to keep the key short and free of spaces
+        user = hashlib.sha1(str(phrase.user).encode()).hexdigest()[:16]
+        return (f'eigo:cell:{version}:{phrase.pk}:{phrase.updated.timestamp()}:'
+                f'{phrase.example_count}:{phrase.snap_count}:{phrase.user_id}:{user}')
+
+    def render_many(self, phrases):
+        """
+        render the cards of phrases with one cache get_many and one set_many.
+        only the cards that are not cached are rendered.
+
+        Args:
+            phrases (List): phrases to render. the user should be selected along with them.
+
+        Returns:
+            List: rendered html of each card, in the order of phrases
+        """
+        return self._render_many(phrases)[0]
+
+    def warm(self, phrases):
+        """
+        render and store the cards of phrases that are not cached yet.
+
+        Args:
+            phrases (List): phrases to render
+
+        Returns:
+            int: number of cards rendered
+        """
+        return self._render_many(phrases)[1]
+
+    def _render_many(self, phrases):
+        version = self.version()
+        keys = [self.make_key(phrase, version) for phrase in phrases]
+        cached = self.cache.get_many(keys)
+        missing = {}
+        cells = []
+        for key, phrase in zip(keys, phrases):
+            cell = cached.get(key)
+            if cell is None:
+                cell = missing[key] = self.render(phrase)
+            cells.append(mark_safe(cell))
+        record_cache(hits=len(keys) - len(missing), misses=len(missing))
+        if missing:
+            self.cache.set_many(missing, settings.PHRASE_CELL_CACHE_TIMEOUT)
+        return cells, len(missing)
+
+    def render(self, phrase):
+        """
+        Returns:
+            str: rendered html of the card
+        """
+        return str(render_to_string(self.template_name, {'eigo': phrase}))
+
+    def flush(self):
+        """
+        drop every cached card by bumping the version.
+        """
+        try:
+            self.shared.incr(self.version_key)
+        except ValueError:
+            self.shared.add(self.version_key, time.time_ns(), timeout=None)
+
+
+phrase_cell_cache = PhraseCellCache()
@@ -0,0 +1,161 @@
+import csv
+import datetime
+import json
+
+from django.db.models import Exists, OuterRef, Prefetch, Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Example, Phrase, Snap
+
+EXPORT_NDJSON = 'ndjson'
+EXPORT_CSV = 'csv'
+EXPORT_FORMATS = (EXPORT_NDJSON, EXPORT_CSV)
+
+CSV_FIELDS = ['id', 'phrase', 'user', 'timestamp', 'updated', 'is_active', 'examples', 'snaps']
+
+
+def parse_since(value):
+    """
+    Args:
+        value (str): ISO 8601 date or datetime. naive values are in the current time zone.
+
+    Returns:
+        datetime: aware datetime
+
+    Raises:
+        ValueError: if value is not a date or datetime
+    """
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Invalid date: {value}')
+        since = datetime.datetime.combine(date, datetime.time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_queryset(since=None, include_inactive=False):
+    """
+    Args:
+        since (datetime): only phrases that changed at or after this time.
+                          a change of an example or a snap counts as a change of the phrase.
+        include_inactive (bool): also export deactivated phrases
+
+    Returns:
+        queryset: phrases to export, oldest first
+    """
+    queryset = Phrase.objects.get_queryset() if include_inactive else Phrase.objects.all()
+    if since is not None:
+        def changed(model):
+            return Exists(model.objects.get_queryset().filter(
+                phrase=OuterRef('pk'), updated__gte=since))
+
+        queryset = queryset.annotate(
+            examples_changed=changed(Example), snaps_changed=changed(Snap)).filter(
+            Q(updated__gte=since) | Q(examples_changed=True) | Q(snaps_changed=True))
+    return queryset.select_related('user').order_by('timestamp', 'id')
+
+
+def iter_phrases(queryset, chunk_size=1000):
+    """
+    stream phrases as dicts with their active examples and snap urls.
+    rows are read with a server-side cursor in chunks, and the examples and snaps of
+    each chunk are prefetched with one query each, so memory does not grow with the table.
+
+    Args:
+        queryset (QuerySet): phrases to export
+        chunk_size (int): number of phrases read and prefetched at once
+
+    Yields:
+        Dict: json serializable phrase
+    """
+    batch = []
+    for phrase in queryset.iterator(chunk_size=chunk_size):
+        batch.append(phrase)
+        if len(batch) == chunk_size:
+            yield from _serialize_batch(batch)
+            batch = []
+    if batch:
+        yield from _serialize_batch(batch)
+
+
+def _serialize_batch(batch):
+    # iterator() ignores prefetch_related() on this django version
+    prefetch_related_objects(
+        batch,
+        Prefetch('examples', queryset=Example.objects.all().order_by('timestamp'),
+                 to_attr='active_examples'),
+        Prefetch('snaps', queryset=Snap.objects.all().order_by('timestamp'),
+                 to_attr='active_snaps'))
+    for phrase in batch:
+        yield {
+            'id': str(phrase.pk),
+            'phrase': phrase.phrase,
+            'user': phrase.user.username,
+            'timestamp': phrase.timestamp.isoformat(),
+            'updated': phrase.updated.isoformat(),
+            'is_active': phrase.is_active,
+            'examples': [example.example for example in phrase.active_examples],
+            'snaps': [snap.snap.url for snap in phrase.active_snaps if snap.snap],
+        }
+
+
+class Echo:
+    """
+    file-like object that returns what is written, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(rows):
+    """
+    Args:
+        rows (Iterable): dicts from iter_phrases()
+
+    Yields:
+        str: one json document per line
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def render_csv(rows):
+    """
+    examples and snaps are written as json arrays, so they can be read back.
+
+    Args:
+        rows (Iterable): dicts from iter_phrases()
+
+    Yields:
+        str: csv lines starting with the header
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for row in rows:
+        row = dict(row,
+                   examples=json.dumps(row['examples'], ensure_ascii=False),
+                   snaps=json.dumps(row['snaps'], ensure_ascii=False))
+        yield writer.writerow([row[field] for field in CSV_FIELDS])
+
+
+def export_phrases(export_format=EXPORT_NDJSON, since=None, include_inactive=False,
+                   chunk_size=1000):
+    """
+    Args:
+        export_format (str): 'ndjson' or 'csv'
+        since (datetime): only phrases that changed at or after this time
+        include_inactive (bool): also export deactivated phrases
+        chunk_size (int): number of phrases read and prefetched at once
+
+    Returns:
+        Iterator: lines of the export
+    """
+    rows = iter_phrases(export_queryset(since, include_inactive), chunk_size)
+    if export_format == EXPORT_CSV:
+        return render_csv(rows)
+    return render_ndjson(rows)
@@ -1,8 +1,162 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.forms.models import BaseInlineFormSet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from extra_views import InlineFormSetFactory
 
+from core.additional.tasks import task_pool
+from core.additional.uploadhandlers import validate_image_file
+from pages.models import UploadSession
 
-from .models import Example, Snap
+from .models import Example, Phrase, Snap, adjust_count
+from .renditions import generate_renditions
+
+
+class PhraseForm(forms.ModelForm):
+    """
+    form of a Phrase for the create and update views.
+
+    Attributes:
+        last_updated (CharField): 'updated' of the phrase when the form was rendered.
+            PhraseUpdateView refuses to save when the phrase has been saved since.
+    """
+    last_updated = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = Phrase
+        fields = ('phrase',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.instance._state.adding:
+            self.initial.setdefault('last_updated', self.instance.updated.isoformat())
+
+    def clean_last_updated(self):
+        value = self.cleaned_data['last_updated']
+        if not value:
+            return None
+        last_updated = parse_datetime(value)
+        if last_updated is None:
+            raise forms.ValidationError('Reload the page and try again.')
+        return last_updated
+
+
+class LoadedObjectChoiceField(forms.ModelChoiceField):
+    """
+    primary key field of the forms of BatchedInlineFormSet.
+    ModelChoiceField runs a query for every form to check the submitted pk,
+    so it is looked up in the objects the formset has already loaded instead.
+
+    Attributes:
+        formset (BaseModelFormSet): formset the form belongs to
+    """
+
+    def __init__(self, formset, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.formset = formset
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            pk = self.formset.model._meta.pk.to_python(value)
+        except forms.ValidationError:
+            pk = None
+        obj = self.formset._existing_object(pk) if pk is not None else None
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice')
+        return obj
+
+
+class BatchedInlineFormSet(BaseInlineFormSet):
+    """
+    inline formset that writes its objects in batches instead of one form at a time.
+
+    new objects are inserted with one bulk_create, changed objects are written with one
+    bulk_update and deleted objects with one queryset.delete(). unchanged forms are
+    not written, and the submitted primary keys are checked against the objects loaded once.
+    signals do not run for the inserts and updates, so the counter on the phrase is
+    adjusted here and the search vector and caches are refreshed when the view saves
+    the phrase. the deletes send their signals, which adjust the counter themselves.
+    """
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        pk_name = self.model._meta.pk.name
+        field = form.fields.get(pk_name)
+        if isinstance(field, forms.ModelChoiceField):
+            form.fields[pk_name] = LoadedObjectChoiceField(
+                self, field.queryset, initial=field.initial, required=field.required,
+                widget=field.widget)
+
+    def save(self, commit=True):
+        """
+        Returns:
+            List: the new and changed objects
+        """
+        # fills new_objects, changed_objects and deleted_objects without writing
+        instances = super().save(commit=False)
+        if not commit:
+            return instances
+        queryset = self.model.objects.get_queryset()
+        if self.deleted_objects:
+            self.delete_objects(queryset.filter(pk__in=[obj.pk for obj in self.deleted_objects]))
+        if self.changed_objects:
+            self.save_changed([obj for obj, _ in self.changed_objects])
+        if self.new_objects:
+            queryset.bulk_create(self.new_objects)
+            active = sum(obj.is_active for obj in self.new_objects)
+            adjust_count(self.instance.pk, queryset.counter_field, active)
+            self.created(self.new_objects)
+        return instances
+
+    def delete_objects(self, queryset):
+        """
+        Args:
+            queryset (QuerySet): objects of the forms marked for deletion
+        """
+        queryset.delete()
+
+    def save_changed(self, objects):
+        """
+        Args:
+            objects (List): objects of the changed forms, with the form's values set
+        """
+        fields = {name for _, changed in self.changed_objects for name in changed
+                  if name in self.form._meta.fields}
+        now = timezone.now()
+        for obj in objects:
+            obj.updated = now
+        self.model.objects.bulk_update(objects, [*sorted(fields), 'updated'])
+
+    def created(self, objects):
+        """
+        called after the new objects are inserted.
+
+        Args:
+            objects (List): the inserted objects
+        """
+        pass
+
+
+class SnapBatchedInlineFormSet(BatchedInlineFormSet):
+    """
+    BatchedInlineFormSet for snaps.
+    replaced images have to be removed from the storage by the signals,
+    so changed snaps are saved one by one.
+    new snaps are still inserted at once and get their renditions made here.
+    """
+
+    def save_changed(self, objects):
+        for obj in objects:
+            obj.save()
+
+    def created(self, objects):
+        for obj in objects:
+            if obj.snap:
+                task_pool.submit_on_commit(generate_renditions, obj.pk)
 
 
 class ExampleInlineFormSet(InlineFormSetFactory):
@@ -11,29 +165,118 @@ class ExampleInlineFormSet(InlineFormSetFactory):
 
     Attributes:
         model (Example): model to create an inlineformset_factory
+        formset_class (BatchedInlineFormSet): formset that saves the examples in batches
         fields (Tuple): model fields that will be rendered in the template
         prefix (str): set prefix that will be use in the rendered forms in the template.
         factory_kwargs (Dict): a dictionary to set additional information for inlineformset_factory.
     """
     model = Example
+    formset_class = BatchedInlineFormSet
     fields = ('example',)
     prefix = 'example-form'
     factory_kwargs = {'extra': 3, 'max_num': None,
                       'can_order': False, 'can_delete': True}
 
 
+class SnapForm(forms.ModelForm):
+    """
+    form of a Snap in SnapInlineFormSet.
+    checks the size and the type of the uploaded image.
+
+    the image is either posted as 'snap', or uploaded beforehand in chunks
+    and referenced by the pk of its complete UploadSession in 'upload'.
+
+    files rejected by ImageUploadHandler never reach the form,
+    so their errors are passed in as upload_errors and shown on the snap field.
+
+    Attributes:
+        upload (UUIDField): pk of a complete UploadSession of the user
+        upload_errors (Dict): errors recorded by ImageUploadHandler keyed by field name
+        user (User): the user submitting the form. only their upload sessions can be used.
+    """
+    upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = Snap
+        fields = ('snap',)
+
+    def __init__(self, *args, upload_errors=None, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_error = (upload_errors or {}).get(self.add_prefix('snap'))
+        self.user = user
+        self.upload_session = None
+        # either the file or the upload is required. checked in clean()
+        self.fields['snap'].required = False
+
+    def has_changed(self):
+        # an empty extra form would skip validation and drop the error silently
+        return bool(self.upload_error) or super().has_changed()
+
+    def clean_snap(self):
+        if self.upload_error:
+            raise forms.ValidationError(self.upload_error)
+        snap = self.cleaned_data['snap']
+        if isinstance(snap, UploadedFile):
+            validate_image_file(snap)
+        return snap
+
+    def clean_upload(self):
+        upload = self.cleaned_data['upload']
+        if upload is None:
+            return upload
+        try:
+            self.upload_session = UploadSession.objects.get(
+                pk=upload, user=self.user, status=UploadSession.COMPLETE)
+        except UploadSession.DoesNotExist:
+            raise forms.ValidationError('The upload is not finished or has expired.')
+        return upload
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (self.errors or cleaned_data.get('snap') or self.upload_session):
+            self.add_error('snap', self.fields['snap'].error_messages['required'])
+        return cleaned_data
+
+    def save(self, commit=True):
+        """
+        store the file of the upload session and discard the session.
+        """
+        if self.upload_session is not None:
+            with self.upload_session.open() as file:
+                self.instance.snap.save(file.name, file, save=False)
+            self.upload_session.discard()
+            self.upload_session = None
+        return super().save(commit)
+
+
 class SnapInlineFormSet(InlineFormSetFactory):
     """
     inlineformset class using django-extra-views.
 
     Attributes:
         model (Snap): model to create an inlineformset_factory
+        form_class (SnapForm): form used for each snap
+        formset_class (SnapBatchedInlineFormSet): formset that saves the snaps in batches
         fields (Tuple): model fields that will be rendered in the template
         prefix (str): set prefix that will be use in the rendered forms in the template.
         factory_kwargs (Dict): a dictionary to set additional information for inlineformset_factory.
     """
     model = Snap
+    form_class = SnapForm
+    formset_class = SnapBatchedInlineFormSet
     fields = ('snap',)
     prefix = 'snap-form'
     factory_kwargs = {'extra': 5, 'max_num': None,
                       'can_order': False, 'can_delete': True}
+
+    def get_formset_kwargs(self):
+        """
+        pass the errors of ImageUploadHandler and the user to the forms.
+        """
+        kwargs = super().get_formset_kwargs()
+        kwargs['form_kwargs'] = {
+            **kwargs.get('form_kwargs', {}),
+            'upload_errors': getattr(self.request, 'upload_errors', {}),
+            'user': self.request.user,
+        }
+        return kwargs
@@ -0,0 +1,97 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from eigo.benchmark import Benchmark, find_regressions
+
+
+class Command(BaseCommand):
+    """
+    measure the latency, queries and peak memory of the main endpoints
+    on a corpus made by 'manage.py seed_corpus'.
+
+        python manage.py benchmark --output before.json
+        python manage.py benchmark --baseline before.json --output after.json
+
+    measured: the list (first page, a page halfway through and a search),
+    PhraseQueryset.search, the detail page, the create and update forms and their
+    submission (rolled back), and the admin changelist when the user is staff.
+    with --baseline the run is compared with an earlier one and the command fails
+    when an endpoint makes more queries, or gets slower or uses more memory
+    by more than --threshold. compare runs on the same machine and corpus, with DEBUG off.
+    """
+    help = 'Benchmark the eigo endpoints and compare the result with a baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', default='benchmark@example.com', help='email of the user to log in as.')
+        parser.add_argument(
+            '--requests', type=int, default=30, help='measured calls per endpoint.')
+        parser.add_argument(
+            '--warmup', type=int, default=3, help='calls per endpoint before measuring.')
+        parser.add_argument(
+            '--endpoint', action='append',
+            help='name of an endpoint to measure. can be repeated. defaults to all of them.')
+        parser.add_argument(
+            '--output', help='file to save the result to as json.')
+        parser.add_argument(
+            '--baseline', help='json file of an earlier result to compare with.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='allowed growth of latency and memory against the baseline. 0.2 is 20%%.')
+        parser.add_argument(
+            '--json', action='store_true', help='print the result as json.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(
+                f'There is no user with the email "{options["user"]}". Run seed_corpus first.')
+        baseline = self.load(options['baseline']) if options['baseline'] else None
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on. the numbers will not match production.')
+        # the test client sends 'testserver' as the host like in tests
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                               DEFAULT_FILE_STORAGE=settings.BENCHMARK_FILE_STORAGE):
+            client = Client()
+            client.force_login(user)
+            benchmark = Benchmark(client, user, options['requests'], options['warmup'])
+            result = benchmark.run(
+                only=options['endpoint'],
+                progress=None if options['json'] else self.write_endpoint)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            corpus = result['corpus']
+            self.stdout.write(
+                f'{corpus["phrases"]} phrases, {corpus["examples"]} examples and '
+                f'{corpus["snaps"]} snaps on {result["database"]}.')
+        if baseline is not None:
+            regressions = find_regressions(result, baseline, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Can not read the baseline: {e}')
+
+    def write_endpoint(self, name, result):
+        self.stdout.write(
+            f'{name:<18} p50 {result["p50_ms"]:>8.2f}ms  p95 {result["p95_ms"]:>8.2f}ms  '
+            f'{result["queries"]:>3} queries  {result["peak_kib"]:>9.1f}KiB  '
+            f'status {",".join(str(status) for status in result["status"])}')
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from eigo.models import Phrase
+
+
+class Command(BaseCommand):
+    """
+    print the query plan of every query the main eigo views run,
+    to confirm the indexes are used:
+
+        python manage.py explain_views --user someone@example.com
+
+    the views are called directly with a RequestFactory request,
+    so nothing is written to the database (no session or login).
+    """
+    help = 'Print EXPLAIN plans for the queries of the eigo views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='email of the user to render the views as. defaults to the first superuser.')
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='run the queries and show actual times (EXPLAIN ANALYZE on postgresql).')
+        parser.add_argument(
+            '--search', default='the', help='query used for the search list.')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, path in self.get_paths(options['search']):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}: {path}'))
+            for sql in self.capture(path, user):
+                self.stdout.write(sql)
+                for line in self.explain(sql, explain_options):
+                    self.stdout.write(f'    {line}')
+                self.stdout.write('')
+
+    def get_user(self, email):
+        users = get_user_model().objects.all()
+        user = users.filter(email=email).first() if email else (
+            users.filter(is_superuser=True).first())
+        if user is None:
+            raise CommandError('User not found. Pass an existing user with --user.')
+        return user
+
+    def get_paths(self, search):
+        """
+        Returns:
+            List: (name, path) of the views to explain
+        """
+        list_url = reverse('eigo:eigo_list')
+        paths = [
+            ('list', list_url),
+            ('list ordered by phrase', f'{list_url}?ordering=up'),
+            ('list with snaps', f'{list_url}?has_snaps=1'),
+            ('search', f'{list_url}?search={search}'),
+        ]
+        phrase = Phrase.objects.all().order_by('-timestamp', '-id').first()
+        if phrase is not None:
+            paths.append(('detail', phrase.get_absolute_url()))
+        return paths
+
+    def capture(self, path, user):
+        """
+        call the view and render its response.
+
+        Returns:
+            List: SELECT statements the view ran
+        """
+        request = RequestFactory().get(path)
+        request.user = user
+        match = resolve(request.path_info)
+        # run async views (settings.ASYNC_VIEWS) in this thread to see their queries
+        view = match.func.view_class.as_view(**match.func.view_initkwargs)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].lstrip().upper().startswith('SELECT')]
+
+    def explain(self, sql, options):
+        """
+        Returns:
+            List: lines of the plan of the query
+        """
+        prefix = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from eigo.export import EXPORT_FORMATS, EXPORT_NDJSON, export_phrases, parse_since
+
+
+class Command(BaseCommand):
+    """
+    export phrases with their examples and snap urls as ndjson or csv.
+
+        python manage.py export_phrases --format csv --output phrases.csv
+        python manage.py export_phrases --since 2020-08-01 > changes.ndjson
+
+    rows are streamed in chunks, so memory stays flat for any number of phrases.
+    """
+    help = 'Export phrases with their examples and snaps as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default=EXPORT_NDJSON, help='output format.')
+        parser.add_argument(
+            '--since', help='only phrases changed at or after this ISO 8601 date or datetime.')
+        parser.add_argument(
+            '--include-inactive', action='store_true', help='also export deactivated phrases.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000, help='number of phrases read at once.')
+        parser.add_argument(
+            '--output', help='file to write to. defaults to stdout.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as e:
+                raise CommandError(e)
+        lines = export_phrases(options['format'], since, options['include_inactive'],
+                               options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from eigo.models import Snap
+from eigo.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    """
+    make the renditions of snaps that do not have them yet,
+    e.g. snaps saved before renditions existed.
+
+        python manage.py generate_renditions
+        python manage.py generate_renditions --force
+
+    renditions are normally made in the background when a snap is saved.
+    """
+    help = 'Generate webp renditions and placeholders of snaps.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true', help='encode the renditions of every snap again.')
+
+    def handle(self, *args, **options):
+        queryset = Snap.objects.get_queryset().exclude(snap='')
+        if not options['force']:
+            queryset = queryset.filter(width__isnull=True)
+        done = failed = 0
+        for pk in queryset.values_list('pk', flat=True).iterator():
+            if generate_renditions(pk, force=options['force']) is None:
+                failed += 1
+            else:
+                done += 1
+        self.stdout.write(f'Generated renditions of {done} snaps. {failed} could not be read.')
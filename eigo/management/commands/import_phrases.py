@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from eigo.cache import search_cache
+from eigo.export import EXPORT_CSV, EXPORT_FORMATS, EXPORT_NDJSON
+from eigo.models import Example, Phrase
+from eigo.search import update_search_vector
+
+
+class Command(BaseCommand):
+    """
+    import phrases and their examples from a csv or ndjson file.
+
+        python manage.py import_phrases phrases.ndjson --user admin@example.com
+
+    reads the same formats as export_phrases writes. a row needs 'phrase' and can have
+    'examples' (a list, or in csv a json array or a single example), 'user' (username)
+    and 'is_active'. rows whose phrase already exists are skipped.
+
+    the file is read as a stream and written with bulk_create in batches,
+    one transaction per batch. signals do not run for bulk_create, so the counts,
+    search vectors and the search cache are updated here.
+    """
+    help = 'Import phrases and examples from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to import.')
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS,
+            help='input format. guessed from the file extension by default.')
+        parser.add_argument(
+            '--user', required=True,
+            help='email of the user who owns rows without a known user.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help='number of phrases written at once.')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        owner = users.filter(email=options['user']).first()
+        if owner is None:
+            raise CommandError(f'User not found: {options["user"]}')
+        self.user_ids = {owner.username: owner.pk}
+        self.default_user_id = owner.pk
+        self.seen = set()
+        self.stats = {'phrases': 0, 'examples': 0, 'skipped': 0}
+        self.started = time.monotonic()
+
+        import_format = options['format'] or self.guess_format(options['path'])
+        with open(options['path'], encoding='utf-8', newline='') as f:
+            rows = self.read_csv(f) if import_format == EXPORT_CSV else self.read_ndjson(f)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == options['batch_size']:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        if self.stats['phrases']:
+            search_cache.invalidate()
+        self.stdout.write(self.progress('Imported'))
+
+    def guess_format(self, path):
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in EXPORT_FORMATS:
+            return extension
+        if extension in ('json', 'jsonl'):
+            return EXPORT_NDJSON
+        raise CommandError(f'Can not guess the format of {path}. Pass --format.')
+
+    def read_ndjson(self, f):
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise CommandError(f'Invalid json on line {number}.')
+            yield self.clean(row, number)
+
+    def read_csv(self, f):
+        for number, row in enumerate(csv.DictReader(f), 2):
+            examples = (row.get('examples') or '').strip()
+            if examples.startswith('['):
+                try:
+                    examples = json.loads(examples)
+                except ValueError:
+                    raise CommandError(f'Invalid examples on line {number}.')
+            row['examples'] = examples
+            if 'is_active' in row:
+                row['is_active'] = row['is_active'].strip().lower() not in ('false', '0', '')
+            yield self.clean(row, number)
+
+    def clean(self, row, number):
+        """
+        Returns:
+            Dict: phrase, examples, user and is_active of the row
+        """
+        phrase = (row.get('phrase') or '').strip()
+        if not phrase or len(phrase) > Phrase._meta.get_field('phrase').max_length:
+            raise CommandError(f'Invalid phrase on line {number}.')
+        examples = row.get('examples') or []
+        if isinstance(examples, str):
+            examples = [examples]
+        return {
+            'phrase': phrase,
+            'examples': [example for example in examples if example],
+            'user': row.get('user'),
+            'is_active': row.get('is_active', True) is not False,
+        }
+
+    def import_batch(self, rows):
+        """
+        write the new phrases of rows and their examples in one transaction.
+        """
+        phrases = {row['phrase'] for row in rows} - self.seen
+        existing = set(Phrase.objects.get_queryset().filter(
+            phrase__in=phrases).values_list('phrase', flat=True))
+        self.resolve_users(rows)
+        new_phrases, new_examples = [], []
+        for row in rows:
+            if row['phrase'] in self.seen or row['phrase'] in existing:
+                self.stats['skipped'] += 1
+                continue
+            self.seen.add(row['phrase'])
+            phrase = Phrase(
+                phrase=row['phrase'],
+                user_id=self.user_ids.get(row['user'], self.default_user_id),
+                is_active=row['is_active'],
+                example_count=len(row['examples']))
+            new_phrases.append(phrase)
+            new_examples += [Example(phrase=phrase, example=example)
+                             for example in row['examples']]
+        with transaction.atomic():
+            Phrase.objects.bulk_create(new_phrases)
+            Example.objects.bulk_create(new_examples)
+            if new_phrases:
+                update_search_vector(Phrase.objects.get_queryset().filter(
+                    pk__in=[phrase.pk for phrase in new_phrases]))
+        self.stats['phrases'] += len(new_phrases)
+        self.stats['examples'] += len(new_examples)
+        self.stdout.write(self.progress('Imported'))
+
+    def resolve_users(self, rows):
+        usernames = {row['user'] for row in rows if row['user']} - set(self.user_ids)
+        if usernames:
+            found = dict(get_user_model().objects.filter(
+                username__in=usernames).values_list('username', 'pk'))
+            for username in usernames:
+                self.user_ids[username] = found.get(username, self.default_user_id)
+
+    def progress(self, label):
+        elapsed = time.monotonic() - self.started
+        rate = self.stats['phrases'] / elapsed if elapsed else 0
+        return (f'{label} {self.stats["phrases"]} phrases and {self.stats["examples"]} examples, '
+                f'skipped {self.stats["skipped"]} in {elapsed:.1f}s ({rate:.0f} phrases/s).')
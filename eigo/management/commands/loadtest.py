@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.shortcuts import reverse
+from django.test import AsyncClient, Client, override_settings
+
+from eigo.benchmark import percentile
+
+MODE_WSGI = 'wsgi'
+MODE_ASGI = 'asgi'
+
+
+class Command(BaseCommand):
+    """
+    compare how many requests one process serves under WSGI and ASGI
+    when the database is slow.
+
+        python manage.py loadtest --user me@example.com --compare
+        ASYNC_VIEWS=1 python manage.py loadtest --user me@example.com --mode asgi --concurrency 50
+
+    every query sleeps for --latency ms, standing in for a database or api across the network.
+    the requests go through django's WSGI or ASGI handler in this process, without a server:
+    wsgi mode sends them one at a time like a gunicorn sync worker,
+    asgi mode keeps --concurrency of them in flight like a uvicorn worker.
+    --compare runs both modes in subprocesses, with settings.ASYNC_VIEWS off and on.
+    """
+    help = 'Measure requests per second of one process under WSGI and ASGI with a slow database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', required=True, help='email of the user to log in as.')
+        parser.add_argument(
+            '--mode', choices=[MODE_WSGI, MODE_ASGI], default=MODE_WSGI,
+            help='handler to send the requests through. defaults to wsgi.')
+        parser.add_argument(
+            '--compare', action='store_true', help='run both modes and compare them.')
+        parser.add_argument(
+            '--path', action='append',
+            help='path to request. can be repeated. defaults to the list, search, suggest and detail pages.')
+        parser.add_argument(
+            '--requests', type=int, default=200, help='number of requests to send.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20, help='requests in flight at once in asgi mode.')
+        parser.add_argument(
+            '--latency', type=float, default=20, help='milliseconds added to every query.')
+        parser.add_argument(
+            '--json', action='store_true', help='print the result as json.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(options)
+            return
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'There is no user with the email "{options["user"]}".')
+        paths = options['path'] or self.default_paths(user)
+        self.slow_down(options['latency'] / 1000)
+        # the test clients send 'testserver' as the host like in tests
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if options['mode'] == MODE_WSGI:
+                client = Client()
+                client.force_login(user)
+                latencies, errors, elapsed = self.run_wsgi(client, paths, options['requests'])
+                concurrency = 1
+            else:
+                client = AsyncClient()
+                client.force_login(user)
+                concurrency = options['concurrency']
+                latencies, errors, elapsed = asyncio.run(
+                    self.run_asgi(client, paths, options['requests'], concurrency))
+        result = {
+            'mode': options['mode'],
+            'async_views': settings.ASYNC_VIEWS,
+            'requests': options['requests'],
+            'concurrency': concurrency,
+            'latency_ms': options['latency'],
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(options['requests'] / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.write_result(result)
+
+    def default_paths(self, user):
+        from eigo.models import Phrase
+        paths = [
+            reverse('eigo:eigo_list'),
+            f'{reverse("eigo:eigo_list")}?search=the',
+            f'{reverse("eigo:eigo_suggest")}?q=a',
+        ]
+        phrase = Phrase.objects.filter(user=user).order_by('-timestamp').first()
+        if phrase is not None:
+            paths.append(phrase.get_absolute_url())
+        return paths
+
+    def slow_down(self, seconds):
+        """
+        make every query of every connection, including the ones opened later
+        by other threads, sleep before it runs.
+        """
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        if seconds <= 0:
+            return
+        connection_created.connect(install, weak=False)
+        for connection in connections.all():
+            connection.execute_wrappers.append(slow_query)
+
+    def run_wsgi(self, client, paths, count):
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(count):
+            begin = time.perf_counter()
+            response = client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - begin)
+            errors += response.status_code != 200
+        return latencies, errors, time.perf_counter() - started
+
+    async def run_asgi(self, client, paths, count, concurrency):
+        latencies, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(path):
+            nonlocal errors
+            async with semaphore:
+                begin = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - begin)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch(paths[i % len(paths)]) for i in range(count)))
+        return latencies, errors, time.perf_counter() - started
+
+    def compare(self, options):
+        results = []
+        for mode, async_views in ((MODE_WSGI, '0'), (MODE_ASGI, '1')):
+            command = [sys.executable, '-m', 'django', 'loadtest', '--json',
+                       '--mode', mode,
+                       '--user', options['user'],
+                       '--requests', str(options['requests']),
+                       '--concurrency', str(options['concurrency']),
+                       '--latency', str(options['latency'])]
+            for path in options['path'] or []:
+                command += ['--path', path]
+            env = {**os.environ, 'ASYNC_VIEWS': async_views,
+                   'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings')}
+            process = subprocess.run(command, env=env, cwd=settings.BASE_DIR,
+                                     stdout=subprocess.PIPE, universal_newlines=True)
+            if process.returncode:
+                raise CommandError(f'The {mode} run failed.')
+            results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for result in results:
+            self.write_result(result)
+        wsgi, asgi = results
+        self.stdout.write(
+            f'asgi serves {asgi["requests_per_second"] / wsgi["requests_per_second"]:.1f}x '
+            f'the requests per second of wsgi.')
+
+    def write_result(self, result):
+        self.stdout.write(
+            f'{result["mode"]} (async views {"on" if result["async_views"] else "off"}): '
+            f'{result["requests"]} requests, {result["concurrency"]} at once, '
+            f'{result["latency_ms"]:g}ms per query. '
+            f'{result["requests_per_second"]} requests/s, '
+            f'p50 {result["p50_ms"]}ms, p95 {result["p95_ms"]}ms, {result["errors"]} errors.')
+
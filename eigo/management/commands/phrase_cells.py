@@ -0,0 +1,63 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from eigo.cache import phrase_cell_cache
+from eigo.models import Phrase
+
+
+class Command(BaseCommand):
+    """
+    flush or warm the cached phrase cards of the list page.
+
+        python manage.py phrase_cells --flush
+        python manage.py phrase_cells --warm --limit 1000
+
+    flush after changing eigo/eigo_list_cell.html or renaming users,
+    since the cards are only re-rendered when the phrase or its counts change.
+
+    the command runs in a process of its own, so it refuses to run when the cache
+    it would write to is the memory of its own process (LocMemCache):
+    --flush needs the version in a shared cache and --warm needs the cards in one.
+    """
+    help = 'Flush or warm the cached phrase cards of the list page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flush', action='store_true', help='drop every cached card.')
+        parser.add_argument(
+            '--warm', action='store_true', help='render the cards that are not cached yet.')
+        parser.add_argument(
+            '--limit', type=int, help='only warm the newest phrases. defaults to all.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500, help='number of phrases read at once.')
+
+    def handle(self, *args, **options):
+        if not options['flush'] and not options['warm']:
+            raise CommandError('Pass --flush, --warm or both.')
+        if options['flush']:
+            self.check_shared(phrase_cell_cache.version_alias)
+        if options['warm']:
+            self.check_shared(phrase_cell_cache.alias)
+        if options['flush']:
+            phrase_cell_cache.flush()
+            self.stdout.write('Flushed the phrase cards.')
+        if options['warm']:
+            queryset = Phrase.objects.all().order_by('-timestamp', '-id').for_list()
+            if options['limit']:
+                queryset = queryset[:options['limit']]
+            batch, rendered = [], 0
+            for phrase in queryset.iterator(chunk_size=options['batch_size']):
+                batch.append(phrase)
+                if len(batch) == options['batch_size']:
+                    rendered += phrase_cell_cache.warm(batch)
+                    batch = []
+            if batch:
+                rendered += phrase_cell_cache.warm(batch)
+            self.stdout.write(f'Rendered {rendered} phrase cards.')
+
+    def check_shared(self, alias):
+        if isinstance(caches[alias], LocMemCache):
+            raise CommandError(
+                f'The "{alias}" cache is in the memory of each process, so the web '
+                'processes would not see the change. Use a cache they share.')
@@ -0,0 +1,47 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from eigo.models import DailyPhrase
+
+
+class Command(BaseCommand):
+    """
+    pick and save the phrase of the day.
+    meant to be run once a day by a scheduler, e.g. heroku scheduler:
+
+        python manage.py pick_daily_phrase --days 2
+
+    picking is deterministic and an existing pick is kept,
+    so running it more than once for the same day is safe.
+    """
+    help = 'Pick and save the phrase of the day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', help='first day to pick for as YYYY-MM-DD. defaults to today.')
+        parser.add_argument(
+            '--days', type=int, default=1, help='number of days to pick for.')
+        parser.add_argument(
+            '--per-user', action='store_true', help='also pick for each active user.')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                start = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f'Invalid date: {options["date"]}')
+        else:
+            start = timezone.localdate()
+        users = [None]
+        if options['per_user']:
+            users += list(get_user_model().objects.filter(is_active=True))
+        for offset in range(options['days']):
+            date = start + datetime.timedelta(days=offset)
+            for user in users:
+                daily = DailyPhrase.objects.pick(date, user)
+                if daily is None:
+                    raise CommandError('There are no active phrases to pick from.')
+                self.stdout.write(f'{date} {user or "everyone"}: {daily.phrase}')
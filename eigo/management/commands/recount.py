@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from eigo.models import Phrase
+
+
+class Command(BaseCommand):
+    """
+    repair Phrase.example_count and Phrase.snap_count.
+    the counters are maintained by signals and queryset.update(),
+    but raw SQL, fixtures and bulk operations can make them drift.
+    """
+    help = 'Recompute the stored example and snap counts of phrases.'
+
+    def handle(self, *args, **options):
+        fixed = Phrase.objects.get_queryset().recount()
+        self.stdout.write(f'{fixed} phrases had wrong counts.')
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from eigo.benchmark import CorpusSeeder
+
+
+class Command(BaseCommand):
+    """
+    fill the database with a synthetic corpus for 'manage.py benchmark'.
+
+        python manage.py seed_corpus --phrases 100000
+
+    phrases are added to the --user, who is created as a superuser without a password
+    when they do not exist, so the admin can be measured too. running it again adds
+    more phrases, e.g. 10k, then 90k more to reach 100k. the snaps share a few images
+    stored with settings.BENCHMARK_FILE_STORAGE (the local file system).
+    use a database of its own: the corpus is only removed by flushing it.
+    """
+    help = 'Bulk-generate phrases, examples and snaps for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--phrases', type=int, default=10000, help='number of phrases to add.')
+        parser.add_argument(
+            '--user', default='benchmark@example.com', help='email of the owner of the phrases.')
+        parser.add_argument(
+            '--examples', type=int, default=3, help='average number of examples per phrase.')
+        parser.add_argument(
+            '--snap-ratio', type=float, default=0.2, help='share of phrases with a snap.')
+        parser.add_argument(
+            '--images', type=int, default=8, help='number of distinct snap images.')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000, help='number of phrases written at once.')
+        parser.add_argument(
+            '--seed', type=int, default=0, help='seed of the random generator.')
+
+    def handle(self, *args, **options):
+        if options['phrases'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--phrases and --batch-size must be at least 1.')
+        if not 0 <= options['snap_ratio'] <= 1:
+            raise CommandError('--snap-ratio must be between 0 and 1.')
+        user = self.get_user(options['user'])
+        seeder = CorpusSeeder(
+            user, examples=options['examples'], snap_ratio=options['snap_ratio'],
+            batch_size=options['batch_size'], images=max(1, options['images']),
+            seed=options['seed'])
+        self.started = time.monotonic()
+        with override_settings(DEFAULT_FILE_STORAGE=settings.BENCHMARK_FILE_STORAGE):
+            stats = seeder.seed(options['phrases'], progress=self.report)
+        self.stdout.write(self.style.SUCCESS(self.progress('Seeded', stats)))
+
+    def get_user(self, email):
+        user = get_user_model().objects.filter(email=email).first()
+        if user is None:
+            user = get_user_model().objects.create_superuser(
+                username=email.split('@')[0], email=email, password=None)
+        return user
+
+    def report(self, stats):
+        self.stdout.write(self.progress('Seeded', stats))
+
+    def progress(self, label, stats):
+        elapsed = time.monotonic() - self.started
+        rate = stats['phrases'] / elapsed if elapsed else 0
+        return (f'{label} {stats["phrases"]} phrases, {stats["examples"]} examples and '
+                f'{stats["snaps"]} snaps, skipped {stats["skipped"]} '
+                f'in {elapsed:.1f}s ({rate:.0f} phrases/s).')
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+import core.additional.operations
+import eigo.search
+
+
+def fill_search_vector(apps, schema_editor):
+    Phrase = apps.get_model('eigo', 'Phrase')
+    Example = apps.get_model('eigo', 'Example')
+    Phrase._base_manager.using(schema_editor.connection.alias).update(
+        search_vector=eigo.search.phrase_search_vector(Example))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eigo', '0006_auto_20200806_1655'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phrase',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        core.additional.operations.PostgresAddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='eigo_phrase_search_gin'),
+        ),
+        core.additional.operations.PostgresRunPython(
+            fill_search_vector, migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:36
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+import core.additional.operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eigo', '0007_phrase_search_vector'),
+    ]
+
+    operations = [
+        core.additional.operations.PostgresCreateExtension('pg_trgm'),
+        core.additional.operations.PostgresAddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phrase'], name='eigo_phrase_trgm_gin', opclasses=['gin_trgm_ops']),
+        ),
+    ]
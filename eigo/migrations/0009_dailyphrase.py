@@ -0,0 +1,40 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('eigo', '0008_phrase_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPhrase',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('date', models.DateField()),
+                ('phrase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_picks', to='eigo.phrase')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyphrase',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('date',), name='eigo_dailyphrase_unique_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyphrase',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=False), fields=('date', 'user'), name='eigo_dailyphrase_unique_date_user'),
+        ),
+    ]
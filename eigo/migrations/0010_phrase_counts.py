@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:42
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counts(apps, schema_editor):
+    Phrase = apps.get_model('eigo', 'Phrase')
+
+    def active_count(model):
+        count = model._base_manager.filter(
+            phrase=OuterRef('pk'), is_active=True).order_by().values(
+            'phrase').annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+    Phrase._base_manager.using(schema_editor.connection.alias).update(
+        example_count=active_count(apps.get_model('eigo', 'Example')),
+        snap_count=active_count(apps.get_model('eigo', 'Snap')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eigo', '0009_dailyphrase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phrase',
+            name='example_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='phrase',
+            name='snap_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='phrase',
+            index=models.Index(condition=models.Q(('is_active', True), ('snap_count__gt', 0)), fields=['-timestamp', '-id'], name='eigo_phrase_has_snaps_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+import core.additional.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('eigo', '0010_phrase_counts'),
+    ]
+
+    operations = [
+        core.additional.operations.AddIndexConcurrently(
+            model_name='example',
+            index=models.Index(fields=['phrase', 'is_active'], name='eigo_example_phrase_active_idx'),
+        ),
+        core.additional.operations.AddIndexConcurrently(
+            model_name='phrase',
+            index=models.Index(condition=models.Q(is_active=True), fields=['-timestamp', '-id'], name='eigo_phrase_active_recent_idx'),
+        ),
+        core.additional.operations.AddIndexConcurrently(
+            model_name='phrase',
+            index=models.Index(condition=models.Q(is_active=True), fields=['phrase'], name='eigo_phrase_active_phrase_idx'),
+        ),
+        core.additional.operations.AddIndexConcurrently(
+            model_name='snap',
+            index=models.Index(fields=['phrase', 'is_active'], name='eigo_snap_phrase_active_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eigo', '0011_active_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snap',
+            name='height',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='snap',
+            name='renditions',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='snap',
+            name='width',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:59
+
+from django.db import migrations, models
+import eigo.models
+import pages.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eigo', '0012_snap_renditions'),
+        ('pages', '0002_storedfile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='snap',
+            name='snap',
+            field=models.ImageField(storage=pages.storage.ContentAddressedStorage(), upload_to=eigo.models.upload_image_to),
+        ),
+    ]
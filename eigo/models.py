@@ -1,14 +1,26 @@
+from datetime import timedelta
 from functools import reduce
+import hashlib
 import operator
-import itertools
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField, TrigramSimilarity)
 from django.db import models
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import (Case, Count, F, FloatField, IntegerField, OuterRef,
+                              Prefetch, Q, Subquery, Value, When)
+from django.db.models.functions import Cast, Coalesce, Greatest
 from django.urls import reverse
 from martor.models import MartorField
 
 from core.additional.models import CoreModel
+from pages.storage import content_addressed_storage
+from .search import (SEARCH_CONFIG, SEARCH_FULLTEXT, SEARCH_FUZZY,
+                     fuzzy_match, set_similarity_threshold, split_search_query,
+                     supports_fulltext, supports_trigram, update_search_vector)
 
 
 class PhraseQueryset(models.QuerySet):
@@ -23,21 +35,284 @@ class PhraseQueryset(models.QuerySet):
         """
         return self.filter(is_active=True)
 
-    def search(self, query):
+    def update(self, **kwargs):
+        """
+        queryset.update() does not send signals, so the search cache and
+        the cached phrases of the day are invalidated here when the phrase
+        or is_active change (e.g. by the admin's deactivate action).
+        """
+        if not kwargs.keys() & {'phrase', 'is_active'}:
+            return super().update(**kwargs)
+        from .cache import daily_phrase_cache, search_cache
+        phrase_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        if rows:
+            search_cache.invalidate()
+            daily_phrase_cache.invalidate_many(phrase_ids)
+        return rows
+
+    def search(self, query, mode=None):
         """
         custom search for the model.
         it works for search that include space ' ' and ',' in the search form.
 
+        Args:
+            query (str): user input query string
+            mode (str): 'fulltext', 'fuzzy' or 'contains'. defaults to settings.PHRASE_SEARCH_MODE.
+                        'fulltext' falls back to 'contains' on databases other than postgresql.
+
         Returns:
             queryset: return filtered queryset using user input.
         """
-        query_list = [i.split(',') for i in query.split(' ')]
-        query_list = list(itertools.chain.from_iterable(query_list))
-        query_list = [i for i in query_list if i != '']
+        query_list = split_search_query(query)
+        if not query_list:
+            return self.none()
+        mode = mode or settings.PHRASE_SEARCH_MODE
+        if mode == SEARCH_FUZZY:
+            return self.fuzzy_search(' '.join(query_list))
+        if mode == SEARCH_FULLTEXT and supports_fulltext(self.db):
+            return self.fulltext_search(query_list)
+        return self.contains_search(query_list)
+
+    def contains_search(self, query_list):
+        """
+        match phrases that contain any of the search terms.
+
+        Args:
+            query_list (List): search terms
+
+        Returns:
+            queryset: return filtered queryset
+        """
         lookup = reduce(operator.or_, (Q(is_active=True) & Q(
             phrase__icontains=option) for option in query_list))
         return self.filter(lookup)
 
+    def fulltext_search(self, query_list):
+        """
+        match phrases whose search_vector matches any of the search terms.
+        uses the GIN index on search_vector. postgresql only.
+
+        Args:
+            query_list (List): search terms
+
+        Note:
+            ts_rank returns a 'real'. it is cast to double precision so the value
+            round-trips exactly through the cursor of KeysetPaginator.
+
+        Returns:
+            queryset: return filtered queryset annotated with 'rank', best match first
+        """
+        search_query = reduce(operator.or_, (SearchQuery(
+            option, config=SEARCH_CONFIG) for option in query_list))
+        return self.filter(
+            is_active=True, search_vector=search_query).annotate(
+            rank=Cast(SearchRank(models.F('search_vector'), search_query),
+                      FloatField())).order_by(
+            '-rank', '-id')
+
+    def fuzzy_search(self, query, threshold=None, limit=None):
+        """
+        typo tolerant search using trigram similarity between the query and the phrase.
+        on postgresql it uses pg_trgm and the GIN trigram index on phrase.
+        on other databases the similarity is computed in python.
+
+        Args:
+            query (str): user input query string
+            threshold (float): minimum similarity. defaults to settings.PHRASE_FUZZY_THRESHOLD.
+            limit (int): maximum number of results. defaults to settings.PHRASE_FUZZY_LIMIT.
+
+        Returns:
+            queryset: the best matches annotated with 'rank' (the similarity), best match first
+        """
+        if threshold is None:
+            threshold = settings.PHRASE_FUZZY_THRESHOLD
+        limit = limit or settings.PHRASE_FUZZY_LIMIT
+        if supports_trigram(self.db):
+            set_similarity_threshold(self.db, threshold)
+            similarity = Cast(TrigramSimilarity('phrase', query), FloatField())
+            best = self.filter(is_active=True, phrase__trigram_similar=query).annotate(
+                rank=similarity).order_by('-rank', '-id').values('pk')[:limit]
+            return self.filter(pk__in=Subquery(best)).annotate(
+                rank=similarity).order_by('-rank', '-id')
+        matches = fuzzy_match(
+            self.filter(is_active=True).values_list('pk', 'phrase').iterator(),
+            query, threshold, limit)
+        if not matches:
+            return self.none()
+        rank = Case(*(When(pk=pk, then=Value(score)) for pk, score in matches),
+                    output_field=FloatField())
+        return self.filter(pk__in=[pk for pk, _ in matches]).annotate(
+            rank=rank).order_by('-rank', '-id')
+
+    def for_list(self):
+        """
+        fetch everything a list cell renders in a single query.
+        the counts are stored on the phrase, so only the user has to be joined.
+
+        Returns:
+            queryset: queryset with user joined
+        """
+        return self.select_related('user')
+
+    def for_detail(self):
+        """
+        fetch everything the detail page renders in a fixed number of queries.
+        active examples and snaps are prefetched to 'active_examples' and 'active_snaps'.
+
+        Note:
+            the related managers' all() filters is_active on top of the prefetched
+            result which triggers a new query, so the prefetch is stored with to_attr.
+
+        Returns:
+            queryset: queryset with user joined and relations prefetched
+        """
+        return self.for_list().prefetch_related(
+            Prefetch('examples',
+                     queryset=Example.objects.all().order_by('timestamp'),
+                     to_attr='active_examples'),
+            Prefetch('snaps',
+                     queryset=Snap.objects.all().order_by('timestamp'),
+                     to_attr='active_snaps'))
+
+    def with_children_updated(self):
+        """
+        annotate the newest 'updated' of the active examples and snaps
+        as 'examples_updated' and 'snaps_updated'. None when there are none.
+        used to build the ETag and Last-Modified of the detail page.
+
+        Returns:
+            queryset: queryset with the annotations
+        """
+        return self.annotate(examples_updated=last_updated(Example),
+                             snaps_updated=last_updated(Snap))
+
+    def has_snaps(self):
+        """
+        Returns:
+            queryset: phrases with at least one active snap. backed by a partial index.
+        """
+        return self.filter(snap_count__gt=0)
+
+    def recount(self):
+        """
+        recompute the stored example_count and snap_count from the related rows.
+        used to repair drift.
+
+        Returns:
+            int: number of phrases whose counts were wrong
+        """
+        drifted = self.annotate(
+            real_example_count=active_count(Example),
+            real_snap_count=active_count(Snap)).exclude(
+            example_count=F('real_example_count'),
+            snap_count=F('real_snap_count')).values_list('pk', flat=True)
+        return self.model._base_manager.filter(pk__in=drifted).update(
+            example_count=active_count(Example),
+            snap_count=active_count(Snap))
+
+
+def active_count(model):
+    """
+    build a subquery expression counting active rows of model related to the outer phrase.
+
+    Args:
+        model (Model): a model with a 'phrase' foreign key and 'is_active' field
+
+    Returns:
+        Coalesce: expression that evaluates to the number of active related rows
+    """
+    count = model.objects.get_queryset().filter(
+        phrase=OuterRef('pk'), is_active=True).order_by().values(
+        'phrase').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+
+def last_updated(model):
+    """
+    build a subquery expression for the newest 'updated' of active rows of model
+    related to the outer phrase.
+
+    Args:
+        model (Model): a model with a 'phrase' foreign key and 'is_active' field
+
+    Returns:
+        Subquery: expression that evaluates to a datetime or None
+    """
+    updated = model.objects.get_queryset().filter(
+        phrase=OuterRef('pk'), is_active=True).order_by('-updated').values('updated')[:1]
+    return Subquery(updated)
+
+
+def adjust_count(phrase_id, field, delta):
+    """
+    atomically add delta to a stored counter of a phrase with an F() expression.
+    never goes below zero.
+
+    Args:
+        phrase_id (UUID): pk of the phrase
+        field (str): 'example_count' or 'snap_count'
+        delta (int): number to add. can be negative.
+    """
+    if not delta or phrase_id is None:
+        return
+    value = F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+    Phrase._base_manager.filter(pk=phrase_id).update(**{field: value})
+
+
+class PhraseChildQueryset(models.QuerySet):
+    """
+    base queryset for models related to Phrase whose active rows are counted on the phrase.
+
+    Attributes:
+        counter_field (str): name of the counter field on Phrase
+        search_fields (Tuple): fields that are part of the phrase's search vector
+    """
+    counter_field = None
+    search_fields = ()
+
+    def all(self):
+        """
+        Returns:
+            queryset: return all object with is_active=True
+        """
+        return self.filter(is_active=True)
+
+    def update(self, **kwargs):
+        """
+        queryset.update() does not send signals,
+        so the counters on Phrase are adjusted here when is_active or phrase change,
+        and the search vectors of the phrases and the search cache are refreshed
+        when one of search_fields changes too.
+        """
+        counted = kwargs.keys() & {'is_active', 'phrase', 'phrase_id'}
+        searched = self.search_fields and kwargs.keys() & {*self.search_fields, *counted}
+        if not counted and not searched:
+            return super().update(**kwargs)
+        from .cache import search_cache
+        moved = kwargs.keys() & {'phrase', 'phrase_id'}
+        with transaction.atomic(using=self.db):
+            rows = dict(self.values_list('pk', 'phrase_id'))
+            changes = []
+            if 'is_active' in kwargs and not moved:
+                is_active = kwargs['is_active']
+                changes = list(self.exclude(is_active=is_active).order_by().values(
+                    'phrase_id').annotate(changed=Count('pk')))
+            updated = super().update(**kwargs)
+            phrase_ids = set(rows.values())
+            if moved:
+                # moved to another phrase. recount every phrase involved.
+                phrase_ids |= set(self.model._base_manager.filter(
+                    pk__in=list(rows)).values_list('phrase_id', flat=True))
+                Phrase.objects.get_queryset().filter(pk__in=phrase_ids).recount()
+            for change in changes:
+                delta = change['changed'] if is_active else -change['changed']
+                adjust_count(change['phrase_id'], self.counter_field, delta)
+            if searched and updated:
+                update_search_vector(Phrase._base_manager.filter(pk__in=phrase_ids))
+                search_cache.invalidate()
+            return updated
+
 
 class PhraseManager(models.Manager):
     """
@@ -62,20 +337,21 @@ class PhraseManager(models.Manager):
         """
         return self.get_queryset().all()
 
-    def search(self, query=None):
+    def search(self, query=None, mode=None):
         """
         if argument query is set to None, return .none().
         if there is a value, pass it to custom queryset's search method.
 
         Args:
             query (str): user input query string
+            mode (str): search mode passed to the queryset
 
         Returns:
             queryset: return filtered queryset
         """
         if query is None:
             return self.get_queryset().none()
-        return self.get_queryset().search(query)
+        return self.get_queryset().search(query, mode=mode)
 
 
 class Phrase(CoreModel):
@@ -85,10 +361,19 @@ class Phrase(CoreModel):
     Attributes:
         user (ForeignKey): one-to-one relation to set user to model
         phrase (CharField): field to save the actual phrase. max length to 255 charactors
+        search_vector (SearchVectorField): full-text search vector of the phrase and its examples.
+            kept up to date by signals. only filled on postgresql.
+        example_count (PositiveIntegerField): number of active examples.
+            kept up to date by signals and ExampleQueryset.update().
+        snap_count (PositiveIntegerField): number of active snaps.
+            kept up to date by signals and SnapQueryset.update().
         objects (PhraseManager): set custom Manager to model
     """
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     phrase = models.CharField(max_length=255, unique=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    example_count = models.PositiveIntegerField(default=0, editable=False)
+    snap_count = models.PositiveIntegerField(default=0, editable=False)
 
     objects = PhraseManager()
 
@@ -96,8 +381,20 @@ class Phrase(CoreModel):
         """
         Attributes:
             ordering (List): use to determine the ordering of model objects when listed
+            indexes (List): indexes in addition to the primary key and unique constraints
         """
         ordering = ['-timestamp', '-updated', ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='eigo_phrase_search_gin'),
+            GinIndex(fields=['phrase'], name='eigo_phrase_trgm_gin',
+                     opclasses=['gin_trgm_ops']),
+            models.Index(fields=['-timestamp', '-id'], name='eigo_phrase_has_snaps_idx',
+                         condition=Q(is_active=True, snap_count__gt=0)),
+            models.Index(fields=['-timestamp', '-id'], name='eigo_phrase_active_recent_idx',
+                         condition=Q(is_active=True)),
+            models.Index(fields=['phrase'], name='eigo_phrase_active_phrase_idx',
+                         condition=Q(is_active=True)),
+        ]
 
     def __str__(self):
         """
@@ -117,17 +414,15 @@ class Phrase(CoreModel):
         return reverse("eigo:eigo_detail", kwargs={"pk": self.pk})
 
 
-class ExampleQueryset(models.QuerySet):
+class ExampleQueryset(PhraseChildQueryset):
     """
     custom queryset for model Example
-    """
 
-    def all(self):
-        """
-        Returns:
-            queryset: return all object with is_active=True
-        """
-        return self.filter(is_active=True)
+    Attributes:
+        counter_field (str): Phrase.example_count counts active examples
+    """
+    counter_field = 'example_count'
+    search_fields = ('example',)
 
 
 class ExampleManager(models.Manager):
@@ -169,6 +464,15 @@ class Example(CoreModel):
 
     objects = ExampleManager()
 
+    class Meta:
+        """
+        Attributes:
+            indexes (List): indexes in addition to the primary key and unique constraints
+        """
+        indexes = [
+            models.Index(fields=['phrase', 'is_active'], name='eigo_example_phrase_active_idx'),
+        ]
+
     def __str__(self):
         """
         determine which field of the model should be representing the model object.
@@ -180,17 +484,14 @@ class Example(CoreModel):
         return self.example
 
 
-class SnapQueryset(models.QuerySet):
+class SnapQueryset(PhraseChildQueryset):
     """
     custom queryset for model Snap
-    """
 
-    def all(self):
-        """
-        Returns:
-            queryset: return all object with is_active=True
-        """
-        return self.filter(is_active=True)
+    Attributes:
+        counter_field (str): Phrase.snap_count counts active snaps
+    """
+    counter_field = 'snap_count'
 
 
 class SnapManager(models.Manager):
@@ -228,15 +529,32 @@ class Snap(CoreModel):
 
     Attributes:
         phrase (ForeignKey): one-to-one relation to set phrase to model
-        snap (ImageField): field to save the actual phrase
+        snap (ImageField): field to save the actual phrase.
+            stored once per distinct content by ContentAddressedStorage.
+        width (PositiveIntegerField): width of the original image. set with the renditions.
+        height (PositiveIntegerField): height of the original image. set with the renditions.
+        renditions (JSONField): resized copies of the image and a tiny placeholder.
+            generated in the background by eigo.renditions after the snap is saved.
         objects (SnapManager): set custom Manager to model
     """
     phrase = models.ForeignKey(
         Phrase, on_delete=models.CASCADE, related_name='snaps')
-    snap = models.ImageField(upload_to=upload_image_to,)
+    snap = models.ImageField(upload_to=upload_image_to, storage=content_addressed_storage)
+    width = models.PositiveIntegerField(null=True, editable=False)
+    height = models.PositiveIntegerField(null=True, editable=False)
+    renditions = models.JSONField(default=dict, editable=False)
 
     objects = SnapManager()
 
+    class Meta:
+        """
+        Attributes:
+            indexes (List): indexes in addition to the primary key and unique constraints
+        """
+        indexes = [
+            models.Index(fields=['phrase', 'is_active'], name='eigo_snap_phrase_active_idx'),
+        ]
+
     def __str__(self):
         """
         determine which field of the model should be representing the model object.
@@ -246,3 +564,166 @@ class Snap(CoreModel):
             str: returns name of the snap field.
         """
         return self.snap.name
+
+    @property
+    def srcset(self):
+        """
+        Returns:
+            str: srcset attribute of the renditions. empty until they are generated.
+        """
+        return ', '.join(f'{size["url"]} {size["width"]}w'
+                         for size in self.renditions.get('sizes', []))
+
+    @property
+    def placeholder(self):
+        """
+        Returns:
+            str: data uri of a tiny blurry version of the image. empty until it is generated.
+        """
+        return self.renditions.get('placeholder', '')
+
+
+class DailyPhraseQueryset(models.QuerySet):
+    """
+    custom queryset for model DailyPhrase
+    """
+
+    def for_user(self, user=None):
+        """
+        Args:
+            user (User): user of the picks. None for the picks shared by everyone.
+
+        Returns:
+            queryset: picks for the user
+        """
+        if user is None:
+            return self.filter(user__isnull=True)
+        return self.filter(user=user)
+
+
+class DailyPhraseManager(models.Manager):
+    """
+    custom manager for model DailyPhrase using DailyPhraseQueryset.
+
+    Attributes:
+        no_repeat_days (int): a phrase is not picked again within this many days
+                              as long as there are other phrases to pick.
+    """
+    no_repeat_days = 30
+
+    def get_queryset(self):
+        """
+        set custom queryset
+
+        Returns:
+            DailyPhraseQueryset: return DailyPhraseQueryset using model DailyPhrase
+        """
+        return DailyPhraseQueryset(self.model, using=self._db)
+
+    def for_user(self, user=None):
+        """
+        calls custom queryset's for_user() method
+
+        Returns:
+            queryset: picks for the user
+        """
+        return self.get_queryset().for_user(user)
+
+    def choose(self, date, user=None):
+        """
+        deterministically choose an active phrase for the date.
+        the same date, user and history always give the same phrase.
+
+        Note:
+            this counts and offsets into the phrase table.
+            it is meant for the daily job and the rare fallback, not for every request.
+
+        Args:
+            date (date): the day to choose for
+            user (User): user to choose for. None for everyone.
+
+        Returns:
+            Phrase: the chosen phrase. None if there are no active phrases.
+        """
+        candidates = Phrase.objects.all().order_by('timestamp', 'id')
+        recent = self.for_user(user).filter(
+            date__lt=date,
+            date__gte=date - timedelta(days=self.no_repeat_days)).values('phrase')
+        fresh = candidates.exclude(pk__in=recent)
+        if fresh.exists():
+            candidates = fresh
+        count = candidates.count()
+        if not count:
+            return None
+        seed = f'{date.isoformat()}:{user.pk if user else ""}'.encode()
+        index = int(hashlib.sha256(seed).hexdigest(), 16) % count
+        return candidates[index]
+
+    def pick(self, date, user=None):
+        """
+        persist the phrase of the day for the date.
+        an existing pick is kept unless its phrase has been deactivated.
+
+        Args:
+            date (date): the day to pick for
+            user (User): user to pick for. None for everyone.
+
+        Returns:
+            DailyPhrase: the pick. None if there are no active phrases.
+        """
+        daily = self.for_user(user).filter(
+            date=date).select_related('phrase').first()
+        if daily is not None and daily.phrase.is_active:
+            return daily
+        phrase = self.choose(date, user)
+        if phrase is None:
+            return None
+        daily, _ = self.for_user(user).update_or_create(
+            date=date, defaults={'phrase': phrase, 'user': user})
+        return daily
+
+
+class DailyPhrase(CoreModel):
+    """
+    model to save the phrase of the day.
+    filled by the 'pick_daily_phrase' management command.
+
+    Attributes:
+        date (DateField): the day the phrase is for
+        user (ForeignKey): user the phrase is picked for. empty for the pick shared by everyone.
+        phrase (ForeignKey): the phrase of the day
+        objects (DailyPhraseManager): set custom Manager to model
+    """
+    date = models.DateField()
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, null=True, blank=True)
+    phrase = models.ForeignKey(
+        Phrase, on_delete=models.CASCADE, related_name='daily_picks')
+
+    objects = DailyPhraseManager()
+
+    class Meta:
+        """
+        Attributes:
+            ordering (List): use to determine the ordering of model objects when listed
+            constraints (List): one pick per day for everyone and one per day for each user
+        """
+        ordering = ['-date', ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date'], condition=Q(user__isnull=True),
+                name='eigo_dailyphrase_unique_date'),
+            models.UniqueConstraint(
+                fields=['date', 'user'], condition=Q(user__isnull=False),
+                name='eigo_dailyphrase_unique_date_user'),
+        ]
+
+    def __str__(self):
+        """
+        determine which field of the model should be representing the model object.
+        mainly used in admin site.
+
+        Returns:
+            str: returns the date and the phrase.
+        """
+        return f'{self.date}: {self.phrase}'
@@ -0,0 +1,190 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from uuid import UUID
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """
+    raised when a cursor can not be decoded or does not match the ordering.
+    """
+    pass
+
+
+class KeysetPage:
+    """
+    a page of objects returned by KeysetPaginator.
+    mimics the parts of django's Page that the templates use.
+
+    Attributes:
+        object_list (List): objects in this page
+        next_cursor (str): cursor pointing right after the last object. None on the last page.
+        number (int): always 1. keyset pages do not know their position.
+    """
+    number = 1
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return False
+
+    def has_other_pages(self):
+        return self.has_next()
+
+
+class KeysetPaginator:
+    """
+    cursor based paginator.
+    instead of OFFSET it filters rows that come after the last row of the previous page,
+    so page N costs the same as page 1 as long as the ordering is backed by an index.
+
+    Attributes:
+        queryset (QuerySet): queryset to paginate
+        per_page (int): number of objects in a page
+        ordering (List): field names used for ordering. the last one must be unique.
+
+    Note:
+        ordering fields can be model fields or annotations.
+        values are stored in the cursor and restored with the field's to_python().
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        # django's ListView reads these when building the context
+        self.count = None
+        self.num_pages = None
+
+    def page(self, cursor=None):
+        """
+        fetch one page of objects in a single query.
+        one extra row is fetched to know if there is a next page.
+
+        Args:
+            cursor (str): cursor returned by the previous page. None for the first page.
+
+        Returns:
+            KeysetPage: the requested page
+        """
+        object_list = list(self.page_queryset(cursor))
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
+
+    def page_queryset(self, cursor=None):
+        """
+        Args:
+            cursor (str): cursor returned by the previous page. None for the first page.
+
+        Returns:
+            QuerySet: the objects of the page plus one extra row
+
+        Raises:
+            InvalidCursor: if the cursor is broken or made for another ordering
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.get_lookup(self.decode(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def get_lookup(self, values):
+        """
+        build the filter that matches rows after the given values.
+        for ordering (a, b) it is: a < x OR (a = x AND b < y), plus a <= x
+        on the leading column so the database can use a range scan.
+
+        Args:
+            values (List): values of the ordering fields of the last row
+
+        Returns:
+            Q: lookup for the next rows
+        """
+        lookup = Q()
+        equals = Q()
+        for name, value in zip(self.ordering, values):
+            field, descending = self._split(name)
+            operator = 'lt' if descending else 'gt'
+            lookup |= equals & Q(**{f'{field}__{operator}': value})
+            equals &= Q(**{field: value})
+        field, descending = self._split(self.ordering[0])
+        bound = Q(**{f'{field}__{"lte" if descending else "gte"}': values[0]})
+        return bound & lookup
+
+    def encode(self, obj):
+        """
+        Args:
+            obj (Model): the last object of a page
+
+        Returns:
+            str: url safe cursor for the object
+        """
+        values = []
+        for name in self.ordering:
+            value = getattr(obj, self._split(name)[0])
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, UUID):
+                value = str(value)
+            values.append(value)
+        data = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """
+        Args:
+            cursor (str): cursor made by encode()
+
+        Returns:
+            List: python values of the ordering fields
+
+        Raises:
+            InvalidCursor: if the cursor is broken or made for another ordering
+        """
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        except (binascii.Error, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        try:
+            return [self._to_python(name, value)
+                    for name, value in zip(self.ordering, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    def _to_python(self, name, value):
+        field_name = self._split(name)[0]
+        if field_name == 'pk':
+            field = self.queryset.model._meta.pk
+        else:
+            try:
+                field = self.queryset.model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                # annotations are stored as plain json values. only numbers (like rank) are used.
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValidationError('invalid annotation value')
+                return value
+        return field.to_python(value)
+
+    @staticmethod
+    def _split(name):
+        return name.lstrip('-'), name.startswith('-')
@@ -0,0 +1,146 @@
+import base64
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+
+def rendition_name(source, width):
+    """
+    Args:
+        source (str): storage name of the original image
+        width (int): width of the rendition
+
+    Returns:
+        str: storage name of the rendition. the same source and width always give the same name.
+    """
+    base = os.path.splitext(source)[0]
+    return f'renditions/{base}-{width}w.webp'
+
+
+def rendition_widths(width):
+    """
+    Args:
+        width (int): width of the original image
+
+    Returns:
+        List: widths to make renditions at. never wider than the original.
+    """
+    widths = [w for w in settings.SNAP_RENDITION_WIDTHS if w < width]
+    if len(widths) < len(settings.SNAP_RENDITION_WIDTHS):
+        widths.append(width)
+    return widths
+
+
+def open_image(field_file):
+    """
+    Returns:
+        Image: the image upright and in a mode webp can store
+    """
+    with field_file.open('rb') as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    return image
+
+
+def encode_webp(image, width, quality):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+    buffer = io.BytesIO()
+    resized.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue(), height
+
+
+def make_placeholder(image):
+    """
+    Returns:
+        str: data uri of a tiny blurred webp of the image. usually a few hundred bytes.
+    """
+    width = settings.SNAP_PLACEHOLDER_WIDTH
+    height = max(1, round(image.height * width / image.width))
+    tiny = image.resize((width, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def generate_renditions(snap_id, force=False):
+    """
+    make the webp renditions and the placeholder of a snap and store them on it.
+    runs in the task pool after a snap is saved, and from the generate_renditions command.
+
+    it is idempotent: nothing is done when the renditions of the current image exist.
+    the storage keeps one copy of each content, so saving a rendition again only adds
+    a reference to it. the references of the renditions that are replaced are released.
+
+    Args:
+        snap_id (UUID): pk of the snap
+        force (bool): encode and save the renditions again even if they exist
+
+    Returns:
+        Dict: the renditions. None if the snap is gone or replaced, or its image can not be read.
+    """
+    from .models import Snap
+    snap = Snap.objects.get_queryset().filter(pk=snap_id).first()
+    if snap is None or not snap.snap:
+        return None
+    source = snap.snap.name
+    if not force and snap.renditions.get('source') == source:
+        return snap.renditions
+    storage = snap.snap.storage
+    try:
+        image = open_image(snap.snap)
+    except (OSError, UnidentifiedImageError):
+        logger.warning('can not make renditions of snap %s (%s)', snap_id, source)
+        return None
+
+    sizes = []
+    for width in rendition_widths(image.width):
+        content, height = encode_webp(image, width, settings.SNAP_RENDITION_QUALITY)
+        name = storage.save(rendition_name(source, width), ContentFile(content))
+        sizes.append({'width': width, 'height': height, 'name': name, 'url': storage.url(name)})
+    renditions = {
+        'source': source,
+        'placeholder': make_placeholder(image),
+        'sizes': sizes,
+    }
+
+    # only store them if the image was not replaced in the meantime.
+    # the row is locked so that runs at the same time each release what they replace.
+    # 'updated' changes so the detail page's ETag changes too.
+    with transaction.atomic():
+        queryset = Snap.objects.get_queryset().filter(pk=snap_id, snap=source)
+        replaced = queryset.select_for_update().values_list('renditions', flat=True).first()
+        if replaced is not None:
+            queryset.update(width=image.width, height=image.height,
+                            renditions=renditions, updated=timezone.now())
+    if replaced is None:
+        delete_renditions(renditions, storage)
+        return None
+    delete_renditions(replaced, storage)
+    return renditions
+
+
+def delete_renditions(renditions, storage):
+    """
+    remove the files of renditions from storage.
+
+    Args:
+        renditions (Dict): Snap.renditions
+        storage (Storage): storage of the snap
+    """
+    for size in renditions.get('sizes', []):
+        try:
+            storage.delete(size['name'])
+        except Exception:
+            logger.warning('can not delete rendition %s', size['name'], exc_info=True)
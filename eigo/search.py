@@ -0,0 +1,162 @@
+import heapq
+import itertools
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+
+# text search configuration used for both the stored vectors and the queries
+SEARCH_CONFIG = 'english'
+
+SEARCH_CONTAINS = 'contains'
+SEARCH_FULLTEXT = 'fulltext'
+SEARCH_FUZZY = 'fuzzy'
+SEARCH_MODES = (SEARCH_CONTAINS, SEARCH_FULLTEXT, SEARCH_FUZZY)
+
+# pg_trgm treats everything but letters and digits as word separators
+TRIGRAM_WORD = re.compile(r'[^\W_]+')
+
+
+def split_search_query(query):
+    """
+    split user input by space ' ' and ',' into a list of search terms.
+
+    Args:
+        query (str): user input query string
+
+    Returns:
+        List: non-empty search terms in the order they were typed
+    """
+    query_list = [i.split(',') for i in query.split(' ')]
+    query_list = list(itertools.chain.from_iterable(query_list))
+    return [i for i in query_list if i != '']
+
+
+def supports_fulltext(using):
+    """
+    Args:
+        using (str): database alias
+
+    Returns:
+        bool: True if the database can run the full-text search
+    """
+    return connections[using].vendor == 'postgresql'
+
+
+def supports_trigram(using):
+    """
+    Args:
+        using (str): database alias
+
+    Returns:
+        bool: True if the database has pg_trgm. it is installed by the migrations.
+    """
+    return connections[using].vendor == 'postgresql'
+
+
+def set_similarity_threshold(using, threshold):
+    """
+    set pg_trgm's threshold for the '%' operator on the connection,
+    so the GIN trigram index returns the same rows as similarity() >= threshold.
+
+    Args:
+        using (str): database alias
+        threshold (float): similarity threshold between 0 and 1
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT set_limit(%s)', [threshold])
+
+
+def trigrams(text):
+    """
+    python version of pg_trgm's show_trgm().
+    each word is lower cased and padded with two spaces in front and one behind.
+
+    Args:
+        text (str): text to split
+
+    Returns:
+        Set: trigrams of the text
+    """
+    result = set()
+    for word in TRIGRAM_WORD.findall(text.lower()):
+        word = f'  {word} '
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
+
+
+def trigram_similarity(a, b):
+    """
+    python version of pg_trgm's similarity().
+
+    Returns:
+        float: shared trigrams divided by all trigrams of the two texts. between 0 and 1.
+    """
+    return _similarity(trigrams(a), trigrams(b))
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def fuzzy_match(rows, query, threshold, limit):
+    """
+    pick the best matches for query by trigram similarity in python.
+    used when the database does not have pg_trgm.
+
+    Args:
+        rows (Iterable): (pk, text) pairs to compare against
+        query (str): user input query string
+        threshold (float): minimum similarity to be a match
+        limit (int): maximum number of matches
+
+    Returns:
+        List: (pk, similarity) pairs, best match first
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+
+    def scored():
+        for pk, text in rows:
+            score = _similarity(query_trigrams, trigrams(text))
+            if score and score >= threshold:
+                yield pk, score
+
+    return heapq.nlargest(limit, scored(), key=lambda match: match[1])
+
+
+def phrase_search_vector(example_model):
+    """
+    build the expression for Phrase.search_vector.
+    the phrase itself is weighted 'A' and the active examples are weighted 'B'.
+
+    Args:
+        example_model (Model): the Example model. passed in so migrations can use historical models.
+
+    Returns:
+        SearchVector: expression to store in Phrase.search_vector
+    """
+    examples = example_model._base_manager.filter(
+        phrase=OuterRef('pk'), is_active=True).order_by().values(
+        'phrase').annotate(text=StringAgg('example', delimiter=' ')).values('text')
+    return (SearchVector('phrase', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(Subquery(examples), weight='B', config=SEARCH_CONFIG))
+
+
+def update_search_vector(queryset):
+    """
+    recompute the stored search vector of the phrases in queryset.
+    does nothing when the database does not support full-text search.
+
+    Args:
+        queryset (QuerySet): Phrase queryset to update
+    """
+    if not supports_fulltext(queryset.db):
+        return
+    from .models import Example
+    queryset.update(search_vector=phrase_search_vector(Example))
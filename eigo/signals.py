@@ -0,0 +1,157 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.additional.tasks import task_pool
+from .cache import daily_phrase_cache, search_cache
+from .models import Example, Phrase, Snap, adjust_count
+from .renditions import delete_renditions, generate_renditions
+from .search import update_search_vector
+from .suggest import phrase_index
+
+
+@receiver(post_save, sender=Phrase)
+def phrase_saved(sender, instance, raw=False, **kwargs):
+    """
+    keep the search vector up to date when a phrase is saved.
+    """
+    if raw:
+        return
+    update_search_vector(Phrase.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Phrase)
+def phrase_saved_update_index(sender, instance, created=False, raw=False, **kwargs):
+    """
+    keep the suggest index up to date when a phrase is added, renamed or (de)activated.
+    """
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and loaded:
+        old = (loaded.get('phrase'), loaded.get('is_active'))
+        if old == (instance.phrase, instance.is_active):
+            return
+        if old[1]:
+            phrase_index.discard(old[0])
+    if instance.is_active:
+        phrase_index.add(instance.phrase)
+
+
+@receiver(post_delete, sender=Phrase)
+def phrase_deleted(sender, instance, **kwargs):
+    """
+    remove a deleted phrase from the suggest index.
+    """
+    phrase_index.discard(instance.phrase)
+
+
+@receiver(post_save, sender=Example)
+@receiver(post_delete, sender=Example)
+def example_changed(sender, instance, raw=False, **kwargs):
+    """
+    examples are part of the phrase's search vector,
+    so recompute it when an example is saved or deleted.
+    """
+    if raw:
+        return
+    update_search_vector(Phrase.objects.filter(pk=instance.phrase_id))
+
+
+@receiver(post_save, sender=Phrase)
+@receiver(post_delete, sender=Phrase)
+@receiver(post_save, sender=Example)
+@receiver(post_delete, sender=Example)
+def invalidate_search_cache(sender, raw=False, **kwargs):
+    """
+    phrases and examples decide search results,
+    so any change makes the cached results stale.
+    """
+    if raw:
+        return
+    search_cache.invalidate()
+
+
+@receiver(post_save, sender=Phrase)
+@receiver(pre_delete, sender=Phrase)
+def phrase_changed_invalidate_daily(sender, instance, raw=False, **kwargs):
+    """
+    the phrase of the day is cached with its text, examples and snaps.
+    a deactivated phrase is replaced on the next request.
+    """
+    if raw:
+        return
+    daily_phrase_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Example)
+@receiver(post_delete, sender=Example)
+@receiver(post_save, sender=Snap)
+@receiver(post_delete, sender=Snap)
+def child_changed_invalidate_daily(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    daily_phrase_cache.invalidate(instance.phrase_id)
+
+
+@receiver(post_save, sender=Example)
+@receiver(post_save, sender=Snap)
+def child_saved_update_count(sender, instance, created=False, raw=False, **kwargs):
+    """
+    keep Phrase.example_count and Phrase.snap_count up to date
+    when an example or snap is added, (de)activated or moved to another phrase.
+    """
+    if raw:
+        return
+    field = sender.objects.get_queryset().counter_field
+    loaded = getattr(instance, '_loaded_values', {})
+    if created or not loaded:
+        if not created:
+            # saved without being loaded first. the old state is unknown.
+            Phrase.objects.get_queryset().filter(pk=instance.phrase_id).recount()
+        elif instance.is_active:
+            adjust_count(instance.phrase_id, field, 1)
+        return
+    old = (loaded.get('phrase_id'), loaded.get('is_active'))
+    new = (instance.phrase_id, instance.is_active)
+    if old == new:
+        return
+    if old[1]:
+        adjust_count(old[0], field, -1)
+    if new[1]:
+        adjust_count(new[0], field, 1)
+
+
+@receiver(post_delete, sender=Example)
+@receiver(post_delete, sender=Snap)
+def child_deleted_update_count(sender, instance, **kwargs):
+    """
+    an active example or snap was deleted. this also runs for queryset.delete().
+    """
+    loaded = getattr(instance, '_loaded_values', {})
+    if loaded.get('is_active', instance.is_active):
+        field = sender.objects.get_queryset().counter_field
+        adjust_count(loaded.get('phrase_id', instance.phrase_id), field, -1)
+
+
+@receiver(post_save, sender=Snap)
+def snap_saved_generate_renditions(sender, instance, raw=False, **kwargs):
+    """
+    make the renditions of a new or replaced image in the task pool,
+    once the snap is committed.
+    """
+    if raw or not instance.snap:
+        return
+    if instance.renditions.get('source') == instance.snap.name:
+        return
+    task_pool.submit_on_commit(generate_renditions, instance.pk)
+
+
+@receiver(post_delete, sender=Snap)
+def snap_deleted_delete_renditions(sender, instance, **kwargs):
+    """
+    remove the rendition files of a deleted snap. django_cleanup removes the original.
+    """
+    if instance.renditions:
+        renditions, storage = instance.renditions, instance.snap.storage
+        transaction.on_commit(lambda: delete_renditions(renditions, storage))
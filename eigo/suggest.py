@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+class PhrasePrefixIndex:
+    """
+    in-process prefix index of active phrases for search-as-you-type.
+    keeps a sorted array of case folded phrases and finds completions with bisect,
+    so a lookup is O(log n + k) without touching the database.
+
+    the index is built lazily on the first lookup, kept up to date by signals
+    (see eigo/signals.py) and rebuilt when it is older than
+    settings.PHRASE_SUGGEST_MAX_AGE, which picks up changes made by other processes
+    and by queryset.update().
+
+    Attributes:
+        max_entries (int): maximum number of phrases to hold. bounds memory use.
+
+    Note:
+        the original phrase is only stored when it differs from its case folded key,
+        so for the usual lower case phrase each entry costs one string and two pointers.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._keys = []
+        self._phrases = []
+        self._built_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """
+        load the active phrases from the database.
+        when there are more than max_entries, the most recent ones are kept.
+        """
+        from .models import Phrase
+        max_entries = self.max_entries or settings.PHRASE_SUGGEST_MAX_ENTRIES
+        phrases = Phrase.objects.all().order_by('-timestamp', '-id').values_list(
+            'phrase', flat=True)[:max_entries]
+        entries = [self._entry(phrase) for phrase in phrases.iterator()]
+        entries.sort(key=lambda entry: entry[0])
+        with self._lock:
+            self._keys = [key for key, _ in entries]
+            self._phrases = [phrase for _, phrase in entries]
+            self._built_at = time.monotonic()
+
+    def ensure_built(self):
+        """
+        build the index if it is not built yet or has become too old.
+        """
+        if (self._built_at is None or
+                time.monotonic() - self._built_at > settings.PHRASE_SUGGEST_MAX_AGE):
+            self.build()
+
+    def clear(self):
+        """
+        drop the index. it will be rebuilt on the next lookup.
+        """
+        with self._lock:
+            self._keys = []
+            self._phrases = []
+            self._built_at = None
+
+    def add(self, phrase):
+        """
+        add a phrase. does nothing until the index is built.
+        """
+        with self._lock:
+            if not self.is_built:
+                return
+            max_entries = self.max_entries or settings.PHRASE_SUGGEST_MAX_ENTRIES
+            if len(self._keys) >= max_entries:
+                return
+            key, original = self._entry(phrase)
+            index = bisect_left(self._keys, key)
+            self._keys.insert(index, key)
+            self._phrases.insert(index, original)
+
+    def discard(self, phrase):
+        """
+        remove a phrase if it is in the index.
+        """
+        with self._lock:
+            key = phrase.casefold()
+            index = bisect_left(self._keys, key)
+            while index < len(self._keys) and self._keys[index] == key:
+                if (self._phrases[index] or key) == phrase:
+                    del self._keys[index]
+                    del self._phrases[index]
+                    return
+                index += 1
+
+    def suggest(self, prefix, limit=10):
+        """
+        Args:
+            prefix (str): what the user has typed so far
+            limit (int): maximum number of completions
+
+        Returns:
+            List: up to limit phrases starting with prefix, in alphabetical order
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix or limit < 1:
+            return []
+        self.ensure_built()
+        with self._lock:
+            index = bisect_left(self._keys, prefix)
+            result = []
+            for key, phrase in zip(self._keys[index:index + limit],
+                                   self._phrases[index:index + limit]):
+                if not key.startswith(prefix):
+                    break
+                result.append(phrase or key)
+            return result
+
+    @staticmethod
+    def _entry(phrase):
+        key = phrase.casefold()
+        return key, (None if key == phrase else phrase)
+
+
+phrase_index = PhrasePrefixIndex()
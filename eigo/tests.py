@@ -1,8 +1,45 @@
+import asyncio
+import base64
+import csv
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings)
 from django.shortcuts import reverse
+from django.utils import timezone
+from django.views.generic import View
+from PIL import Image
 
-from .models import Phrase, Example
+from core.additional import metrics
+from core.additional.asyncviews import async_view
+from pages.models import StoredFile, UploadSession
+from .benchmark import CorpusSeeder, find_regressions
+from .cache import DailyPhraseCache, daily_phrase_cache, search_cache
+from .export import parse_since
+from .models import DailyPhrase, Phrase, Example, Snap
+from .pagination import InvalidCursor, KeysetPaginator
+from .renditions import generate_renditions
+from .search import trigram_similarity, trigrams
+from .suggest import PhrasePrefixIndex, phrase_index
+from .views import PhraseDetailView, PhraseListView
 
 
 class PhraseModelTestCase(TestCase):
@@ -17,7 +54,6 @@ class PhraseModelTestCase(TestCase):
             user=self.user)
         self.example = Example.objects.create(
             phrase=self.phrase,
-            user=self.user,
             example='example text')
 
     def test_phrase_has_created(self):
@@ -39,12 +75,12 @@ class PhraseModelTestCase(TestCase):
     def test_inactive_example(self):
         Example.objects.create(
             phrase=self.phrase,
-            user=self.user,
             example='inactive example text',
             is_active=False)
         self.assertEqual(Example.objects.all().count(), 1)
 
 
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
 class PhraseViewTestCase(TestCase):
 
     def setUp(self):
@@ -57,7 +93,6 @@ class PhraseViewTestCase(TestCase):
             user=self.user)
         self.example = Example.objects.create(
             phrase=self.phrase,
-            user=self.user,
             example='example text')
 
     def test_phrase_list_view(self):
@@ -97,6 +132,50 @@ class PhraseViewTestCase(TestCase):
         no_response = self.client.get('/no-response/')
         self.assertEqual(no_response.status_code, 404)
 
+    def test_phrase_list_view_query_count(self):
+        for i in range(5):
+            phrase = Phrase.objects.create(
+                phrase=f'phrase {i}',
+                user=self.user)
+            Example.objects.create(phrase=phrase, example=f'example {i}')
+            Snap.objects.create(phrase=phrase, snap=f'snap-{i}.png')
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        # session, user, the ETag validators and the phrase list itself
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('eigo:eigo_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 examples', count=6)
+        self.assertContains(response, '1 snaps', count=5)
+
+    def test_phrase_list_view_counts_active_only(self):
+        Example.objects.create(
+            phrase=self.phrase,
+            example='inactive example text',
+            is_active=False)
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_list'))
+        self.assertContains(response, '1 examples')
+        self.assertContains(response, '0 snaps')
+
+    def test_phrase_detail_view_query_count(self):
+        for i in range(5):
+            Example.objects.create(phrase=self.phrase, example=f'example {i}')
+            Snap.objects.create(phrase=self.phrase, snap=f'snap-{i}.png')
+        Example.objects.create(
+            phrase=self.phrase,
+            example='inactive example text',
+            is_active=False)
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        # session, user, the ETag validators, the phrase, its examples and its snaps
+        with self.assertNumQueries(6):
+            response = self.client.get(self.phrase.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '6 examples | 5 snaps')
+        self.assertNotContains(response, 'inactive example text')
+
     # def test_phrase_new_view(self):
     #     self.client.login(email='phraseuser@email.com',
     #                       password='testpass1234')
@@ -109,3 +188,1356 @@ class PhraseViewTestCase(TestCase):
     #     response = self.client.post(reverse('eigo:eigo_new'), data=post_data)
     #     self.assertEqual(response.status_code, 201)
     #     self.assertTemplateUsed(response, 'eigo/eigo_form.html')
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class PhraseListPaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        for i in range(45):
+            Phrase.objects.create(phrase=f'phrase {i:02}', user=self.user)
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+
+    def collect_pages(self, url):
+        phrases = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            phrases += [eigo.phrase for eigo in response.context['eigo_list']]
+            query = response.context.get('next_page_query')
+            url = f'{reverse("eigo:eigo_list_page")}?{query}' if query else None
+        return phrases
+
+    def test_pages_cover_all_phrases_once(self):
+        phrases = self.collect_pages(reverse('eigo:eigo_list'))
+        expected = list(Phrase.objects.all().order_by(
+            '-timestamp', '-id').values_list('phrase', flat=True))
+        self.assertEqual(phrases, expected)
+
+    def test_pages_with_ordering(self):
+        phrases = self.collect_pages(reverse('eigo:eigo_list') + '?ordering=down')
+        self.assertEqual(phrases, [f'phrase {i:02}' for i in range(45)])
+
+    @override_settings(PHRASE_SEARCH_MODE='contains')
+    def test_pages_with_search(self):
+        phrases = self.collect_pages(
+            reverse('eigo:eigo_list') + '?search=1,2&ordering=up')
+        expected = [f'phrase {i:02}' for i in range(44, -1, -1)
+                    if '1' in f'{i:02}' or '2' in f'{i:02}']
+        self.assertEqual(phrases, expected)
+        self.assertGreater(len(phrases), 20)
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_pages_with_ranked_search(self):
+        Example.objects.create(
+            phrase=Phrase.objects.get(phrase='phrase 07'),
+            example='a phrase about a phrase')
+        phrases = self.collect_pages(reverse('eigo:eigo_list') + '?search=phrase')
+        self.assertEqual(len(phrases), 45)
+        self.assertEqual(len(set(phrases)), 45)
+        self.assertEqual(phrases[0], 'phrase 07')
+
+    def test_next_page_query_count(self):
+        response = self.client.get(reverse('eigo:eigo_list'))
+        self.assertContains(response, 'id="eigo-list-more"')
+        url = f'{reverse("eigo:eigo_list_page")}?{response.context["next_page_query"]}'
+        # session, user, the ETag validators and the page itself. no COUNT(*) query.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertTemplateUsed(response, 'eigo/eigo_list_page.html')
+        self.assertTemplateNotUsed(response, '_base.html')
+        self.assertEqual(len(response.context['eigo_list']), 20)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('eigo:eigo_list') + '?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_value_types(self):
+        for values in ([{'a': 1}, 'x'], [['x'], 'x'], [1, 'x']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(reverse('eigo:eigo_list') + f'?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, values)
+
+        paginator = KeysetPaginator(
+            Phrase.objects.annotate(rank=Value(1.0, output_field=FloatField())),
+            20, ['-rank', '-id'])
+        phrase = paginator.queryset.first()
+        self.assertEqual(paginator.decode(paginator.encode(phrase)), [1.0, phrase.pk])
+        for values in (['x', 1], [{'a': 1}, 1], [None, 1], [True, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.assertRaises(InvalidCursor, msg=values):
+                paginator.decode(cursor)
+
+
+class PhraseSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(
+            phrase='break the ice',
+            user=self.user)
+        Example.objects.create(
+            phrase=self.phrase,
+            example='He told a joke to break the ice.')
+        self.other = Phrase.objects.create(
+            phrase='piece of cake',
+            user=self.user)
+        Example.objects.create(
+            phrase=self.other,
+            example='The exam was a piece of cake, I finished early.')
+
+    def test_contains_search(self):
+        result = Phrase.objects.search('ice,cake', mode='contains')
+        self.assertEqual(result.count(), 2)
+        result = Phrase.objects.search('ic', mode='contains')
+        self.assertEqual(list(result), [self.phrase])
+
+    def test_empty_search(self):
+        self.assertEqual(Phrase.objects.search(' , ').count(), 0)
+        self.assertEqual(Phrase.objects.search(None).count(), 0)
+
+    @skipUnless(connection.vendor != 'postgresql', 'fallback is used on other databases')
+    def test_fulltext_search_falls_back_to_contains(self):
+        result = Phrase.objects.search('ic', mode='fulltext')
+        self.assertEqual(list(result), [self.phrase])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_fulltext_search_matches_examples(self):
+        result = Phrase.objects.search('exam', mode='fulltext')
+        self.assertEqual(list(result), [self.other])
+        # stemmed: 'jokes' matches 'joke'
+        result = Phrase.objects.search('jokes', mode='fulltext')
+        self.assertEqual(list(result), [self.phrase])
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_fulltext_search_is_ranked(self):
+        # 'cake' is in the phrase of one and only in an example of the other
+        Example.objects.create(phrase=self.phrase, example='We had cake.')
+        result = list(Phrase.objects.search('cake', mode='fulltext'))
+        self.assertEqual(result, [self.other, self.phrase])
+        self.assertGreater(result[0].rank, result[1].rank)
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_fulltext_search_vector_follows_examples(self):
+        example = Example.objects.create(phrase=self.phrase, example='A penguin.')
+        self.assertEqual(
+            list(Phrase.objects.search('penguin', mode='fulltext')), [self.phrase])
+        example.is_active = False
+        example.save()
+        self.assertFalse(Phrase.objects.search('penguin', mode='fulltext').exists())
+        example.delete()
+        self.assertFalse(Phrase.objects.search('penguin', mode='fulltext').exists())
+        self.phrase.phrase = 'break the penguin'
+        self.phrase.save()
+        self.assertEqual(
+            list(Phrase.objects.search('penguin', mode='fulltext')), [self.phrase])
+
+
+class PhraseFuzzySearchTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(
+            phrase='once in a blue moon',
+            user=self.user)
+        self.other = Phrase.objects.create(
+            phrase='a blessing in disguise',
+            user=self.user)
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Cat'), {'  c', ' ca', 'cat', 'at '})
+        self.assertEqual(trigram_similarity('moon', 'moon'), 1.0)
+        self.assertEqual(trigram_similarity('moon', ''), 0.0)
+
+    def test_fuzzy_search_tolerates_typos(self):
+        result = list(Phrase.objects.search('once in a blu mon', mode='fuzzy'))
+        self.assertEqual(result, [self.phrase])
+        self.assertGreaterEqual(result[0].rank, 0.3)
+
+    def test_fuzzy_search_threshold_and_limit(self):
+        result = Phrase.objects.all().fuzzy_search('in a', threshold=0.0, limit=5)
+        self.assertEqual(result.count(), 2)
+        result = Phrase.objects.all().fuzzy_search('in a', threshold=0.0, limit=1)
+        self.assertEqual(result.count(), 1)
+        self.assertFalse(Phrase.objects.all().fuzzy_search('zzz', threshold=0.3).exists())
+
+    def test_fuzzy_search_from_list_view(self):
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(
+            reverse('eigo:eigo_list') + '?search=blesing+in+disgise&mode=fuzzy')
+        self.assertEqual(list(response.context['eigo_list']), [self.other])
+
+
+class PhraseSuggestTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        for phrase in ['break a leg', 'Break the ice', 'bite the bullet', 'call it a day']:
+            Phrase.objects.create(phrase=phrase, user=self.user)
+        Phrase.objects.create(phrase='break even', user=self.user, is_active=False)
+        phrase_index.clear()
+        self.addCleanup(phrase_index.clear)
+
+    def test_index_suggest(self):
+        index = PhrasePrefixIndex()
+        self.assertEqual(index.suggest('BREAK'), ['break a leg', 'Break the ice'])
+        self.assertEqual(index.suggest('b', limit=2), ['bite the bullet', 'break a leg'])
+        self.assertEqual(index.suggest('x'), [])
+        self.assertEqual(index.suggest(' '), [])
+
+    def test_index_is_bounded(self):
+        phrases = ['call it a day', 'bite the bullet', 'Break the ice', 'break a leg']
+        for days, phrase in enumerate(phrases):
+            Phrase.objects.filter(phrase=phrase).update(
+                timestamp=timezone.now() - datetime.timedelta(days=days))
+        index = PhrasePrefixIndex(max_entries=2)
+        index.build()
+        # the most recent phrases are kept
+        self.assertEqual(index.suggest('b') + index.suggest('c'),
+                         ['bite the bullet', 'call it a day'])
+        index.add('bend over backwards')
+        self.assertEqual(len(index), 2)
+
+    def test_index_is_lazy(self):
+        self.assertFalse(phrase_index.is_built)
+        with self.assertNumQueries(1):
+            phrase_index.suggest('b')
+        with self.assertNumQueries(0):
+            phrase_index.suggest('c')
+
+    def test_index_follows_signals(self):
+        phrase_index.build()
+        phrase = Phrase.objects.create(phrase='beat around the bush', user=self.user)
+        self.assertEqual(phrase_index.suggest('beat'), ['beat around the bush'])
+        phrase.phrase = 'beating around the bush'
+        phrase.save()
+        self.assertEqual(phrase_index.suggest('beat'), ['beating around the bush'])
+        phrase.is_active = False
+        phrase.save()
+        self.assertEqual(phrase_index.suggest('beat'), [])
+        phrase.is_active = True
+        phrase.save()
+        Phrase.objects.get(pk=phrase.pk).delete()
+        self.assertEqual(phrase_index.suggest('beat'), [])
+
+    def test_suggest_view(self):
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_suggest') + '?q=bre&limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'suggestions': ['break a leg']})
+        response = self.client.get(reverse('eigo:eigo_suggest') + '?q=bre&limit=abc')
+        self.assertEqual(response.json(), {'suggestions': ['break a leg', 'Break the ice']})
+
+
+@override_settings(PHRASE_SEARCH_MODE='contains')
+class SearchCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='hit the sack', user=self.user)
+        Phrase.objects.create(phrase='hit the road', user=self.user)
+        search_cache.reset_stats()
+
+    def test_key_is_normalized(self):
+        self.assertEqual(search_cache.make_key('Sack, hit', None, 1),
+                         search_cache.make_key('hit sack', 'contains', 1))
+        self.assertNotEqual(search_cache.make_key('hit sack', 'fuzzy', 1),
+                            search_cache.make_key('hit sack', 'contains', 1))
+        self.assertIsNone(search_cache.make_key(' , ', None, 1))
+
+    def test_hit_and_miss(self):
+        self.assertEqual(search_cache.search('sack').count(), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(search_cache.search('SACK')), [self.phrase])
+        self.assertEqual(search_cache.stats(),
+                         {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        # counted in the shared cache, so stats() covers every process
+        self.assertEqual(caches['shared'].get(search_cache.hits_key), 1)
+        self.assertIsNone(caches['search'].get(search_cache.hits_key))
+
+    def test_invalidated_by_save_and_delete(self):
+        self.assertEqual(search_cache.search('hit').count(), 2)
+        phrase = Phrase.objects.create(phrase='hit the books', user=self.user)
+        self.assertEqual(search_cache.search('hit').count(), 3)
+        phrase.delete()
+        self.assertEqual(search_cache.search('hit').count(), 2)
+        Phrase.objects.filter(pk=self.phrase.pk).update(is_active=False)
+        self.assertEqual(search_cache.search('hit').count(), 1)
+        self.assertEqual(search_cache.stats()['hits'], 0)
+
+    def test_stale_entry_skips_inactive_phrases(self):
+        self.assertEqual(search_cache.search('sack').count(), 1)
+        # bypasses PhraseQueryset.update(), so the entry is not invalidated
+        Phrase._base_manager.filter(pk=self.phrase.pk).update(is_active=False)
+        self.assertFalse(search_cache.search('sack').exists())
+        self.assertEqual(search_cache.stats()['hits'], 1)
+
+    def test_invalidated_by_example_queryset_update(self):
+        example = Example.objects.create(phrase=self.phrase, example='go to bed')
+        for kwargs in ({'example': 'turn in'}, {'is_active': False},
+                       {'phrase': Phrase.objects.get(phrase='hit the road')}):
+            generation = search_cache.generation()
+            Example.objects.get_queryset().filter(pk=example.pk).update(**kwargs)
+            self.assertGreater(search_cache.generation(), generation, kwargs)
+        generation = search_cache.generation()
+        Example.objects.get_queryset().filter(pk=example.pk).update(updated=timezone.now())
+        self.assertEqual(search_cache.generation(), generation)
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_search_vector_follows_example_queryset_update(self):
+        other = Phrase.objects.get(phrase='hit the road')
+        example = Example.objects.create(phrase=self.phrase, example='go to bed')
+        Example.objects.get_queryset().filter(pk=example.pk).update(example='turn in early')
+        self.assertEqual(list(Phrase.objects.search('early', mode='fulltext')), [self.phrase])
+        Example.objects.get_queryset().filter(pk=example.pk).update(phrase=other)
+        self.assertEqual(list(Phrase.objects.search('early', mode='fulltext')), [other])
+        Example.objects.get_queryset().filter(pk=example.pk).update(is_active=False)
+        self.assertFalse(Phrase.objects.search('early', mode='fulltext').exists())
+
+    def test_generation_is_shared(self):
+        generation = search_cache.generation()
+        self.assertEqual(caches['shared'].get(search_cache.generation_key), generation)
+        search_cache.invalidate()
+        self.assertGreater(search_cache.generation(), generation)
+
+    def test_ranked_results_keep_rank(self):
+        expected = [(p.pk, p.rank) for p in Phrase.objects.search('hit the sak', mode='fuzzy')]
+        search_cache.search('hit the sak', mode='fuzzy')
+        result = [(p.pk, p.rank) for p in search_cache.search('hit the sak', mode='fuzzy')]
+        self.assertEqual(result, expected)
+        self.assertEqual(search_cache.stats()['hits'], 1)
+
+    @override_settings(PHRASE_SEARCH_CACHE_MAX_RESULTS=1)
+    def test_large_results_are_not_cached(self):
+        search_cache.search('hit')
+        search_cache.search('hit')
+        self.assertEqual(search_cache.stats()['misses'], 2)
+
+    def test_stats_view_is_staff_only(self):
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_search_stats'))
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('eigo:eigo_search_stats'))
+        self.assertEqual(response.json(), {'hits': 0, 'misses': 0, 'hit_rate': None})
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class DailyPhraseTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrases = [Phrase.objects.create(phrase=f'phrase {i}', user=self.user)
+                        for i in range(10)]
+        self.date = datetime.date(2020, 8, 10)
+        cache.clear()
+
+    def test_choose_is_deterministic(self):
+        first = DailyPhrase.objects.choose(self.date)
+        self.assertEqual(DailyPhrase.objects.choose(self.date), first)
+        self.assertNotEqual(
+            {DailyPhrase.objects.choose(self.date, self.user)} |
+            {DailyPhrase.objects.choose(self.date + datetime.timedelta(days=i))
+             for i in range(5)}, {first})
+
+    def test_pick_does_not_repeat(self):
+        picked = [DailyPhrase.objects.pick(self.date + datetime.timedelta(days=i)).phrase
+                  for i in range(10)]
+        self.assertEqual(len(set(picked)), 10)
+
+    def test_pick_is_kept(self):
+        daily = DailyPhrase.objects.pick(self.date)
+        self.assertEqual(DailyPhrase.objects.pick(self.date), daily)
+        self.assertEqual(DailyPhrase.objects.count(), 1)
+
+    def test_deactivated_phrase_is_replaced(self):
+        daily = DailyPhrase.objects.pick(self.date)
+        daily.phrase.is_active = False
+        daily.phrase.save()
+        replaced = DailyPhrase.objects.pick(self.date)
+        self.assertEqual(replaced.pk, daily.pk)
+        self.assertNotEqual(replaced.phrase, daily.phrase)
+        self.assertTrue(replaced.phrase.is_active)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('pick_daily_phrase', date='2020-08-10', days=3, per_user=True, stdout=out)
+        self.assertEqual(DailyPhrase.objects.for_user().count(), 3)
+        self.assertEqual(DailyPhrase.objects.for_user(self.user).count(), 3)
+        self.assertIn('2020-08-12 everyone', out.getvalue())
+
+    def test_cached_serving(self):
+        today = daily_phrase_cache.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(daily_phrase_cache.get(), today)
+        phrase = Phrase.objects.get(pk=today['id'])
+        Example.objects.create(phrase=phrase, example='a new example')
+        self.assertEqual(daily_phrase_cache.get()['examples'], ['a new example'])
+        phrase.is_active = False
+        phrase.save()
+        self.assertNotEqual(daily_phrase_cache.get()['id'], today['id'])
+
+    def test_invalidation_reaches_other_processes(self):
+        # two workers with caches of their own and the shared cache in common
+        override = override_settings(CACHES={**settings.CACHES, **{
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': alias} for alias in ('worker-1', 'worker-2')}})
+        override.enable()
+        self.addCleanup(override.disable)
+        first, second = DailyPhraseCache('worker-1'), DailyPhraseCache('worker-2')
+        today = first.get()
+        self.assertEqual(second.get(), today)
+        phrase = Phrase.objects.get(pk=today['id'])
+        phrase.is_active = False
+        phrase.save()
+        # the signal ran with daily_phrase_cache, the cache of neither worker
+        self.assertNotEqual(second.get()['id'], today['id'])
+        self.assertEqual(first.get(), second.get())
+
+    def test_deactivated_by_queryset_update(self):
+        today = daily_phrase_cache.get()
+        # what the admin's deactivate action does
+        Phrase.objects.filter(pk=today['id']).update(is_active=False)
+        self.assertNotEqual(daily_phrase_cache.get()['id'], today['id'])
+
+    def test_views(self):
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_today_json'))
+        self.assertEqual(response.status_code, 200)
+        daily = response.json()
+        self.assertEqual(daily['date'], datetime.date.today().isoformat())
+        response = self.client.get(reverse('eigo:eigo_today'))
+        self.assertContains(response, daily['phrase'])
+        self.assertTemplateUsed(response, 'eigo/eigo_today.html')
+
+    def test_views_without_phrases(self):
+        Phrase.objects.all().delete()
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_today_json'))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('eigo:eigo_today'))
+        self.assertContains(response, 'There is no phrase of the day yet.')
+
+
+class PhraseCountTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        self.other = Phrase.objects.create(phrase='other phrase', user=self.user)
+
+    def assertCounts(self, phrase, example_count, snap_count):
+        phrase.refresh_from_db()
+        self.assertEqual((phrase.example_count, phrase.snap_count),
+                         (example_count, snap_count))
+
+    def test_create_and_delete(self):
+        example = Example.objects.create(phrase=self.phrase, example='example')
+        Example.objects.create(phrase=self.phrase, example='inactive', is_active=False)
+        Snap.objects.create(phrase=self.phrase, snap='snap.png')
+        self.assertCounts(self.phrase, 1, 1)
+        example.delete()
+        self.assertCounts(self.phrase, 0, 1)
+        Snap.objects.filter(phrase=self.phrase).delete()
+        self.assertCounts(self.phrase, 0, 0)
+
+    def test_toggle_and_move(self):
+        example = Example.objects.create(phrase=self.phrase, example='example')
+        example.is_active = False
+        example.save()
+        self.assertCounts(self.phrase, 0, 0)
+        example.is_active = True
+        example.save()
+        example.save()
+        self.assertCounts(self.phrase, 1, 0)
+        example = Example.objects.get(pk=example.pk)
+        example.phrase = self.other
+        example.save()
+        self.assertCounts(self.phrase, 0, 0)
+        self.assertCounts(self.other, 1, 0)
+
+    def test_queryset_update(self):
+        for i in range(3):
+            Example.objects.create(phrase=self.phrase, example=f'example {i}')
+            Snap.objects.create(phrase=self.other, snap=f'snap-{i}.png')
+        Example.objects.get_queryset().filter(phrase=self.phrase).update(is_active=False)
+        self.assertCounts(self.phrase, 0, 0)
+        Example.objects.get_queryset().update(is_active=True)
+        self.assertCounts(self.phrase, 3, 0)
+        Snap.objects.get_queryset().update(phrase=self.phrase)
+        self.assertCounts(self.phrase, 3, 3)
+        self.assertCounts(self.other, 0, 0)
+
+    def test_recount_command(self):
+        Example.objects.create(phrase=self.phrase, example='example')
+        Phrase.objects.get_queryset().update(example_count=5, snap_count=2)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('2 phrases had wrong counts.', out.getvalue())
+        self.assertCounts(self.phrase, 1, 0)
+        self.assertCounts(self.other, 0, 0)
+
+    def test_has_snaps(self):
+        Snap.objects.create(phrase=self.other, snap='snap.png')
+        self.assertEqual(list(Phrase.objects.all().has_snaps()), [self.other])
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(reverse('eigo:eigo_list') + '?has_snaps=1')
+        self.assertEqual(list(response.context['eigo_list']), [self.other])
+
+
+class PhraseFormViewTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.other_user = get_user_model().objects.create_user(
+            username='otheruser',
+            email='otheruser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        self.examples = [Example.objects.create(phrase=self.phrase, example=f'example {i}')
+                         for i in range(3)]
+        self.client.login(email='otheruser@email.com',
+                          password='testpass1234')
+
+    def edit_data(self, **changes):
+        self.phrase.refresh_from_db()
+        data = {
+            'phrase': self.phrase.phrase,
+            'last_updated': self.phrase.updated.isoformat(),
+            'example-form-TOTAL_FORMS': len(self.examples) + 1,
+            'example-form-INITIAL_FORMS': len(self.examples),
+            'snap-form-TOTAL_FORMS': 0,
+            'snap-form-INITIAL_FORMS': 0,
+        }
+        for i, example in enumerate(self.examples):
+            data[f'example-form-{i}-id'] = example.pk
+            data[f'example-form-{i}-example'] = example.example
+        data.update(changes)
+        return data
+
+    def edit(self, data):
+        return self.client.post(
+            reverse('eigo:eigo_edit', kwargs={'pk': self.phrase.pk}), data)
+
+    def test_create(self):
+        response = self.client.post(reverse('eigo:eigo_new'), {
+            'phrase': 'new phrase',
+            'example-form-TOTAL_FORMS': 3,
+            'example-form-INITIAL_FORMS': 0,
+            'example-form-0-example': 'first example',
+            'example-form-1-example': 'second example',
+            'snap-form-TOTAL_FORMS': 0,
+            'snap-form-INITIAL_FORMS': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        phrase = Phrase.objects.get(phrase='new phrase')
+        self.assertEqual(phrase.user, self.other_user)
+        self.assertEqual(phrase.example_count, 2)
+        self.assertEqual(sorted(phrase.examples.values_list('example', flat=True)),
+                         ['first example', 'second example'])
+
+    def test_only_changed_examples_are_written(self):
+        updated = {example.pk: example.updated for example in self.examples}
+        response = self.edit(self.edit_data(**{
+            'example-form-1-example': 'edited example',
+            'example-form-3-example': 'added example'}))
+        self.assertEqual(response.status_code, 302)
+        for example in Example.objects.get_queryset().filter(pk__in=updated):
+            if example.pk == self.examples[1].pk:
+                self.assertEqual(example.example, 'edited example')
+                self.assertGreater(example.updated, updated[example.pk])
+            else:
+                self.assertEqual(example.updated, updated[example.pk])
+        self.phrase.refresh_from_db()
+        self.assertEqual(self.phrase.example_count, 4)
+        self.assertEqual(self.phrase.user, self.user)
+
+    def test_delete_examples(self):
+        response = self.edit(self.edit_data(**{
+            'example-form-0-DELETE': 'on', 'example-form-2-DELETE': 'on'}))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Example.objects.get_queryset().filter(phrase=self.phrase)),
+                         [self.examples[1]])
+        self.phrase.refresh_from_db()
+        self.assertEqual(self.phrase.example_count, 1)
+
+    def test_unchanged_form_writes_nothing(self):
+        data = self.edit_data()
+        updated = self.phrase.updated
+        # session, user, the phrase, the unique check, the examples
+        # and the lock on the phrase in a savepoint
+        with self.assertNumQueries(8):
+            response = self.edit(data)
+        self.assertEqual(response.status_code, 302)
+        self.phrase.refresh_from_db()
+        self.assertEqual(self.phrase.updated, updated)
+
+    def test_stale_edit_is_rejected(self):
+        data = self.edit_data(phrase='renamed phrase')
+        Example.objects.create(phrase=self.phrase, example='added elsewhere')
+        Phrase.objects.get(pk=self.phrase.pk).save()
+        response = self.edit(data)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'changed by someone else', status_code=409)
+        self.assertEqual(Phrase.objects.get(pk=self.phrase.pk).phrase, 'example phrase')
+
+    def test_edit_without_token_is_saved(self):
+        response = self.edit(self.edit_data(phrase='renamed phrase', last_updated=''))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Phrase.objects.get(pk=self.phrase.pk).phrase, 'renamed phrase')
+
+    @skipUnless(connection.vendor == 'postgresql', 'full-text search requires postgresql')
+    def test_search_vector_follows_examples(self):
+        self.edit(self.edit_data(**{'example-form-3-example': 'A penguin.'}))
+        self.assertEqual(
+            list(Phrase.objects.search('penguin', mode='fulltext')), [self.phrase])
+        self.examples = list(Example.objects.get_queryset().filter(
+            phrase=self.phrase).order_by('pk'))
+        index = [example.example for example in self.examples].index('A penguin.')
+        self.edit(self.edit_data(**{f'example-form-{index}-DELETE': 'on'}))
+        self.assertFalse(Phrase.objects.search('penguin', mode='fulltext').exists())
+
+    def test_example_of_another_phrase_is_rejected(self):
+        other = Phrase.objects.create(phrase='other phrase', user=self.user)
+        example = Example.objects.create(phrase=other, example='other example')
+        response = self.edit(self.edit_data(**{'example-form-0-id': example.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Example.objects.get(pk=example.pk).example, 'other example')
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class PhraseAdminTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            username='adminuser',
+            email='adminuser@email.com',
+            password='testpass1234')
+        self.client.force_login(self.user)
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        Example.objects.bulk_create([
+            Example(phrase=self.phrase, example=f'example {i}') for i in range(25)])
+        Snap.objects.create(phrase=self.phrase, snap='snap.png')
+
+    def test_changelist_queries(self):
+        url = reverse('admin:eigo_phrase_changelist')
+        self.client.get(url)
+        for i in range(10):
+            Phrase.objects.create(phrase=f'phrase {i}', user=self.user)
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '?phrase=')
+
+    def test_has_snaps_filter(self):
+        Phrase.objects.create(phrase='no snaps', user=self.user)
+        url = reverse('admin:eigo_phrase_changelist')
+        response = self.client.get(url + '?has_snaps=1')
+        self.assertEqual(list(response.context['cl'].result_list), [self.phrase])
+        response = self.client.get(url + '?has_snaps=0')
+        self.assertEqual(response.context['cl'].result_list[0].phrase, 'no snaps')
+
+    def test_child_changelists(self):
+        for name in ('eigo_example_changelist', 'eigo_snap_changelist'):
+            response = self.client.get(reverse(f'admin:{name}'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_estimated_count_falls_back(self):
+        response = self.client.get(reverse('admin:eigo_example_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 25)
+
+    def test_paginated_inline(self):
+        url = reverse('admin:eigo_phrase_change', args=[self.phrase.pk])
+        response = self.client.get(url)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.initial_forms), 20)
+        self.assertContains(response, 'examples-page=2')
+        response = self.client.get(url + '?examples-page=2')
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.initial_forms), 5)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class ExplainViewsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            username='adminuser',
+            email='adminuser@email.com',
+            password='testpass1234')
+        phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        Example.objects.create(phrase=phrase, example='example')
+
+    def test_explain_views(self):
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        output = out.getvalue()
+        for name in ('list', 'list ordered by phrase', 'search', 'detail'):
+            self.assertIn(f'== {name}:', output)
+        self.assertIn('eigo_phrase', output)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('explain_views', user='nobody@email.com', stdout=StringIO())
+
+
+class PhraseCellCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+
+    def test_cells_are_cached(self):
+        url = reverse('eigo:eigo_list')
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'eigo/eigo_list_cell.html')
+        self.assertContains(response, 'example phrase')
+        response = self.client.get(url)
+        self.assertTemplateNotUsed(response, 'eigo/eigo_list_cell.html')
+        self.assertContains(response, 'example phrase')
+        self.assertContains(response, '0 examples')
+
+    def test_children_invalidate_cell(self):
+        url = reverse('eigo:eigo_list')
+        self.client.get(url)
+        Example.objects.create(phrase=self.phrase, example='example')
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'eigo/eigo_list_cell.html')
+        self.assertContains(response, '1 examples')
+
+    def test_renamed_user_invalidates_cell(self):
+        url = reverse('eigo:eigo_list')
+        self.assertContains(self.client.get(url), 'added by phraseuser')
+        self.user.username = 'renamed'
+        self.user.save()
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'eigo/eigo_list_cell.html')
+        self.assertContains(response, 'added by renamed')
+
+    def test_command(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {alias: {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory.name, alias),
+        } for alias in ('default', 'shared')}
+        override = override_settings(CACHES={**settings.CACHES, **shared})
+        override.enable()
+        self.addCleanup(override.disable)
+        Phrase.objects.create(phrase='other phrase', user=self.user)
+        out = StringIO()
+        call_command('phrase_cells', '--warm', stdout=out)
+        self.assertIn('Rendered 2 phrase cards.', out.getvalue())
+        call_command('phrase_cells', '--warm', stdout=out)
+        self.assertIn('Rendered 0 phrase cards.', out.getvalue())
+        call_command('phrase_cells', '--flush', '--warm', '--limit', '1', stdout=out)
+        self.assertIn('Rendered 1 phrase cards.', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('phrase_cells', stdout=out)
+
+    def test_command_refuses_local_memory(self):
+        with self.assertRaisesMessage(CommandError, 'memory of each process'):
+            call_command('phrase_cells', '--flush', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'memory of each process'):
+            call_command('phrase_cells', '--warm', stdout=StringIO())
+
+
+@override_settings(REQUEST_METRICS=True, QUERY_BUDGET_MODE='raise')
+class RequestMetricsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # keep the per request log lines out of the test output
+        level = metrics.logger.level
+        metrics.logger.setLevel(logging.WARNING)
+        self.addCleanup(metrics.logger.setLevel, level)
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        for i in range(10):
+            phrase = Phrase.objects.create(phrase=f'phrase {i}', user=self.user)
+            Example.objects.create(phrase=phrase, example=f'example {i}')
+            Example.objects.create(phrase=phrase, example=f'another example {i}')
+        self.phrase = phrase
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('eigo:eigo_list'))
+        recorded = response.request_metrics
+        self.assertGreater(recorded.queries, 0)
+        self.assertGreater(recorded.template_time, 0)
+        self.assertEqual(recorded.cache_misses, 10)
+        self.assertIn(f'db;dur={recorded.as_dict()["db_ms"]};desc="{recorded.queries} queries"',
+                      response['Server-Timing'])
+        response = self.client.get(reverse('eigo:eigo_list'))
+        self.assertEqual(response.request_metrics.cache_hits, 10)
+
+    def test_views_stay_in_budget(self):
+        # QUERY_BUDGET_MODE='raise' fails the test when a view goes over its budget
+        for url in [
+            reverse('eigo:eigo_list'),
+            reverse('eigo:eigo_list') + '?search=phrase',
+            reverse('eigo:eigo_list_page'),
+            reverse('eigo:eigo_suggest') + '?q=phr',
+            self.phrase.get_absolute_url(),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'eigo:eigo_list': 1})
+    def test_budget_modes(self):
+        url = reverse('eigo:eigo_list')
+        with self.assertRaisesMessage(metrics.QueryBudgetExceeded, 'over its budget of 1'):
+            self.client.get(url)
+        with override_settings(QUERY_BUDGET_MODE='warn'):
+            with self.assertWarns(metrics.QueryBudgetWarning):
+                self.client.get(url)
+        with override_settings(QUERY_BUDGET_MODE='log'):
+            with self.assertLogs('core.additional.metrics', 'WARNING') as logs:
+                self.client.get(url)
+        self.assertIn('eigo:eigo_list made', logs.output[0])
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('eigo:eigo_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(hasattr(response, 'request_metrics'))
+        self.assertIsNone(metrics.current())
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class ConditionalGetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+
+    def assertNotModified(self, url, etag, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        url = self.phrase.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        # session, user and the validators
+        self.assertNotModified(url, etag, 3)
+        Example.objects.create(phrase=self.phrase, example='example')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_not_found(self):
+        url = self.phrase.get_absolute_url()
+        self.phrase.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_list(self):
+        url = reverse('eigo:eigo_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotModified(url, etag, 3)
+        response = self.client.get(url + '?ordering=up', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Phrase.objects.create(phrase='other phrase', user=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'other phrase')
+
+    def test_etag_is_per_user(self):
+        url = self.phrase.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        get_user_model().objects.create_user(
+            username='otheruser',
+            email='otheruser@email.com',
+            password='testpass1234')
+        self.client.login(email='otheruser@email.com',
+                          password='testpass1234')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+class PhraseExportTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+        Example.objects.create(phrase=self.phrase, example='first example')
+        Example.objects.create(phrase=self.phrase, example='hidden', is_active=False)
+        Snap.objects.create(phrase=self.phrase, snap='snap.png')
+        self.other = Phrase.objects.create(phrase='other phrase, "quoted"', user=self.user)
+        Phrase.objects.create(phrase='inactive phrase', user=self.user, is_active=False)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_phrases', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson(self):
+        with self.assertNumQueries(3):
+            rows = [json.loads(line) for line in self.export('--chunk-size', '5').splitlines()]
+        self.assertEqual([row['phrase'] for row in rows],
+                         ['example phrase', 'other phrase, "quoted"'])
+        self.assertEqual(rows[0]['examples'], ['first example'])
+        self.assertEqual(rows[0]['user'], 'phraseuser')
+        self.assertTrue(rows[0]['snaps'][0].endswith('snap.png'))
+        rows = self.export('--include-inactive', '--chunk-size', '1').splitlines()
+        self.assertEqual(len(rows), 3)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.export('--format', 'csv'))))
+        self.assertEqual(rows[1]['phrase'], 'other phrase, "quoted"')
+        self.assertEqual(json.loads(rows[0]['examples']), ['first example'])
+
+    def test_since(self):
+        since = timezone.now()
+        Phrase.objects.create(phrase='new phrase', user=self.user)
+        example = Example.objects.get(example='first example')
+        example.example = 'edited example'
+        example.save()
+        rows = [json.loads(line)
+                for line in self.export('--since', since.isoformat()).splitlines()]
+        self.assertEqual([row['phrase'] for row in rows], ['example phrase', 'new phrase'])
+        self.assertEqual(parse_since('2020-08-01').date(), datetime.date(2020, 8, 1))
+        with self.assertRaises(CommandError):
+            self.export('--since', 'yesterday')
+
+    def test_endpoint(self):
+        url = reverse('eigo:eigo_export')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url + '?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('id,phrase,user'))
+        self.assertIn('example phrase', content)
+        self.assertEqual(self.client.get(url + '?format=xml').status_code, 400)
+        self.assertEqual(self.client.get(url + '?since=never').status_code, 400)
+
+
+class PhraseImportTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.other_user = get_user_model().objects.create_user(
+            username='otheruser',
+            email='otheruser@email.com',
+            password='testpass1234')
+        Phrase.objects.create(phrase='existing phrase', user=self.user)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_phrases', path, '--user', 'phraseuser@email.com', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson(self):
+        lines = [
+            {'phrase': 'new phrase', 'examples': ['one', 'two'], 'user': 'otheruser'},
+            {'phrase': 'existing phrase', 'examples': ['ignored']},
+            {'phrase': 'new phrase', 'examples': ['duplicate']},
+            {'phrase': 'hidden phrase', 'is_active': False, 'user': 'nobody'},
+        ]
+        path = self.write('phrases.ndjson', '\n'.join(json.dumps(line) for line in lines))
+        output = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Imported 2 phrases and 2 examples, skipped 2', output)
+        phrase = Phrase.objects.get(phrase='new phrase')
+        self.assertEqual(phrase.user, self.other_user)
+        self.assertEqual(phrase.example_count, 2)
+        self.assertEqual(phrase.examples.count(), 2)
+        hidden = Phrase.objects.get_queryset().get(phrase='hidden phrase')
+        self.assertFalse(hidden.is_active)
+        self.assertEqual(hidden.user, self.user)
+
+    def test_csv_round_trip(self):
+        phrase = Phrase.objects.create(phrase='exported phrase', user=self.other_user)
+        Example.objects.create(phrase=phrase, example='exported example')
+        path = os.path.join(self.directory.name, 'phrases.csv')
+        call_command('export_phrases', '--format', 'csv', '--output', path)
+        Phrase.objects.get_queryset().delete()
+        self.run_import(path)
+        phrase = Phrase.objects.get(phrase='exported phrase')
+        self.assertEqual(phrase.user, self.other_user)
+        self.assertEqual([example.example for example in phrase.examples.all()],
+                         ['exported example'])
+        self.assertEqual(phrase.example_count, 1)
+
+    def test_invalid_input(self):
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('phrases.txt', 'phrase\n'))
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('phrases.ndjson', '{"phrase": ""}\n'))
+        with self.assertRaises(CommandError):
+            call_command('import_phrases', self.write('phrases.csv', 'phrase\nx\n'),
+                         '--user', 'nobody@email.com', stdout=StringIO())
+
+
+class BenchmarkTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.directory = media.name
+        override = override_settings(
+            MEDIA_ROOT=media.name, REQUEST_METRICS=False,
+            BENCHMARK_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_corpus', '--user', 'bench@email.com', '--batch-size', '10',
+                     '--images', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_phrases_are_distinct(self):
+        seeder = CorpusSeeder(user=None)
+        phrases = [seeder.make_phrase(number) for number in range(5000)]
+        self.assertEqual(len(set(phrases)), len(phrases))
+
+    def test_capacity_covers_a_million_phrases(self):
+        self.assertGreaterEqual(CorpusSeeder.capacity(), 1_000_000)
+        seeder = CorpusSeeder(user=None)
+        combinations = CorpusSeeder.combinations()
+        numbers = [0, combinations - 1, combinations, 2 * combinations, 1_000_000]
+        phrases = [seeder.make_phrase(number) for number in numbers]
+        self.assertEqual(len(set(phrases)), len(phrases))
+        self.assertEqual(phrases[2], f'{phrases[0]} 2')
+
+    def test_seed_corpus(self):
+        output = self.seed('--phrases', '25', '--snap-ratio', '0.5')
+        self.assertIn('Seeded 25 phrases', output)
+        user = get_user_model().objects.get(email='bench@email.com')
+        self.assertTrue(user.is_superuser)
+        self.assertEqual(Phrase.objects.filter(user=user).count(), 25)
+        self.assertEqual(Phrase.objects.get_queryset().recount(), 0)
+        snaps = Snap.objects.count()
+        self.assertGreater(snaps, 0)
+        self.assertEqual(sum(StoredFile.objects.values_list('references', flat=True)), snaps)
+        # seeding again adds new phrases
+        output = self.seed('--phrases', '5', '--snap-ratio', '0')
+        self.assertIn('Seeded 5 phrases', output)
+        self.assertIn('skipped 0', output)
+        self.assertEqual(Phrase.objects.count(), 30)
+
+    def test_benchmark(self):
+        self.seed('--phrases', '30')
+        output_path = os.path.join(self.directory, 'result.json')
+        call_command('benchmark', '--user', 'bench@email.com', '--requests', '2',
+                     '--warmup', '0', '--output', output_path, stdout=StringIO())
+        self.assertEqual(Phrase.objects.count(), 30)
+        with open(output_path, encoding='utf-8') as f:
+            result = json.load(f)
+        self.assertEqual(result['corpus']['phrases'], 30)
+        self.assertEqual(set(result['endpoints']), {
+            'list', 'list_deep', 'list_search', 'search_queryset', 'create_form', 'detail',
+            'update_form', 'admin_changelist', 'create_submit', 'update_submit'})
+        for name, endpoint in result['endpoints'].items():
+            expected = [302] if name.endswith('_submit') else [200]
+            self.assertEqual(endpoint['status'], expected, name)
+            self.assertGreater(endpoint['peak_kib'], 0)
+        # a baseline that made fewer queries fails the run
+        result['endpoints'] = {'list': {**result['endpoints']['list'], 'queries': 0}}
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        with self.assertRaisesMessage(CommandError, '1 regressions'):
+            call_command('benchmark', '--user', 'bench@email.com', '--requests', '2',
+                         '--endpoint', 'list', '--threshold', '100',
+                         '--baseline', output_path, stdout=StringIO(), stderr=StringIO())
+
+    def test_find_regressions(self):
+        baseline = {'endpoints': {
+            'list': {'p50_ms': 10, 'p95_ms': 20, 'queries': 4, 'peak_kib': 100},
+        }}
+        result = {'endpoints': {
+            'list': {'p50_ms': 11, 'p95_ms': 30, 'queries': 4, 'peak_kib': 100},
+            'detail': {'p50_ms': 1, 'p95_ms': 1, 'queries': 9, 'peak_kib': 1},
+        }}
+        self.assertEqual(find_regressions(result, baseline, threshold=0.2),
+                         ['list: p95_ms 30ms, was 20ms.'])
+
+
+class SnapRenditionTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(
+            MEDIA_ROOT=media.name,
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+            TASKS_ALWAYS_EAGER=True,
+            SNAP_RENDITION_WIDTHS=[320, 640])
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+
+    def make_snap(self, size=(1000, 500)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'blue').save(buffer, format='PNG')
+        return Snap.objects.create(
+            phrase=self.phrase, snap=SimpleUploadedFile('snap.png', buffer.getvalue()))
+
+    def test_generated_on_save(self):
+        snap = self.make_snap()
+        snap.refresh_from_db()
+        self.assertEqual((snap.width, snap.height), (1000, 500))
+        self.assertEqual([size['width'] for size in snap.renditions['sizes']], [320, 640])
+        self.assertEqual(snap.renditions['sizes'][0]['height'], 160)
+        self.assertTrue(snap.placeholder.startswith('data:image/webp;base64,'))
+        self.assertIn(' 320w, ', snap.srcset)
+        storage = snap.snap.storage
+        for size in snap.renditions['sizes']:
+            with storage.open(size['name']) as f:
+                self.assertEqual(Image.open(f).format, 'WEBP')
+
+    def test_small_image_is_not_scaled_up(self):
+        snap = self.make_snap((400, 300))
+        snap.refresh_from_db()
+        self.assertEqual([size['width'] for size in snap.renditions['sizes']], [320, 400])
+
+    def test_idempotent(self):
+        snap = self.make_snap()
+        snap.refresh_from_db()
+        renditions = snap.renditions
+        with self.assertNumQueries(1):
+            self.assertEqual(generate_renditions(snap.pk), renditions)
+        Snap.objects.get_queryset().update(width=None, renditions={})
+        out = StringIO()
+        call_command('generate_renditions', stdout=out)
+        self.assertIn('Generated renditions of 1 snaps.', out.getvalue())
+        snap.refresh_from_db()
+        self.assertEqual(snap.renditions['sizes'], renditions['sizes'])
+
+    def test_forced_runs_release_replaced_renditions(self):
+        snap = self.make_snap()
+        generate_renditions(snap.pk, force=True)
+        generate_renditions(snap.pk, force=True)
+        snap.refresh_from_db()
+        names = [size['name'] for size in snap.renditions['sizes']]
+        self.assertEqual(
+            dict(StoredFile.objects.filter(name__in=names).values_list('name', 'references')),
+            {name: 1 for name in names})
+
+    def test_unreadable_image(self):
+        snap = Snap.objects.create(phrase=self.phrase, snap='missing.png')
+        self.assertIsNone(generate_renditions(snap.pk))
+        snap.refresh_from_db()
+        self.assertEqual(snap.renditions, {})
+
+    def test_detail_template(self):
+        self.make_snap()
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+        response = self.client.get(self.phrase.get_absolute_url())
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'loading="lazy"')
+
+
+class SnapUploadTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(
+            MEDIA_ROOT=media.name,
+            UPLOAD_SESSION_DIR=media.name,
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+            TASKS_ALWAYS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.client.login(email='phraseuser@email.com',
+                          password='testpass1234')
+
+    def post(self, snap, client=None, upload=''):
+        return (client or self.client).post(reverse('eigo:eigo_new'), {
+            'phrase': 'uploaded phrase',
+            'example-form-TOTAL_FORMS': 0,
+            'example-form-INITIAL_FORMS': 0,
+            'snap-form-TOTAL_FORMS': 1,
+            'snap-form-INITIAL_FORMS': 0,
+            'snap-form-0-snap': snap,
+            'snap-form-0-upload': upload,
+        })
+
+    def make_png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(buffer, format='PNG')
+        return SimpleUploadedFile('snap.png', buffer.getvalue(), content_type='image/png')
+
+    def test_image_is_saved(self):
+        response = self.post(self.make_png())
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Phrase.objects.get().snaps.count(), 1)
+
+    def test_spoofed_type_is_rejected(self):
+        snap = SimpleUploadedFile('snap.png', b'not an image', content_type='image/png')
+        response = self.post(snap)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Bad image format.')
+        self.assertFalse(Phrase.objects.exists())
+
+    def test_oversized_image_is_rejected(self):
+        with override_settings(MAX_IMAGE_UPLOAD_SIZE=10):
+            response = self.post(self.make_png())
+        self.assertContains(response, 'Maximum image file is', status_code=413)
+        self.assertFalse(Snap.objects.exists())
+
+    def test_csrf_is_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(email='phraseuser@email.com', password='testpass1234')
+        self.assertEqual(self.post(self.make_png(), client).status_code, 403)
+
+    @override_settings(UPLOAD_CHUNK_SIZE=1024)
+    def test_completed_upload_is_saved(self):
+        png = self.make_png().read()
+        session = self.client.post(reverse('upload_sessions'), {
+            'name': 'snap.png', 'size': len(png)}).json()
+        self.client.put(session['url'], png, content_type='application/octet-stream',
+                        HTTP_X_UPLOAD_OFFSET='0',
+                        HTTP_X_CHUNK_SHA256=hashlib.sha256(png).hexdigest())
+        response = self.post('', upload=session['id'])
+        self.assertEqual(response.status_code, 302)
+        snap = Phrase.objects.get().snaps.get()
+        with snap.snap.open() as f:
+            self.assertEqual(f.read(), png)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_unfinished_upload_is_rejected(self):
+        session = UploadSession.objects.create(user=self.user, name='snap.png', size=100)
+        response = self.post('', upload=session.pk)
+        self.assertContains(response, 'The upload is not finished or has expired.')
+        self.assertFalse(Phrase.objects.exists())
+
+    @override_settings(IMAGE_RESIZE_MAX_WIDTH=800, IMAGE_RESIZE_QUALITY=70)
+    def test_resize_settings_in_page(self):
+        response = self.client.get(reverse('eigo:eigo_new'))
+        self.assertEqual(response.context['image_upload']['max_width'], 800)
+        self.assertContains(response, 'id="image-upload-settings"')
+        self.assertContains(response, '"quality": 70')
+        self.assertContains(response, 'js/snap-upload.js')
+
+
+class AsyncViewTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        self.phrase = Phrase.objects.create(phrase='example phrase', user=self.user)
+
+    def request(self):
+        request = AsyncRequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    async def test_views(self):
+        list_view = async_view(PhraseListView)
+        self.assertTrue(asyncio.iscoroutinefunction(list_view))
+        self.assertIs(list_view.view_class, PhraseListView)
+        response = await list_view(self.request())
+        self.assertContains(response, 'example phrase')
+        response = await async_view(PhraseDetailView)(self.request(), pk=self.phrase.pk)
+        self.assertContains(response, 'example phrase')
+
+    async def test_requests_overlap(self):
+        class SlowView(View):
+            def get(self, request):
+                time.sleep(0.2)
+                return HttpResponse(threading.current_thread().name)
+
+        view = async_view(SlowView)
+        started = time.perf_counter()
+        responses = await asyncio.gather(view(self.request()), view(self.request()))
+        self.assertLess(time.perf_counter() - started, 0.35)
+        for response in responses:
+            self.assertTrue(response.content.startswith(b'async-view'))
+
+    def test_loadtest(self):
+        for mode in ('wsgi', 'asgi'):
+            out = StringIO()
+            call_command('loadtest', '--user', 'phraseuser@email.com', '--mode', mode,
+                         '--requests', '4', '--concurrency', '2', '--latency', '0',
+                         '--json', stdout=out)
+            result = json.loads(out.getvalue())
+            self.assertEqual(result['mode'], mode)
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['requests_per_second'], 0)
@@ -1,14 +1,33 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import (PhraseListView, PhraseDetailView,
-                    PhraseCreateView, PhraseUpdateView, PhraseDeleteView)
+from core.additional.asyncviews import async_view
+from .views import (PhraseListView, PhraseListPageView, PhraseSuggestView, SearchCacheStatsView,
+                    PhraseExportView,
+                    PhraseOfTheDayView, PhraseOfTheDayJsonView,
+                    PhraseDetailView, PhraseCreateView, PhraseUpdateView, PhraseDeleteView)
 
 app_name = 'eigo'
 
+
+def read_view(view_class):
+    """
+    Returns:
+        Callable: async_view(view_class) when settings.ASYNC_VIEWS is set. view_class.as_view() otherwise.
+    """
+    return async_view(view_class) if settings.ASYNC_VIEWS else view_class.as_view()
+
+
 urlpatterns = [
     path('<uuid:pk>/edit/', PhraseUpdateView.as_view(), name='eigo_edit'),
     path('<uuid:pk>/delete/', PhraseDeleteView.as_view(), name='eigo_delete'),
-    path('<uuid:pk>/', PhraseDetailView.as_view(), name='eigo_detail'),
+    path('<uuid:pk>/', read_view(PhraseDetailView), name='eigo_detail'),
     path('new/', PhraseCreateView.as_view(), name='eigo_new'),
-    path('', PhraseListView.as_view(), name='eigo_list'),
+    path('page/', read_view(PhraseListPageView), name='eigo_list_page'),
+    path('suggest/', read_view(PhraseSuggestView), name='eigo_suggest'),
+    path('export/', PhraseExportView.as_view(), name='eigo_export'),
+    path('search/stats/', SearchCacheStatsView.as_view(), name='eigo_search_stats'),
+    path('today/', PhraseOfTheDayView.as_view(), name='eigo_today'),
+    path('today/json/', PhraseOfTheDayJsonView.as_view(), name='eigo_today_json'),
+    path('', read_view(PhraseListView), name='eigo_list'),
 ]
@@ -1,15 +1,84 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+import hashlib
+
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
-from django.views.generic import ListView, DetailView
+from django.http import (
+    Http404, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse)
+from django.middleware.csrf import get_token
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.generic import ListView, DetailView, TemplateView, View
 from django.views.generic.edit import DeleteView
 from django.urls import reverse_lazy
 from extra_views import CreateWithInlinesView, UpdateWithInlinesView, NamedFormsetsMixin
 
-from .forms import ExampleInlineFormSet, SnapInlineFormSet
-from .models import Phrase
+from core.additional.uploadhandlers import ImageUploadMixin
+from .cache import daily_phrase_cache, phrase_cell_cache, search_cache
+from .export import EXPORT_CSV, EXPORT_FORMATS, EXPORT_NDJSON, export_phrases, parse_since
+from .forms import ExampleInlineFormSet, PhraseForm, SnapInlineFormSet
+from .models import Example, Phrase
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import SEARCH_MODES, update_search_vector
+from .suggest import phrase_index
+
+
+class ConditionalGetMixin:
+    """
+    mixin to answer repeat visits with 304 Not Modified.
+
+    get_validators() returns what the page shows in a cheap form, and the ETag is
+    a hash of it together with the user and the csrf secret embedded in the page.
+    when the browser sends a matching If-None-Match or If-Modified-Since,
+    the response is returned before the page queries and template rendering run.
+    """
+
+    def get(self, request, *args, **kwargs):
+        validators = None
+        if not len(messages.get_messages(request)):
+            # a page with pending messages must be rendered to show them
+            validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        parts, last_modified = validators
+        etag = self.make_etag(parts)
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if last_modified and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(last_modified)
+        response.setdefault('ETag', etag)
+        # the page is per user and must be revalidated on every visit
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_validators(self):
+        """
+        Returns:
+            Tuple: values that change when the page changes and the newest
+                   modification time (datetime or None). None to always render the page.
+        """
+        return None
+
+    def make_etag(self, parts):
+        """
+        Args:
+            parts (Iterable): values returned by get_validators()
+
+        Returns:
+            str: quoted ETag
+        """
+        # make sure the csrf secret exists, so the first visit and
+        # the next ones get the same ETag
+        get_token(self.request)
+        key = [self.request.user.pk, self.request.META['CSRF_COOKIE'], *parts]
+        return quote_etag(hashlib.md5(repr(key).encode()).hexdigest())
 
 
-class PhraseListView(LoginRequiredMixin, ListView):
+class PhraseListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     """
     list all objects to template.
     Login is required.
@@ -21,11 +90,18 @@ class PhraseListView(LoginRequiredMixin, ListView):
                                    for ListView's it defaults to 'object_list'
         login_url (str): a django named path to login page.
                          needed because this view is login required by LoginRequiredMixin
+        ordering (List): default ordering. replaced by relevance for ranked searches.
+        paginate_by (int): number of objects rendered per page.
+        paginator_class (KeysetPaginator): cursor based paginator.
+                                           page N costs the same as page 1.
     """
     model = Phrase
     template_name = 'eigo/eigo_list.html'
     context_object_name = 'eigo_list'
     login_url = 'account_login'
+    ordering = ['-timestamp', '-id']
+    paginate_by = 20
+    paginator_class = KeysetPaginator
 
     def get_queryset(self):
         """
@@ -34,24 +110,272 @@ class PhraseListView(LoginRequiredMixin, ListView):
 
         1. see if url contains 'search' query params(?search=)
            if so, get that value and search through the data using .search()
+           the search mode can be chosen with 'mode' query params(?mode=fuzzy)
+           results are cached by search_cache
         2. see if url contains 'ordering' query params(?ordering=)
            if so, changed the ordering of the listed objects using .order_by()
+        3. see if url contains 'has_snaps' query params(?has_snaps=1)
+           if so, only list phrases with snaps
 
         Returns:
             queryset: return filtered_ordered object list to template.
         """
+        if hasattr(self, '_queryset'):
+            # already built by get_validators()
+            return self._queryset
         queryset = Phrase.objects.all()
         if (query := self.request.GET.get('search')):
-            queryset = Phrase.objects.search(query)
-        if (ordering := self.request.GET.get('ordering')):
-            if ordering == 'up':
-                queryset = queryset.order_by('-phrase')
-            if ordering == 'down':
-                queryset = queryset.order_by('phrase')
-        return queryset
+            queryset = search_cache.search(query, mode=self.get_search_mode())
+            if 'rank' in queryset.query.annotations:
+                # full-text and fuzzy search results are ordered by relevance
+                self.ordering = ['-rank', '-id']
+        if self.request.GET.get('has_snaps'):
+            queryset = queryset.has_snaps()
+        self._queryset = queryset.order_by(*self.get_ordering()).for_list()
+        return self._queryset
+
+    def get_validators(self):
+        """
+        read the pk, 'updated' and counts of the rows of the requested page in one query.
+        the page's rows depend on the query string, which is part of the url,
+        so the rows are enough to tell whether the page changed.
+
+        Returns:
+            Tuple: rows of the page and the newest 'updated' among them
+        """
+        paginator = self.get_paginator(self.get_queryset(), self.get_paginate_by(None))
+        try:
+            rows = list(paginator.page_queryset(self.request.GET.get('cursor')).values_list(
+                'pk', 'updated', 'example_count', 'snap_count'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        last_modified = max((row[1] for row in rows), default=None)
+        return rows, last_modified
+
+    def get_search_mode(self):
+        """
+        Returns:
+            str: search mode from 'mode' query params(?mode=). None for the default mode.
+        """
+        mode = self.request.GET.get('mode')
+        return mode if mode in SEARCH_MODES else None
+
+    def get_ordering(self):
+        """
+        decide the ordering from 'ordering' query params(?ordering=).
+        the last field is always unique so it can be used as a cursor.
+
+        Returns:
+            List: field names to order by.
+        """
+        ordering = self.request.GET.get('ordering')
+        if ordering == 'up':
+            return ['-phrase']
+        if ordering == 'down':
+            return ['phrase']
+        return self.ordering
+
+    def get_paginator(self, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True, **kwargs):
+        """
+        pass the ordering to the KeysetPaginator instead of orphans settings.
+        """
+        return self.paginator_class(queryset, per_page, self.get_ordering())
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        paginate using the cursor in 'cursor' query params(?cursor=).
+
+        Returns:
+            Tuple: paginator, page, object list and whether there are other pages.
+        """
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        """
+        add the rendered cards of the page (cached by phrase_cell_cache)
+        and the query string of the next page keeping 'search' and 'ordering'.
+        """
+        context = super().get_context_data(**kwargs)
+        context['eigo_cells'] = phrase_cell_cache.render_many(context['eigo_list'])
+        page = context['page_obj']
+        if page is not None and page.has_next():
+            query = self.request.GET.copy()
+            query['cursor'] = page.next_cursor
+            context['next_page_query'] = query.urlencode()
+        return context
+
+
+class PhraseListPageView(PhraseListView):
+    """
+    render only the list cells of a page.
+    used for infinite scroll in the list page.
+
+    Attributes:
+        template_name (str): a path to template that renders the cells and the next page link
+    """
+    template_name = 'eigo/eigo_list_page.html'
+
+
+class PhraseSuggestView(LoginRequiredMixin, View):
+    """
+    return completions for the search box as json.
+    served from the in-process prefix index, so it does not query the database.
+    Login is required.
+
+    Attributes:
+        login_url (str): a django named path to login page.
+                         needed because this view is login required by LoginRequiredMixin
+        default_limit (int): number of completions when 'limit' is not given.
+        max_limit (int): upper bound for 'limit' query params(?limit=).
+    """
+    login_url = 'account_login'
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        """
+        complete the 'q' query params(?q=).
+
+        Returns:
+            JsonResponse: {"suggestions": [phrase, ...]}
+        """
+        try:
+            limit = int(request.GET.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+        suggestions = phrase_index.suggest(request.GET.get('q', ''), limit)
+        return JsonResponse({'suggestions': suggestions})
+
+
+class SearchCacheStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    return hit and miss counts of the search cache as json.
+    Staff only.
+
+    Attributes:
+        login_url (str): a django named path to login page.
+                         needed because this view is login required by LoginRequiredMixin
+    """
+    login_url = 'account_login'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns:
+            JsonResponse: {"hits": int, "misses": int, "hit_rate": float}
+        """
+        return JsonResponse(search_cache.stats())
+
+
+class PhraseExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    stream every phrase with its examples and snap urls as a file download.
+    Staff only.
+
+    Attributes:
+        login_url (str): a django named path to login page.
+                         needed because this view is login required by LoginRequiredMixin
+        content_types (Dict): content type of each export format
+    """
+    login_url = 'account_login'
+    content_types = {
+        EXPORT_NDJSON: 'application/x-ndjson',
+        EXPORT_CSV: 'text/csv',
+    }
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        """
+        export in the 'format' query params(?format=csv), ndjson by default.
+        'since' query params(?since=2020-08-01) limits the export to phrases changed since then.
+
+        Returns:
+            StreamingHttpResponse: the export as an attachment
+        """
+        export_format = request.GET.get('format', EXPORT_NDJSON)
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Invalid format.')
+        since = None
+        if request.GET.get('since'):
+            try:
+                since = parse_since(request.GET['since'])
+            except ValueError:
+                return HttpResponseBadRequest('Invalid since.')
+        response = StreamingHttpResponse(
+            export_phrases(export_format, since),
+            content_type=self.content_types[export_format])
+        response['Content-Disposition'] = f'attachment; filename="phrases.{export_format}"'
+        return response
+
+
+class PhraseOfTheDayMixin:
+    """
+    mixin to fetch the phrase of the day for the request.
+    """
+
+    def get_phrase_of_the_day(self):
+        """
+        Returns:
+            Dict: the phrase of the day. None if there are no phrases yet.
+        """
+        user = self.request.user if settings.PHRASE_OF_THE_DAY_PER_USER else None
+        return daily_phrase_cache.get(user)
+
+
+class PhraseOfTheDayView(LoginRequiredMixin, PhraseOfTheDayMixin, TemplateView):
+    """
+    show the phrase of the day.
+    served from the cache, so it usually does not query the phrase tables.
+    Login is required.
+
+    Attributes:
+        template_name (str): a path to template that is responsible to render objects
+        login_url (str): a django named path to login page.
+                         needed because this view is login required by LoginRequiredMixin
+    """
+    template_name = 'eigo/eigo_today.html'
+    login_url = 'account_login'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['daily'] = self.get_phrase_of_the_day()
+        return context
+
+
+class PhraseOfTheDayJsonView(LoginRequiredMixin, PhraseOfTheDayMixin, View):
+    """
+    return the phrase of the day as json.
+    Login is required.
+
+    Attributes:
+        login_url (str): a django named path to login page.
+                         needed because this view is login required by LoginRequiredMixin
+    """
+    login_url = 'account_login'
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns:
+            JsonResponse: the phrase of the day. 404 if there are no phrases yet.
+        """
+        daily = self.get_phrase_of_the_day()
+        if daily is None:
+            return JsonResponse({'error': 'No phrase of the day.'}, status=404)
+        return JsonResponse(daily)
 
 
-class PhraseDetailView(LoginRequiredMixin, DetailView):
+class PhraseDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     """
     pass object to template.
     Login is required.
@@ -69,11 +393,99 @@ class PhraseDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'eigo'
     login_url = 'account_login'
 
+    def get_queryset(self):
+        """
+        override this method to fetch the counts, the user and
+        the active examples and snaps along with the object.
+
+        Returns:
+            queryset: queryset prepared for the detail template.
+        """
+        return Phrase.objects.all().for_detail()
+
+    def get_validators(self):
+        """
+        read the phrase's 'updated' and counts and the newest 'updated' of
+        its active examples and snaps in one query.
+
+        Returns:
+            Tuple: the values and the newest 'updated'. None if the phrase does not exist.
+        """
+        values = Phrase.objects.all().filter(pk=self.kwargs['pk']).with_children_updated(
+        ).values_list('updated', 'examples_updated', 'snaps_updated',
+                      'example_count', 'snap_count', 'user_id').first()
+        if values is None:
+            # let DetailView raise 404
+            return None
+        last_modified = max(updated for updated in values[:3] if updated is not None)
+        return values, last_modified
 
-class PhraseCreateView(LoginRequiredMixin, NamedFormsetsMixin, CreateWithInlinesView):
+
+class PhraseWithInlinesMixin:
+    """
+    mixin to save a phrase and its example and snap formsets in one transaction.
+
+    the formsets insert and update their objects in batches (see BatchedInlineFormSet),
+    so signals do not run for those. instead the phrase is saved after them, and its
+    signals refresh the search vector, the suggest index and the caches once.
+    an edit is refused with 409 Conflict when the phrase was saved by someone else
+    after the form was rendered, and a submission without changes writes nothing.
+    """
+
+    def forms_valid(self, form, inlines):
+        creating = form.instance._state.adding
+        with transaction.atomic():
+            if creating:
+                self.object = form.save()
+            else:
+                if not self.is_current(form):
+                    return self.forms_conflict(form, inlines)
+                changed = [name for name in form.changed_data if name != 'last_updated']
+                if not changed and not any(formset.has_changed() for formset in inlines):
+                    return HttpResponseRedirect(self.get_success_url())
+            for formset in inlines:
+                formset.instance = self.object
+                formset.save()
+            if creating:
+                examples = [formset for formset in inlines if formset.model is Example]
+                if any(formset.new_objects for formset in examples):
+                    # the phrase was saved before its examples existed
+                    update_search_vector(Phrase.objects.filter(pk=self.object.pk))
+                    search_cache.invalidate()
+            else:
+                self.object.save(update_fields=['phrase', 'updated'])
+        return HttpResponseRedirect(self.get_success_url())
+
+    def is_current(self, form):
+        """
+        lock the phrase until the transaction ends and check that it was not saved
+        since the form was rendered. forms without the token are not checked.
+
+        Returns:
+            bool: True if the phrase can be saved
+        """
+        last_updated = form.cleaned_data.get('last_updated')
+        updated = Phrase._base_manager.select_for_update().filter(
+            pk=form.instance.pk).order_by().values_list('updated', flat=True).first()
+        return last_updated is None or updated == last_updated
+
+    def forms_conflict(self, form, inlines):
+        """
+        render the form again with an error, keeping what the user entered.
+        """
+        form.add_error(None, 'This phrase was changed by someone else. '
+                             'Reload the page to see the changes and try again.')
+        response = self.forms_invalid(form, inlines)
+        response.status_code = 409
+        return response
+
+
+class PhraseCreateView(ImageUploadMixin, LoginRequiredMixin, PhraseWithInlinesMixin,
+                       NamedFormsetsMixin, CreateWithInlinesView):
     """
     passes form class for creating new object.
     Login is required.
+    snaps are checked by ImageUploadHandler while they are uploaded.
 
     Attributes:
         model (Phrase): target model to fetch data from.
@@ -82,7 +494,7 @@ class PhraseCreateView(LoginRequiredMixin, NamedFormsetsMixin, CreateWithInlines
         inlines_names (List): set custom names for inlineformsets included in inlines attribute.
                               this is for CreateWithInlinesView but only can be used because
                               NamedFormsetsMixin is set
-        fields (Tuple): set fields to render to template. for default CreateView
+        form_class (PhraseForm): form of the phrase
         template_name (str): a path to template that is responsible to render objects
         success_url (str): a url to render after creation is successful
         login_url (str): a django named path to login page.
@@ -91,25 +503,27 @@ class PhraseCreateView(LoginRequiredMixin, NamedFormsetsMixin, CreateWithInlines
     model = Phrase
     inlines = [ExampleInlineFormSet, SnapInlineFormSet]
     inlines_names = ['example_formset', 'snap_formset']
-    fields = ('phrase',)
+    form_class = PhraseForm
     template_name = 'eigo/eigo_new.html'
     success_url = reverse_lazy('eigo:eigo_list')
     login_url = 'account_login'
 
-    def form_valid(self, form):
+    def get_form(self, form_class=None):
         """
-        default function for CreateView that is called when
-        the form user submits is valid.
         override to set current login user to user field in model.
+        the owner of a phrase does not change when someone else edits it.
         """
+        form = super().get_form(form_class)
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        return form
 
 
-class PhraseUpdateView(LoginRequiredMixin, NamedFormsetsMixin, UpdateWithInlinesView):
+class PhraseUpdateView(ImageUploadMixin, LoginRequiredMixin, PhraseWithInlinesMixin,
+                       NamedFormsetsMixin, UpdateWithInlinesView):
     """
     passes form class for updating objects.
     Login is required.
+    snaps are checked by ImageUploadHandler while they are uploaded.
 
     Attributes:
         model (Phrase): target model to fetch data from.
@@ -118,7 +532,7 @@ class PhraseUpdateView(LoginRequiredMixin, NamedFormsetsMixin, UpdateWithInlines
         inlines_names (List): set custom names for inlineformsets included in inlines attribute.
                               this is for UpdateWithInlinesView but only can be used because
                               NamedFormsetsMixin is set
-        fields (Tuple): set fields to render to template. for default UpdateView
+        form_class (PhraseForm): form of the phrase with the 'updated' it was rendered with
         template_name (str): a path to template that is responsible to render objects
         login_url (str): a django named path to login page.
                          needed because this view is login required by LoginRequiredMixin
@@ -126,19 +540,10 @@ class PhraseUpdateView(LoginRequiredMixin, NamedFormsetsMixin, UpdateWithInlines
     model = Phrase
     inlines = [ExampleInlineFormSet, SnapInlineFormSet]
     inlines_names = ['example_formset', 'snap_formset']
-    fields = ('phrase',)
+    form_class = PhraseForm
     template_name = 'eigo/eigo_edit.html'
     login_url = 'account_login'
 
-    def form_valid(self, form):
-        """
-        default function for UpdateView that is called when
-        the form user submits is valid.
-        override to set current login user to user field in model.
-        """
-        form.instance.user = self.request.user
-        return super().form_valid(form)
-
     def get_success_url(self):
         """
         default function for UpdateView that is called when
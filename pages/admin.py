@@ -1,3 +1,57 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import MarkdownImage, UploadSession
+
+
+class MarkdownImageAdmin(admin.ModelAdmin):
+    """
+    custom admin for model MarkdownImage
+
+    Attributes:
+        list_desplay (List): list of fields in model to display in admin site.
+        list_filter (List): list of fields in model that the user can filter through in admin site.
+        date_hierarchy (str): date field to drill down by in admin site.
+    """
+    list_display = [
+        'name',
+        'status',
+        'url',
+        'timestamp',
+    ]
+    list_filter = [
+        'status',
+    ]
+    date_hierarchy = 'timestamp'
+
+
+admin.site.register(MarkdownImage, MarkdownImageAdmin)
+
+
+class UploadSessionAdmin(admin.ModelAdmin):
+    """
+    custom admin for model UploadSession
+
+    Attributes:
+        list_desplay (List): list of fields in model to display in admin site.
+        list_filter (List): list of fields in model that the user can filter through in admin site.
+        list_select_related (List): related objects fetched with the list in one query.
+        date_hierarchy (str): date field to drill down by in admin site.
+    """
+    list_display = [
+        'name',
+        'user',
+        'status',
+        'offset',
+        'size',
+        'updated',
+    ]
+    list_filter = [
+        'status',
+    ]
+    list_select_related = [
+        'user',
+    ]
+    date_hierarchy = 'timestamp'
+
+
+admin.site.register(UploadSession, UploadSessionAdmin)
@@ -0,0 +1,42 @@
+import os
+import re
+
+from django import forms
+from django.conf import settings
+
+from core.additional.uploadhandlers import size_error
+from .models import UploadSession
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadSessionForm(forms.ModelForm):
+    """
+    form to start an UploadSession.
+
+    Attributes:
+        model (UploadSession): model to create
+        fields (Tuple): the file's name, size and optionally its sha256 hex digest
+    """
+
+    class Meta:
+        model = UploadSession
+        fields = ('name', 'size', 'sha256')
+
+    def clean_name(self):
+        # only keep the file name of paths some browsers send
+        return os.path.basename(self.cleaned_data['name'].replace('\\', '/'))
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size == 0:
+            raise forms.ValidationError('The file is empty.')
+        if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise forms.ValidationError(size_error(settings.MAX_IMAGE_UPLOAD_SIZE))
+        return size
+
+    def clean_sha256(self):
+        sha256 = self.cleaned_data['sha256'].lower()
+        if sha256 and not SHA256_HEX.match(sha256):
+            raise forms.ValidationError('Not a sha256 hex digest.')
+        return sha256
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pages.models import UploadSession
+
+
+class Command(BaseCommand):
+    """
+    remove upload sessions that have not been used for settings.UPLOAD_SESSION_EXPIRY seconds,
+    together with their files. run it periodically, e.g. from the scheduler.
+
+        python manage.py purge_upload_sessions
+    """
+    help = 'Remove expired upload sessions and their files.'
+
+    def handle(self, *args, **options):
+        purged = 0
+        for session in UploadSession.objects.expired().iterator():
+            with transaction.atomic():
+                session.discard()
+            purged += 1
+        self.stdout.write(f'Purged {purged} upload sessions.')
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# run in a fresh interpreter for every measurement, so nothing is imported yet
+STARTUP_SCRIPT = """
+import json, time
+from importlib import import_module
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.conf import settings
+import_module(settings.ROOT_URLCONF)
+print(json.dumps({'setup': setup - started, 'urlconf': time.perf_counter() - setup}))
+"""
+
+# a line of 'python -X importtime': 'import time:  self [us] | cumulative | imported package'.
+# nested imports are indented by two spaces per level.
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    """
+    measure how long a process takes to start, to track cold starts
+    of dynos and 'manage.py' commands over time.
+
+        python manage.py startup_benchmark
+        ENVIRONMENT=production python manage.py startup_benchmark --repeat 10 --json
+
+    every run starts a new interpreter with 'python -X importtime' that calls django.setup()
+    and imports the urlconf, like the first request does. the report has the median
+    of the runs and the packages and modules that take the most time to import.
+    """
+    help = 'Measure django.setup() time and the slowest imports of a fresh process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=5, help='number of processes to start.')
+        parser.add_argument(
+            '--top', type=int, default=15, help='number of packages and modules to list.')
+        parser.add_argument(
+            '--environment', choices=['development', 'production'],
+            help='settings profile to start with. defaults to the ENVIRONMENT variable.')
+        parser.add_argument(
+            '--json', action='store_true', help='print the result as json.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        env = {**os.environ,
+               'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings')}
+        if options['environment']:
+            env['ENVIRONMENT'] = options['environment']
+        runs = [self.run(env) for _ in range(options['repeat'])]
+        result = summarize(runs, options['top'])
+        result['environment'] = env.get('ENVIRONMENT') or 'development'
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.write_result(result)
+
+    def run(self, env):
+        """
+        Returns:
+            Dict: wall time of the process, setup and urlconf time in seconds,
+                  and the import times of the modules in microseconds
+        """
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            env=env, cwd=settings.BASE_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        elapsed = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError(f'The process failed to start:\n{process.stderr[-2000:]}')
+        run = json.loads(process.stdout.strip().splitlines()[-1])
+        run['process'] = elapsed
+        run['imports'] = parse_import_times(process.stderr)
+        return run
+
+    def write_result(self, result):
+        self.stdout.write(
+            f'{result["environment"]}: median of {result["runs"]} runs. '
+            f'process {result["process_ms"]}ms, django.setup() {result["setup_ms"]}ms '
+            f'(min {result["setup_min_ms"]}ms, max {result["setup_max_ms"]}ms), '
+            f'urlconf {result["urlconf_ms"]}ms, {result["modules_imported"]} modules imported.')
+        self.stdout.write('packages by import time:')
+        for row in result['packages']:
+            self.stdout.write(f'  {row["self_ms"]:>8.1f}ms  {row["name"]}')
+        self.stdout.write('modules by cumulative import time:')
+        for row in result['modules']:
+            self.stdout.write(
+                f'  {row["cumulative_ms"]:>8.1f}ms  {row["self_ms"]:>8.1f}ms self  {row["name"]}')
+
+
+def parse_import_times(output):
+    """
+    Args:
+        output (str): stderr of 'python -X importtime'
+
+    Returns:
+        Dict: self and cumulative import time of each module in microseconds
+    """
+    imports = {}
+    for line in output.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            imports[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return imports
+
+
+def summarize(runs, top):
+    """
+    Args:
+        runs (List): results of Command.run()
+        top (int): number of packages and modules to keep
+
+    Returns:
+        Dict: medians of the runs in milliseconds, the slowest top level packages
+              by the self time of their modules and the slowest modules by cumulative time
+    """
+    setups = [run['setup'] for run in runs]
+    module_times = defaultdict(list)
+    for run in runs:
+        for name, times in run['imports'].items():
+            module_times[name].append(times)
+    modules = []
+    package_times = defaultdict(float)
+    for name, times in module_times.items():
+        self_us = statistics.median(own for own, _ in times)
+        cumulative_us = statistics.median(cumulative for _, cumulative in times)
+        modules.append({'name': name, 'self_ms': round(self_us / 1000, 1),
+                        'cumulative_ms': round(cumulative_us / 1000, 1)})
+        package_times[name.split('.')[0]] += self_us
+    packages = [{'name': name, 'self_ms': round(us / 1000, 1)}
+                for name, us in sorted(package_times.items(), key=lambda item: -item[1])]
+    modules.sort(key=lambda row: -row['cumulative_ms'])
+    return {
+        'runs': len(runs),
+        'process_ms': round(statistics.median(run['process'] for run in runs) * 1000, 1),
+        'setup_ms': round(statistics.median(setups) * 1000, 1),
+        'setup_min_ms': round(min(setups) * 1000, 1),
+        'setup_max_ms': round(max(setups) * 1000, 1),
+        'urlconf_ms': round(statistics.median(run['urlconf'] for run in runs) * 1000, 1),
+        'modules_imported': len(module_times),
+        'packages': packages[:top],
+        'modules': modules[:top],
+    }
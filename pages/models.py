@@ -1,3 +1,208 @@
-from django.db import models
+import datetime
+import os
+import tempfile
 
-# Create your models here.
+from django.conf import settings
+from django.core.files import File
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.additional.models import CoreModel
+
+
+class MarkdownImage(CoreModel):
+    """
+    model to track images uploaded to martor's markdown fields.
+    the markdown links to get_absolute_url(), which redirects to the uploaded file,
+    so the link can be handed out before the upload to the storage has finished.
+
+    Attributes:
+        name (CharField): name of the uploaded file
+        status (CharField): 'pending' until the upload has finished or failed
+        url (URLField): url of the uploaded file. empty until the upload is done.
+        error (TextField): why the upload failed
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'pending'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    url = models.URLField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        """
+        determine which field of the model should be representing the model object.
+        mainly used in admin site.
+
+        Returns:
+            str: returns name field.
+        """
+        return self.name
+
+    def get_absolute_url(self):
+        """
+        Returns:
+            str: url that redirects to the uploaded image
+        """
+        return reverse('markdown_image', kwargs={'pk': self.pk})
+
+
+class StoredFile(CoreModel):
+    """
+    model to count the references to a file in ContentAddressedStorage.
+    a file is stored once per content, and removed when the last reference is deleted.
+
+    Attributes:
+        sha256 (CharField): hex digest of the content
+        name (CharField): name of the file in the backend storage
+        size (PositiveIntegerField): size of the content in bytes
+        references (PositiveIntegerField): number of saves minus number of deletes
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """
+        determine which field of the model should be representing the model object.
+        mainly used in admin site.
+
+        Returns:
+            str: returns name field.
+        """
+        return self.name
+
+
+class UploadSessionManager(models.Manager):
+    """
+    custom manager for model UploadSession.
+    """
+
+    def expired(self):
+        """
+        Returns:
+            queryset: sessions not used for settings.UPLOAD_SESSION_EXPIRY seconds
+        """
+        since = timezone.now() - datetime.timedelta(seconds=settings.UPLOAD_SESSION_EXPIRY)
+        return self.get_queryset().filter(updated__lt=since)
+
+
+class UploadSession(CoreModel):
+    """
+    model to track a file uploaded in chunks.
+    chunks are written to a file named after the session in settings.UPLOAD_SESSION_DIR,
+    and the upload can be resumed from 'offset' after the connection drops.
+    a complete session is handed to a form by its pk instead of the file.
+
+    Attributes:
+        user (ForeignKey): the user uploading the file
+        name (CharField): name of the file
+        size (PositiveIntegerField): size of the whole file in bytes
+        sha256 (CharField): hex digest of the whole file. checked when the last chunk arrives.
+                            filled in by then if the client did not send it.
+        offset (PositiveIntegerField): number of bytes received so far
+        status (CharField): 'pending' until all chunks are received
+        error (TextField): why the upload failed
+    """
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'pending'),
+        (COMPLETE, 'complete'),
+        (FAILED, 'failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions')
+    name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    offset = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+
+    objects = UploadSessionManager()
+
+    def __str__(self):
+        """
+        determine which field of the model should be representing the model object.
+        mainly used in admin site.
+
+        Returns:
+            str: returns name field.
+        """
+        return self.name
+
+    def get_absolute_url(self):
+        """
+        Returns:
+            str: url to send chunks to and read the status from
+        """
+        return reverse('upload_session', kwargs={'pk': self.pk})
+
+    @property
+    def path(self):
+        """
+        Returns:
+            str: path of the file the chunks are written to
+        """
+        directory = settings.UPLOAD_SESSION_DIR or tempfile.gettempdir()
+        return os.path.join(directory, f'upload-session-{self.pk}')
+
+    def open(self):
+        """
+        open the assembled file.
+        the digest is set on the file so ContentAddressedStorage does not hash it again.
+
+        Returns:
+            File: the file named after the session. the caller closes it.
+        """
+        file = File(open(self.path, 'rb'), name=self.name)
+        file.sha256 = self.sha256
+        return file
+
+    def fail(self, error):
+        """
+        mark the session as failed. the file is removed once the transaction commits.
+
+        Args:
+            error (str): why the upload failed
+        """
+        path = self.path
+        self.status = self.FAILED
+        self.error = str(error)
+        self.save(update_fields=['status', 'error', 'updated'])
+        transaction.on_commit(lambda: remove_file(path))
+
+    def discard(self):
+        """
+        delete the session and, once the transaction commits, its file.
+        """
+        path = self.path
+        self.delete()
+        transaction.on_commit(lambda: remove_file(path))
+
+
+def remove_file(path):
+    """
+    remove a file if it exists.
+
+    Args:
+        path (str): path of the file
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,158 @@
+import hashlib
+import os
+
+from django.core.files.storage import Storage, get_storage_class
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_content(content):
+    """
+    hash a file in chunks and rewind it.
+    a 'sha256' attribute set while the file was received is used instead if there is one.
+
+    Args:
+        content (File): the file
+
+    Returns:
+        Tuple: hex digest and size of the content
+    """
+    digest = getattr(content, 'sha256', None)
+    if digest is not None and content.size is not None:
+        return digest, content.size
+    sha256 = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        sha256.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha256.hexdigest(), size
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    """
+    storage that keeps one copy of each distinct content.
+
+    files are hashed and stored in the backend storage under 'cas/<aa>/<bb>/<sha256><ext>'.
+    saving content that is already stored does not upload anything and only adds
+    a reference in StoredFile. delete() removes a reference, and the file itself once
+    no references are left, so django_cleanup can call it for every replaced or
+    deleted file.
+
+    Attributes:
+        backend (str): dotted path of the storage class holding the files.
+                       defaults to settings.DEFAULT_FILE_STORAGE (cloudinary or the file system).
+        prefix (str): directory of the files in the backend
+
+    Note:
+        files saved before this storage was used have no StoredFile.
+        they are passed through to the backend as they are.
+    """
+
+    def __init__(self, backend=None, prefix='cas'):
+        self.backend_class = backend
+        self.prefix = prefix
+
+    @property
+    def backend(self):
+        # resolved on use so settings overrides in tests apply
+        return get_storage_class(self.backend_class)()
+
+    def make_name(self, digest, name):
+        """
+        Args:
+            digest (str): hex digest of the content
+            name (str): name the file was saved with. only its extension is kept.
+
+        Returns:
+            str: name to store the content under
+        """
+        extension = os.path.splitext(name)[1].lower()
+        return f'{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def reference(self, digest):
+        """
+        add a reference to already stored content.
+
+        Args:
+            digest (str): hex digest of the content
+
+        Returns:
+            str: name of the stored file. None if the content is not stored.
+        """
+        from .models import StoredFile
+        updated = StoredFile.objects.filter(sha256=digest).update(
+            references=F('references') + 1)
+        if not updated:
+            return None
+        return StoredFile.objects.values_list('name', flat=True).get(sha256=digest)
+
+    def get_available_name(self, name, max_length=None):
+        # names are decided by the content in _save()
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredFile
+        digest, size = hash_content(content)
+        stored = self.reference(digest)
+        if stored is not None:
+            return stored
+        stored = self.backend.save(self.make_name(digest, name), content)
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(
+                    sha256=digest, name=stored, size=size, references=1)
+        except IntegrityError:
+            # the same content was stored by another request at the same time
+            existing = self.reference(digest)
+            if existing is None:
+                raise
+            if existing != stored:
+                self.backend.delete(stored)
+            return existing
+        return stored
+
+    def delete(self, name):
+        """
+        remove a reference to the file, and the file when it was the last one.
+        """
+        from .models import StoredFile
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                self.backend.delete(name)
+                return
+            if stored.references > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    references=F('references') - 1)
+                return
+            stored.delete()
+            backend = self.backend
+            transaction.on_commit(lambda: backend.delete(name))
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -1,3 +1,438 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile, StopUpload
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings)
+from PIL import Image
+
+from core.additional.tasks import TaskPool, TaskPoolFull
+from core.additional.uploadhandlers import ImageUploadHandler
+from eigo.models import Phrase, Snap
+from .management.commands.startup_benchmark import parse_import_times
+from .models import MarkdownImage, StoredFile, UploadSession
+from .storage import ContentAddressedStorage
+
+
+def make_png(name='image.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class MarkdownImageUploaderTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        override = override_settings(
+            MEDIA_ROOT=media.name,
+            MARKDOWN_UPLOAD_BACKEND='pages.uploads.LocalUploadBackend',
+            MARKDOWN_UPLOAD_SPOOL_DIR=spool.name,
+            TASKS_ALWAYS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.url = reverse('markdown_uploader_page')
+
+    def upload(self, image):
+        return self.client.post(self.url, {'markdown-image-upload': image},
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_async_upload(self):
+        response = self.upload(make_png('my image.png'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['name'].endswith('-my-image.png'))
+        image = MarkdownImage.objects.get()
+        self.assertEqual(image.status, MarkdownImage.DONE)
+        self.assertTrue(data['link'].endswith(image.get_absolute_url()))
+        response = self.client.get(image.get_absolute_url())
+        self.assertRedirects(response, image.url, fetch_redirect_response=False)
+        self.assertIn('memo/', image.url)
+        # the spooled file is removed after the upload
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    @override_settings(MARKDOWN_UPLOAD_BACKEND='pages.uploads.ContentAddressedUploadBackend',
+                       DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+    def test_repeat_upload_is_skipped(self):
+        first = self.upload(make_png()).json()
+        second = self.upload(make_png()).json()
+        self.assertNotEqual(first['name'], second['name'])
+        images = MarkdownImage.objects.order_by('timestamp')
+        self.assertEqual(images[0].url, images[1].url)
+        self.assertIn('cas/', images[0].url)
+        # the markdown images share a single reference
+        self.assertEqual(StoredFile.objects.get().references, 1)
+        self.upload(make_png())
+        self.assertEqual(StoredFile.objects.get().references, 1)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    @override_settings(MARKDOWN_UPLOAD_BACKEND='pages.uploads.ContentAddressedUploadBackend',
+                       DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+    def test_upload_takes_a_reference_to_a_snap_image(self):
+        png = make_png()
+        stored = ContentAddressedStorage().save('snap.png', png)
+        png.seek(0)
+        self.upload(png)
+        self.assertEqual(StoredFile.objects.get(name=stored).references, 2)
+
+    @override_settings(MARKDOWN_UPLOAD_ASYNC=False)
+    def test_sync_upload(self):
+        data = self.upload(make_png()).json()
+        self.assertEqual(data['link'], MarkdownImage.objects.get().url)
+
+    def test_status(self):
+        image = MarkdownImage.objects.create(name='image.png')
+        url = image.get_absolute_url()
+        self.assertEqual(self.client.get(url).status_code, 202)
+        response = self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['status'], 'pending')
+        image.status = MarkdownImage.FAILED
+        image.save()
+        self.assertEqual(self.client.get(url).status_code, 410)
+
+    @override_settings(MARKDOWN_UPLOAD_BACKEND='pages.uploads.UploadBackend')
+    def test_failed_upload(self):
+        self.assertEqual(self.upload(make_png()).status_code, 200)
+        self.assertEqual(MarkdownImage.objects.get().status, MarkdownImage.FAILED)
+        with override_settings(MARKDOWN_UPLOAD_ASYNC=False):
+            self.assertEqual(self.upload(make_png()).status_code, 500)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_validation(self):
+        bad = SimpleUploadedFile('file.txt', b'text', content_type='text/plain')
+        self.assertEqual(self.upload(bad).status_code, 405)
+        with override_settings(MAX_IMAGE_UPLOAD_SIZE=10):
+            response = self.upload(make_png())
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('MB', response.json()['error'])
+        self.assertFalse(MarkdownImage.objects.exists())
+
+    def test_content_type_is_not_trusted(self):
+        spoofed = SimpleUploadedFile('image.png', b'<script></script>', content_type='image/png')
+        response = self.upload(spoofed)
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.json()['error'], 'Bad image format.')
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_csrf_is_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(self.url, {'markdown-image-upload': make_png()},
+                               HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 403)
+
+
+class ImageUploadHandlerTestCase(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().post('/')
+        self.handler = ImageUploadHandler(self.request, max_size=1000)
+        self.handler.new_file('image', 'image.png', 'image/png', None)
+
+    def test_image_chunks_pass_through(self):
+        png = make_png().read()
+        self.assertEqual(self.handler.receive_data_chunk(png, 0), png)
+        self.assertEqual(self.request.upload_types['image'], 'image/png')
+        self.assertEqual(self.request.upload_errors, {})
+
+    def test_oversized_file_stops_at_the_chunk_over_the_limit(self):
+        png = make_png().read()
+        self.handler.receive_data_chunk(png, 0)
+        with self.assertRaises(StopUpload) as raised:
+            self.handler.receive_data_chunk(b'\0' * 1000, len(png))
+        self.assertTrue(raised.exception.connection_reset)
+        self.assertIn('MB', str(self.request.upload_errors['image']))
+        self.assertIn('MB', str(self.request.upload_stopped))
+
+    def test_declared_length_is_checked_before_reading(self):
+        with self.assertRaises(StopUpload):
+            self.handler.new_file('image', 'image.png', 'image/png', 2000)
+
+    def test_non_image_is_skipped_at_the_first_chunk(self):
+        with self.assertRaises(SkipFile):
+            self.handler.receive_data_chunk(b'%PDF-1.4\n', 0)
+        self.assertEqual(self.request.upload_types['image'], 'application/pdf')
+
+
+class UploadSessionTestCase(TestCase):
+
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        override = override_settings(UPLOAD_SESSION_DIR=spool.name, UPLOAD_CHUNK_SIZE=64)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = get_user_model().objects.create_user(
+            username='uploaduser', email='uploaduser@email.com', password='testpass1234')
+        self.client.login(email='uploaduser@email.com', password='testpass1234')
+        self.png = make_png().read()
+
+    def start(self, content=None, **data):
+        content = self.png if content is None else content
+        data = {'name': 'C:\\fakepath\\image.png', 'size': len(content), **data}
+        response = self.client.post(reverse('upload_sessions'), data)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put(self, session, offset, chunk, checksum=None):
+        return self.client.put(
+            session['url'], chunk, content_type='application/octet-stream',
+            HTTP_X_UPLOAD_OFFSET=str(offset),
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(chunk).hexdigest())
+
+    def send(self, session, content=None):
+        content = self.png if content is None else content
+        for offset in range(0, len(content), session['chunk_size']):
+            response = self.put(session, offset, content[offset:offset + session['chunk_size']])
+        return response
+
+    def test_upload_in_chunks(self):
+        session = self.start()
+        self.assertEqual(session['name'], 'image.png')
+        self.assertEqual(session['chunk_size'], 64)
+        data = self.send(session).json()
+        self.assertEqual(data['status'], UploadSession.COMPLETE)
+        self.assertEqual(data['offset'], len(self.png))
+        upload = UploadSession.objects.get()
+        self.assertEqual(upload.sha256, hashlib.sha256(self.png).hexdigest())
+        with upload.open() as f:
+            self.assertEqual(f.read(), self.png)
+
+    def test_resume(self):
+        session = self.start()
+        self.assertEqual(self.put(session, 0, self.png[:64]).status_code, 200)
+        # the response was lost and the chunk is sent again
+        self.assertEqual(self.put(session, 0, self.png[:64]).json()['offset'], 64)
+        # a chunk from the wrong place is refused with the offset to continue from
+        response = self.put(session, 128, self.png[128:192])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 64)
+        self.assertEqual(self.client.get(session['url']).json()['offset'], 64)
+        for offset in range(64, len(self.png), 64):
+            response = self.put(session, offset, self.png[offset:offset + 64])
+        self.assertEqual(response.json()['status'], UploadSession.COMPLETE)
+        with UploadSession.objects.get().open() as f:
+            self.assertEqual(f.read(), self.png)
+
+    def test_chunk_checksum(self):
+        session = self.start()
+        response = self.put(session, 0, self.png[:64], checksum='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_file_checksum(self):
+        session = self.start(sha256='0' * 64)
+        response = self.send(session)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['error'], 'Checksum mismatch.')
+
+    def test_not_an_image(self):
+        session = self.start(b'%PDF-1.4\n' * 10)
+        response = self.put(session, 0, b'%PDF-1.4\n' * 6)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['status'], UploadSession.FAILED)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_limits(self):
+        with override_settings(MAX_IMAGE_UPLOAD_SIZE=10):
+            response = self.client.post(reverse('upload_sessions'),
+                                        {'name': 'image.png', 'size': 11})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.json()['errors'])
+        session = self.start()
+        self.assertEqual(self.put(session, 0, self.png[:65]).status_code, 413)
+        response = self.client.put(
+            session['url'], self.png[:64], content_type='application/octet-stream',
+            HTTP_X_UPLOAD_OFFSET='0', CONTENT_LENGTH='sixty-four')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid content length.')
+
+    def test_other_users_session(self):
+        session = self.start()
+        self.client.logout()
+        self.assertEqual(self.client.get(session['url']).status_code, 403)
+        get_user_model().objects.create_user(
+            username='otheruser', email='otheruser@email.com', password='testpass1234')
+        self.client.login(email='otheruser@email.com', password='testpass1234')
+        self.assertEqual(self.client.get(session['url']).status_code, 404)
+        self.assertEqual(self.put(session, 0, self.png[:64]).status_code, 404)
+
+    def test_purge(self):
+        session = self.start()
+        self.put(session, 0, self.png[:64])
+        out = io.StringIO()
+        call_command('purge_upload_sessions', stdout=out)
+        self.assertIn('Purged 0 upload sessions.', out.getvalue())
+        with override_settings(UPLOAD_SESSION_EXPIRY=-1):
+            call_command('purge_upload_sessions', stdout=out)
+        self.assertIn('Purged 1 upload sessions.', out.getvalue())
+        self.assertFalse(UploadSession.objects.exists())
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class SettingsProfileTestCase(TestCase):
+    # importing the settings must not touch the network
+    script = """
+import json, socket
+def offline(*args):
+    raise AssertionError('network call while importing the settings')
+socket.gethostbyname_ex = socket.gethostbyname = offline
+from django.conf import settings
+print(json.dumps({'apps': settings.INSTALLED_APPS, 'middleware': settings.MIDDLEWARE,
+                  'ssl_redirect': getattr(settings, 'SECURE_SSL_REDIRECT', False)}))
+"""
+
+    def load(self, **env):
+        process = subprocess.run(
+            [sys.executable, '-c', self.script],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.settings', **env},
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        return json.loads(process.stdout)
+
+    def test_production(self):
+        loaded = self.load(ENVIRONMENT='production', DEBUG='0')
+        self.assertNotIn('debug_toolbar', loaded['apps'])
+        self.assertNotIn('django_filters', loaded['apps'])
+        self.assertIn('admin_honeypot', loaded['apps'])
+        self.assertFalse(any('debug_toolbar' in name for name in loaded['middleware']))
+        self.assertTrue(loaded['ssl_redirect'])
+
+    def test_development(self):
+        loaded = self.load(ENVIRONMENT='development', DEBUG='1', ASYNC_VIEWS='0')
+        self.assertIn('debug_toolbar', loaded['apps'])
+        self.assertIn('debug_toolbar.middleware.DebugToolbarMiddleware', loaded['middleware'])
+        self.assertNotIn('admin_honeypot', loaded['apps'])
+        self.assertFalse(loaded['ssl_redirect'])
+        loaded = self.load(ENVIRONMENT='development', DEBUG='1', ASYNC_VIEWS='1')
+        self.assertNotIn('debug_toolbar', loaded['apps'])
+
+    def test_social_login_providers(self):
+        loaded = self.load(ENVIRONMENT='production', DEBUG='0', SOCIAL_LOGIN_PROVIDERS='instagram')
+        self.assertIn('allauth.socialaccount.providers.instagram', loaded['apps'])
+        loaded = self.load(ENVIRONMENT='production', DEBUG='0', SOCIAL_LOGIN_PROVIDERS='')
+        self.assertFalse(any('providers' in name for name in loaded['apps']))
+
+
+class StartupBenchmarkTestCase(TestCase):
+
+    def test_parse_import_times(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       206 |        206 |   _io\n'
+            'import time:      1200 |       3400 | django.urls\n'
+        )
+        self.assertEqual(parse_import_times(output), {
+            '_io': (206, 206),
+            'django.urls': (1200, 3400),
+        })
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('startup_benchmark', '--repeat', '1', '--top', '3', '--json', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['runs'], 1)
+        self.assertGreater(result['setup_ms'], 0)
+        self.assertGreater(result['modules_imported'], 100)
+        self.assertEqual(len(result['packages']), 3)
+        self.assertIn('django', [row['name'] for row in result['packages']])
+
+
+class TaskPoolTestCase(TestCase):
+
+    def test_bounded(self):
+        pool = TaskPool(max_workers=1, max_queue=1)
+        self.addCleanup(pool.shutdown)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        running = pool.submit(block)
+        started.wait(5)
+        waiting = pool.submit(lambda: 'queued')
+        with self.assertRaises(TaskPoolFull):
+            pool.submit(lambda: 'rejected')
+        release.set()
+        self.assertEqual(running.result(5), 'done')
+        self.assertEqual(waiting.result(5), 'queued')
+        self.assertEqual(pool.submit(lambda: 'again').result(5), 'again')
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager(self):
+        pool = TaskPool()
+        self.assertEqual(pool.submit(lambda: threading.current_thread()).result(),
+                         threading.current_thread())
+
+
+class ContentAddressedStorageTestCase(TransactionTestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        # snaps make their renditions in the task pool. run it in the test's thread
+        # so its writes do not race the test's on the shared sqlite database.
+        override = override_settings(
+            MEDIA_ROOT=media.name,
+            DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+            TASKS_ALWAYS_EAGER=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = ContentAddressedStorage()
+
+    def test_save_and_delete(self):
+        first = self.storage.save('a.png', ContentFile(b'content'))
+        second = self.storage.save('dir/b.PNG', ContentFile(b'content'))
+        other = self.storage.save('c.png', ContentFile(b'other content'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('cas/') and first.endswith('.png'))
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredFile.objects.filter(name=first).exists())
+        with self.storage.open(other) as f:
+            self.assertEqual(f.read(), b'other content')
+
+    def test_files_saved_before(self):
+        backend = self.storage.backend
+        name = backend.save('legacy.png', ContentFile(b'legacy'))
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(backend.exists(name))
+
+    def test_snaps_share_files(self):
+        user = get_user_model().objects.create_user(
+            username='phraseuser',
+            email='phraseuser@email.com',
+            password='testpass1234')
+        phrase = Phrase.objects.create(phrase='example phrase', user=user)
+        snaps = [Snap.objects.create(phrase=phrase, snap=make_png()) for i in range(2)]
+        self.assertEqual(snaps[0].snap.name, snaps[1].snap.name)
+        storage = snaps[0].snap.storage
+        # django_cleanup deletes the file of a deleted snap
+        snaps[0].delete()
+        self.assertTrue(storage.exists(snaps[1].snap.name))
+        snaps[1].delete()
+        self.assertFalse(storage.exists(snaps[1].snap.name))
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django.utils.translation import ugettext_lazy as _
+
+from core.additional.uploadhandlers import size_error, sniff_type
+
+
+class UploadBackend:
+    """
+    base class of the storages markdown images are uploaded to.
+    set the backend with settings.MARKDOWN_UPLOAD_BACKEND.
+    """
+
+    def upload(self, path, name):
+        """
+        Args:
+            path (str): path of the spooled file
+            name (str): unique file name
+
+        Returns:
+            str: url of the uploaded file
+        """
+        raise NotImplementedError
+
+    def find(self, digest):
+        """
+        Args:
+            digest (str): sha256 hex digest of the file
+
+        Returns:
+            str: url of the same content if it is already uploaded. None otherwise.
+        """
+        return None
+
+
+class CloudinaryUploadBackend(UploadBackend):
+    """
+    upload to cloudinary under '<MEDIA_URL>/memo'.
+    """
+
+    def upload(self, path, name):
+        import cloudinary.uploader
+        folder = os.path.join(settings.MEDIA_URL, 'memo')
+        result = cloudinary.uploader.upload(path, folder=folder, overwrite=True)
+        return result['url']
+
+
+class LocalUploadBackend(UploadBackend):
+    """
+    save to MEDIA_ROOT/memo. used in tests and local development.
+    """
+
+    def __init__(self):
+        self.storage = FileSystemStorage()
+
+    def upload(self, path, name):
+        with open(path, 'rb') as f:
+            name = self.storage.save(os.path.join('memo', name), File(f))
+        return self.storage.url(name)
+
+
+class ContentAddressedUploadBackend(UploadBackend):
+    """
+    save to pages.storage.content_addressed_storage, under '<prefix>/cas'
+    of the default storage. the same image is only uploaded once.
+
+    markdown bodies never release their images, so the markdown images hold
+    a single reference to each content, taken by the first upload of it.
+    later uploads of the same image reuse the file without adding references.
+    """
+
+    def upload(self, path, name):
+        from .storage import content_addressed_storage
+        with open(path, 'rb') as f:
+            stored = content_addressed_storage.save(name, File(f))
+        return content_addressed_storage.url(stored)
+
+    def find(self, digest):
+        from .models import MarkdownImage, StoredFile
+        from .storage import content_addressed_storage
+        stored = StoredFile.objects.filter(sha256=digest).values_list('name', flat=True).first()
+        if stored is None:
+            return None
+        url = content_addressed_storage.url(stored)
+        # a file only referenced by snaps is removed with them. upload it to take a reference
+        if not MarkdownImage.objects.filter(url=url, status=MarkdownImage.DONE).exists():
+            return None
+        return url
+
+
+def get_upload_backend():
+    """
+    Returns:
+        UploadBackend: instance of settings.MARKDOWN_UPLOAD_BACKEND
+    """
+    return import_string(settings.MARKDOWN_UPLOAD_BACKEND)()
+
+
+def spool(uploaded_file):
+    """
+    copy an uploaded file to a temporary file that outlives the request.
+    the content is hashed while it is copied.
+
+    Args:
+        uploaded_file (UploadedFile): the validated file
+
+    Returns:
+        Tuple: path of the copy and sha256 hex digest of the content. the caller removes the copy.
+    """
+    fd, path = tempfile.mkstemp(
+        prefix='upload-', suffix=os.path.splitext(uploaded_file.name)[1],
+        dir=settings.MARKDOWN_UPLOAD_SPOOL_DIR)
+    sha256 = hashlib.sha256()
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            sha256.update(chunk)
+            f.write(chunk)
+    return path, sha256.hexdigest()
+
+
+def upload_markdown_image(image_id, path):
+    """
+    upload a spooled file and record the result on its MarkdownImage.
+    runs in the task pool. the spooled file is removed afterwards.
+
+    Args:
+        image_id (UUID): pk of the MarkdownImage
+        path (str): path of the spooled file
+    """
+    from .models import MarkdownImage
+    image = MarkdownImage.objects.get(pk=image_id)
+    try:
+        image.url = get_upload_backend().upload(path, image.name)
+        image.status = MarkdownImage.DONE
+    except Exception as e:
+        image.status = MarkdownImage.FAILED
+        image.error = str(e)
+        raise
+    finally:
+        image.save(update_fields=['url', 'status', 'error', 'updated'])
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class ChunkError(Exception):
+    """
+    raised when a chunk can not be added to an UploadSession.
+
+    Attributes:
+        status (int): http status to answer with
+        message (str): why the chunk was refused
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def append_chunk(session_id, user, offset, data, checksum):
+    """
+    write a chunk of an UploadSession to its file.
+    the session row is locked while the chunk is written, so chunks of the same
+    file are written one at a time. a chunk that was already received is accepted
+    again without writing, so the client can safely retry when a response is lost.
+    when the last chunk arrives the whole file is hashed and checked.
+
+    Args:
+        session_id (UUID): pk of the UploadSession
+        user (User): the user sending the chunk. other users' sessions are not found.
+        offset (int): position of the chunk in the file
+        data (bytes): the chunk
+        checksum (str): sha256 hex digest of the chunk
+
+    Returns:
+        UploadSession: the session after the chunk
+
+    Raises:
+        UploadSession.DoesNotExist: if there is no such session of the user
+        ChunkError: if the chunk is refused
+    """
+    from .models import UploadSession
+    if hashlib.sha256(data).hexdigest() != (checksum or '').lower():
+        raise ChunkError(400, _('Checksum mismatch.'))
+    if len(data) > settings.UPLOAD_CHUNK_SIZE:
+        raise ChunkError(413, _('Chunk is too large.'))
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+        end = offset + len(data)
+        if end <= session.offset and session.status != UploadSession.FAILED:
+            # sent again after the response was lost
+            return session
+        if session.status != UploadSession.PENDING:
+            raise ChunkError(409, _('Upload is already finished.'))
+        if offset != session.offset:
+            raise ChunkError(409, _('Chunk does not start at the offset.'))
+        if end > session.size:
+            raise ChunkError(413, size_error(session.size))
+        if offset == 0 and sniff_type(data) not in settings.IMAGE_UPLOAD_TYPES:
+            session.fail(_('Bad image format.'))
+            return session
+        write_chunk(session.path, offset, data)
+        session.offset = end
+        if end == session.size:
+            digest = hash_file(session.path)
+            if session.sha256 and session.sha256 != digest:
+                session.fail(_('Checksum mismatch.'))
+                return session
+            session.sha256 = digest
+            session.status = UploadSession.COMPLETE
+        session.save(update_fields=['offset', 'sha256', 'status', 'updated'])
+    return session
+
+
+def write_chunk(path, offset, data):
+    """
+    write data at offset and cut off anything after it,
+    e.g. a chunk that was written before its transaction failed.
+
+    Args:
+        path (str): path of the file. created if it does not exist.
+        offset (int): position to write at
+        data (bytes): the chunk
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+
+
+def hash_file(path):
+    """
+    Args:
+        path (str): path of the file
+
+    Returns:
+        str: sha256 hex digest of the file, read in chunks
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
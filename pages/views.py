@@ -1,25 +1,49 @@
-import os
 import json
+import os
 import uuid
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import View
+from martor.utils import LazyEncoder
 
-import cloudinary
+from core.additional.tasks import task_pool
+from core.additional.uploadhandlers import ImageUploadMixin
+from .forms import UploadSessionForm
+from .models import MarkdownImage, UploadSession
+from .uploads import (
+    ChunkError, append_chunk, get_upload_backend, spool, upload_markdown_image)
 
 
-class MarkdownImageUploader(View):
+class MarkdownImageUploader(ImageUploadMixin, View):
     """
     custom image uploader for martor.
+    images are checked by ImageUploadHandler while they are uploaded,
+    so oversized and non-image files are never read whole.
     """
 
+    def upload_stopped_response(self, error):
+        """
+        answer an oversized image in the json martor expects.
+        """
+        data = json.dumps({
+            'status': 413,
+            'error': error
+        }, cls=LazyEncoder)
+        return HttpResponse(data, content_type='application/json', status=413)
+
     def post(self, request, *args, **kwargs):
         """
         called when images are uploaded to martor's markdown field.
         validation is from martor's documentation.
-        it will upload images to cloudinary.
+        it will upload images with the backend in settings.MARKDOWN_UPLOAD_BACKEND.
+
+        with settings.MARKDOWN_UPLOAD_ASYNC the file is spooled to disk and uploaded
+        by the task pool. the returned link points to MarkdownImageView,
+        which redirects to the image once the upload is done.
 
         Note:
             when there is '?' in the to be foldername the image upload will not work.
@@ -28,34 +52,21 @@ class MarkdownImageUploader(View):
         if not request.is_ajax():
             return HttpResponse(_('Invalid request!'))
 
-        if 'markdown-image-upload' not in request.FILES:
-            return HttpResponse(_('Invalid request!'))
-
-        image = request.FILES['markdown-image-upload']
-        image_types = [
-            'image/png', 'image/jpg',
-            'image/jpeg', 'image/pjpeg', 'image/gif'
-        ]
-        if image.content_type not in image_types:
-            # return error when the image type
-            # is not an expected type
+        # reading FILES parses the body through ImageUploadHandler
+        image = request.FILES.get('markdown-image-upload')
+        error = request.upload_errors.get('markdown-image-upload')
+        if error:
+            # return error when the image type is not an expected type
+            # or the image size is over the setted MAX_IMAGE_UPLOAD_SIZE
             data = json.dumps({
                 'status': 405,
-                'error': _('Bad image format.')
+                'error': error
             }, cls=LazyEncoder)
             return HttpResponse(
                 data, content_type='application/json', status=405)
 
-        if image.size > settings.MAX_IMAGE_UPLOAD_SIZE:
-            # return error when the image size
-            # is over the setted MAX_IMAGE_UPLOAD_SIZE
-            to_MB = settings.MAX_IMAGE_UPLOAD_SIZE / (1024 * 1024)
-            data = json.dumps({
-                'status': 405,
-                'error': _('Maximum image file is %(size) MB.') % {'size': to_MB}
-            }, cls=LazyEncoder)
-            return HttpResponse(
-                data, content_type='application/json', status=405)
+        if image is None:
+            return HttpResponse(_('Invalid request!'))
 
         # when the image is valid
 
@@ -63,18 +74,179 @@ class MarkdownImageUploader(View):
         img_name = f'{uuid.uuid4().hex[:10]}-{image.name.replace(" ", "-")}'
         # assign new name to the image that is being uploaded
         image.name = img_name
-        # create folder path
-        img_folder = os.path.join(
-            settings.MEDIA_URL, 'memo')
-        # save image to cloudinary
-        cloudinary_img = cloudinary.uploader.upload(
-            image, folder=img_folder, overwrite=True)
-        # get the saved image url from cloudinary response
-        cloudinary_img_url = cloudinary_img['url']
+        # copy the image out of the request so it can be uploaded later
+        path, digest = spool(image)
+        markdown_image = MarkdownImage.objects.create(name=img_name)
+        if (url := get_upload_backend().find(digest)):
+            # the same image was uploaded before. nothing to upload.
+            os.remove(path)
+            markdown_image.url = url
+            markdown_image.status = MarkdownImage.DONE
+            markdown_image.save()
+            link = url
+        elif settings.MARKDOWN_UPLOAD_ASYNC:
+            task_pool.submit_on_commit(upload_markdown_image, markdown_image.pk, path)
+            link = request.build_absolute_uri(markdown_image.get_absolute_url())
+        else:
+            try:
+                upload_markdown_image(markdown_image.pk, path)
+            except Exception:
+                data = json.dumps({
+                    'status': 500,
+                    'error': _('Upload failed.')
+                }, cls=LazyEncoder)
+                return HttpResponse(
+                    data, content_type='application/json', status=500)
+            markdown_image.refresh_from_db()
+            link = markdown_image.url
         # name json data to return to markdown
         data = json.dumps({
             'status': 200,
-            'link': cloudinary_img_url,
+            'link': link,
             'name': image.name
         })
         return HttpResponse(data, content_type='application/json')
+
+
+class MarkdownImageView(View):
+    """
+    the link handed out for images uploaded in the background.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        redirect to the uploaded image.
+        ajax requests get the upload status as json, so the editor can poll it.
+
+        Returns:
+            HttpResponse: redirect when the upload is done.
+                          202 while it is pending and 410 if it failed.
+        """
+        image = get_object_or_404(MarkdownImage, pk=kwargs['pk'])
+        if request.is_ajax():
+            return JsonResponse({
+                'status': image.status,
+                'link': image.url,
+                'name': image.name,
+            })
+        if image.status == MarkdownImage.DONE:
+            return redirect(image.url)
+        if image.status == MarkdownImage.PENDING:
+            response = HttpResponse(_('Upload in progress.'), status=202)
+            response['Retry-After'] = '1'
+            return response
+        return HttpResponse(_('Upload failed.'), status=410)
+
+
+def upload_session_data(session):
+    """
+    Returns:
+        Dict: json serializable status of an UploadSession
+    """
+    return {
+        'id': str(session.pk),
+        'url': session.get_absolute_url(),
+        'name': session.name,
+        'size': session.size,
+        'offset': session.offset,
+        'status': session.status,
+        'error': session.error,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE,
+    }
+
+
+class UploadSessionCreateView(LoginRequiredMixin, View):
+    """
+    start a resumable upload.
+    the client posts the file's name, size and optionally its sha256 hex digest,
+    then sends the file in chunks to the returned url with UploadSessionView.
+
+    Attributes:
+        raise_exception (bool): answer 403 instead of redirecting to the login page
+    """
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        """
+        Returns:
+            JsonResponse: the new session with status 201. the errors with 400.
+        """
+        form = UploadSessionForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        form.instance.user = request.user
+        session = form.save()
+        return JsonResponse(upload_session_data(session), status=201)
+
+
+class UploadSessionView(LoginRequiredMixin, View):
+    """
+    send chunks of a resumable upload and read its status.
+
+    a chunk is PUT as the raw request body with the headers
+    'X-Upload-Offset' (its position in the file) and 'X-Chunk-SHA256' (its sha256 hex digest).
+    after a dropped connection the client GETs the session and continues from 'offset'.
+
+    Attributes:
+        raise_exception (bool): answer 403 instead of redirecting to the login page
+    """
+    raise_exception = True
+
+    def get_session(self):
+        try:
+            return UploadSession.objects.get(pk=self.kwargs['pk'], user=self.request.user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns:
+            JsonResponse: status of the session
+        """
+        return JsonResponse(upload_session_data(self.get_session()))
+
+    def put(self, request, *args, **kwargs):
+        """
+        add a chunk to the session.
+
+        Returns:
+            JsonResponse: status of the session after the chunk.
+                          422 if the file turned out to be invalid.
+                          the error and the current offset when the chunk is refused.
+        """
+        try:
+            offset = int(request.headers.get('X-Upload-Offset', ''))
+        except ValueError:
+            offset = -1
+        if offset < 0:
+            return JsonResponse({'error': _('Invalid offset.')}, status=400)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return JsonResponse({'error': _('Invalid content length.')}, status=400)
+        if length > settings.UPLOAD_CHUNK_SIZE:
+            # refuse before the body is read
+            return JsonResponse({'error': _('Chunk is too large.')}, status=413)
+        try:
+            session = append_chunk(self.kwargs['pk'], request.user, offset, request.body,
+                                   request.headers.get('X-Chunk-SHA256'))
+        except UploadSession.DoesNotExist:
+            raise Http404
+        except ChunkError as e:
+            data = upload_session_data(self.get_session())
+            data['error'] = e.message
+            return JsonResponse(data, status=e.status)
+        status = 422 if session.status == UploadSession.FAILED else 200
+        return JsonResponse(upload_session_data(session), status=status)
+
+    def delete(self, request, *args, **kwargs):
+        """
+        cancel the upload and remove what was received.
+
+        Returns:
+            HttpResponse: 204
+        """
+        self.get_session().discard()
+        return HttpResponse(status=204)
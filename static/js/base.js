@@ -0,0 +1,150 @@
+// downscale images in the browser before they are uploaded.
+// phone photos are several MB but shown at a few hundred pixels, so they are fitted in
+// the size from settings (IMAGE_RESIZE_*, rendered by the 'image_upload' context processor)
+// and re-encoded before they leave the browser. the server still validates what it gets.
+//
+// - snap file inputs get the downscaled file in place of the picked one.
+//   static/js/snap-upload.js calls eigoImages.downscale() itself before uploading.
+// - martor's uploader posts with $.ajax, which is wrapped to downscale the image first.
+//
+// gif is left alone to keep animations, and the original is kept
+// whenever re-encoding does not make it smaller.
+(function () {
+    var element = document.getElementById('image-upload-settings');
+    var settings = element ? JSON.parse(element.textContent) : null;
+    var RESIZABLE_TYPES = ['image/jpeg', 'image/png', 'image/webp'];
+    var EXTENSIONS = { 'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp' };
+
+    function loadImage(file) {
+        return new Promise(function (resolve, reject) {
+            var url = URL.createObjectURL(file);
+            var image = new Image();
+            image.onload = function () {
+                URL.revokeObjectURL(url);
+                resolve(image);
+            };
+            image.onerror = function () {
+                URL.revokeObjectURL(url);
+                reject(new Error('can not read ' + file.name));
+            };
+            image.src = url;
+        });
+    }
+
+    function encode(image, width, height) {
+        var canvas = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        var context = canvas.getContext('2d');
+        if (settings.type === 'image/jpeg') {
+            // jpeg has no transparency. paint it white instead of black
+            context.fillStyle = '#fff';
+            context.fillRect(0, 0, width, height);
+        }
+        context.imageSmoothingQuality = 'high';
+        context.drawImage(image, 0, 0, width, height);
+        return new Promise(function (resolve) {
+            canvas.toBlob(resolve, settings.type, settings.quality / 100);
+        });
+    }
+
+    function rename(name, type) {
+        var extension = EXTENSIONS[type] || '';
+        return name.replace(/\.[^.]*$/, '') + extension;
+    }
+
+    // resolve with a smaller copy of file, or file itself when it can not be made smaller
+    function downscale(file) {
+        if (!settings || !file || RESIZABLE_TYPES.indexOf(file.type) === -1 ||
+                !window.HTMLCanvasElement || !HTMLCanvasElement.prototype.toBlob) {
+            return Promise.resolve(file);
+        }
+        return loadImage(file).then(function (image) {
+            var scale = Math.min(1, settings.max_width / image.naturalWidth,
+                                 settings.max_height / image.naturalHeight);
+            if (scale === 1 && file.type === settings.type) {
+                return file;
+            }
+            var width = Math.max(1, Math.round(image.naturalWidth * scale));
+            var height = Math.max(1, Math.round(image.naturalHeight * scale));
+            return encode(image, width, height).then(function (blob) {
+                if (!blob || blob.size >= file.size) {
+                    return file;
+                }
+                return new File([blob], rename(file.name, blob.type), {
+                    type: blob.type,
+                    lastModified: file.lastModified
+                });
+            });
+        }).catch(function () {
+            // let the server decide what to do with it
+            return file;
+        });
+    }
+
+    // put file in the input in place of what the user picked
+    function replaceFile(input, file) {
+        if (!window.DataTransfer) {
+            return;
+        }
+        try {
+            var transfer = new DataTransfer();
+            transfer.items.add(file);
+            input.files = transfer.files;
+        } catch (e) {
+            // old browsers can not set files. the original is uploaded
+        }
+    }
+
+    window.eigoImages = { settings: settings, downscale: downscale, replaceFile: replaceFile };
+
+    if (!settings) {
+        return;
+    }
+
+    // snap inputs. skipped when snap-upload.js takes care of the input
+    document.addEventListener('change', function (event) {
+        var input = event.target;
+        if (!input.matches || !input.matches('input[type=file][name$="-snap"]') ||
+                input.dataset.chunkedUpload || !input.files.length) {
+            return;
+        }
+        var form = input.form;
+        var submit = form && form.querySelector('[type=submit]');
+        if (submit) {
+            submit.disabled = true;
+        }
+        downscale(input.files[0]).then(function (file) {
+            if (file !== input.files[0]) {
+                replaceFile(input, file);
+            }
+        }).finally(function () {
+            if (submit) {
+                submit.disabled = false;
+            }
+        });
+    });
+
+    // martor's image uploader
+    if (window.jQuery) {
+        var ajax = jQuery.ajax;
+        jQuery.ajax = function (url, options) {
+            var request = typeof url === 'object' ? url : options;
+            var data = request && request.data;
+            var image = window.FormData && data instanceof FormData && data.get('markdown-image-upload');
+            if (!(image instanceof File)) {
+                return ajax.apply(this, arguments);
+            }
+            var context = this;
+            var args = arguments;
+            var deferred = jQuery.Deferred();
+            downscale(image).then(function (file) {
+                if (file !== image) {
+                    data.set('markdown-image-upload', file, file.name);
+                }
+                ajax.apply(context, args).then(deferred.resolve, deferred.reject);
+            });
+            return deferred.promise();
+        };
+    }
+})();
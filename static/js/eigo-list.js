@@ -0,0 +1,94 @@
+// infinite scroll for the phrase list.
+// when the 'more' link comes into view, fetch the next page of cells
+// and put them in place of the link. the fetched page has its own 'more' link.
+(function () {
+    var loading = false;
+
+    function loadNextPage(link, observer) {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        fetch(link.dataset.pageUrl, { credentials: 'same-origin' })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                observer.unobserve(link);
+                var template = document.createElement('template');
+                template.innerHTML = html;
+                link.replaceWith(template.content);
+                observeMoreLink(observer);
+            })
+            .catch(function () {
+                // leave the link so the user can still click through
+            })
+            .finally(function () {
+                loading = false;
+            });
+    }
+
+    function observeMoreLink(observer) {
+        var link = document.getElementById('eigo-list-more');
+        if (link) {
+            observer.observe(link);
+        }
+    }
+
+    if (!('IntersectionObserver' in window)) {
+        return;
+    }
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                loadNextPage(entry.target, observer);
+            }
+        });
+    }, { rootMargin: '200px' });
+    observeMoreLink(observer);
+})();
+
+// search-as-you-type suggestions for the search box.
+// completions come from the suggest endpoint and are shown with a datalist.
+(function () {
+    var input = document.getElementById('eigo-search');
+    var datalist = document.getElementById('eigo-suggestions');
+    if (!input || !datalist) {
+        return;
+    }
+    var timer = null;
+    var lastQuery = null;
+
+    function showSuggestions(suggestions) {
+        datalist.innerHTML = '';
+        suggestions.forEach(function (suggestion) {
+            var option = document.createElement('option');
+            option.value = suggestion;
+            datalist.appendChild(option);
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var query = input.value.trim();
+            if (!query || query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            var url = input.dataset.suggestUrl + '?q=' + encodeURIComponent(query);
+            fetch(url, { credentials: 'same-origin' })
+                .then(function (response) {
+                    return response.ok ? response.json() : { suggestions: [] };
+                })
+                .then(function (data) {
+                    if (query === lastQuery) {
+                        showSuggestions(data.suggestions);
+                    }
+                });
+        }, 150);
+    });
+})();
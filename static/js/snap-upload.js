@@ -0,0 +1,136 @@
+// resumable snap uploads for the phrase form.
+// a chosen file is sent in chunks to the form's data-upload-url as soon as it is picked,
+// and the form only posts the id of the finished upload in the hidden 'upload' field.
+// a chunk that fails is retried from the offset the server reports,
+// so a dropped connection only costs the chunk in flight.
+// files are downscaled with eigoImages from base.js before they are sent.
+// browsers without crypto.subtle (plain http) post the files with the form as before.
+(function () {
+    var MAX_RETRIES = 5;
+    var form = document.querySelector('form[data-upload-url]');
+    if (!form || !window.crypto || !window.crypto.subtle || !window.fetch) {
+        return;
+    }
+    var csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+    var pending = 0;
+    var downscale = window.eigoImages ? window.eigoImages.downscale : function (file) {
+        return Promise.resolve(file);
+    };
+
+    function toHex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function (byte) {
+            return ('0' + byte.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function sha256(buffer) {
+        return window.crypto.subtle.digest('SHA-256', buffer).then(toHex);
+    }
+
+    function request(url, options) {
+        options.credentials = 'same-origin';
+        options.headers = Object.assign({ 'X-CSRFToken': csrfToken }, options.headers);
+        return fetch(url, options).then(function (response) {
+            return response.json().then(function (data) {
+                if (!response.ok && response.status !== 409) {
+                    var error = new Error(data.error || response.statusText);
+                    error.fatal = response.status < 500 && response.status !== 408;
+                    throw error;
+                }
+                return data;
+            });
+        });
+    }
+
+    function wait(retries) {
+        return new Promise(function (resolve) {
+            setTimeout(resolve, 500 * Math.pow(2, retries));
+        });
+    }
+
+    function sendChunks(file, session, retries) {
+        if (session.status === 'complete') {
+            return Promise.resolve(session);
+        }
+        if (session.status === 'failed') {
+            return Promise.reject(new Error(session.error));
+        }
+        var chunk = file.slice(session.offset, session.offset + session.chunk_size);
+        return chunk.arrayBuffer().then(function (buffer) {
+            return sha256(buffer).then(function (digest) {
+                return request(session.url, {
+                    method: 'PUT',
+                    body: buffer,
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'X-Upload-Offset': String(session.offset),
+                        'X-Chunk-SHA256': digest
+                    }
+                });
+            });
+        }).then(function (next) {
+            return sendChunks(file, next, 0);
+        }, function (error) {
+            if (error.fatal || retries >= MAX_RETRIES) {
+                throw error;
+            }
+            // ask where to continue from, then send the next chunk again
+            return wait(retries).then(function () {
+                return request(session.url, { method: 'GET' });
+            }).then(function (current) {
+                return sendChunks(file, current, retries + 1);
+            }, function () {
+                return sendChunks(file, session, retries + 1);
+            });
+        });
+    }
+
+    function upload(input) {
+        var picked = input.files[0];
+        var hidden = form.querySelector('[name="' + input.name.replace(/-snap$/, '-upload') + '"]');
+        if (!picked || !hidden) {
+            return;
+        }
+        pending += 1;
+        hidden.value = '';
+        input.disabled = true;
+        downscale(picked)
+            .then(function (file) {
+                var data = new FormData();
+                data.append('name', file.name);
+                data.append('size', file.size);
+                return request(form.dataset.uploadUrl, { method: 'POST', body: data })
+                    .then(function (session) {
+                        return sendChunks(file, session, 0);
+                    });
+            })
+            .then(function (session) {
+                hidden.value = session.id;
+                // the file is uploaded already. do not post it with the form again
+                input.value = '';
+            })
+            .catch(function (error) {
+                UIkit.notification(picked.name + ': ' + error.message, { status: 'danger' });
+                input.value = '';
+            })
+            .finally(function () {
+                input.disabled = false;
+                pending -= 1;
+            });
+    }
+
+    form.querySelectorAll('input[type=file][name$="-snap"]').forEach(function (input) {
+        // base.js leaves these inputs to this module
+        input.dataset.chunkedUpload = 'true';
+        input.addEventListener('change', function () {
+            upload(input);
+        });
+    });
+
+    form.addEventListener('submit', function (event) {
+        if (pending) {
+            event.preventDefault();
+            UIkit.notification('Please wait until the snaps are uploaded.', { status: 'warning' });
+        }
+    });
+})();